@@ -0,0 +1,61 @@
+"""Benchmark the single-pass punctuation standardizer against the step by step rules.
+
+Every subtitle of the corpus is standardized with both versions, the
+outputs are checked to be identical and the best of several timings is
+reported.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clean_pipeline import apply_block_step, read_folder
+from data_punctuation_standardizer import _multipass_standardize_punctuation, expanded_standardize_punctuation
+
+
+def load_subtitles(source_dir):
+    """The joined text of every subtitle, as the punctuation step receives it."""
+    subtitles = []
+    def collect(text):
+        subtitles.append(text)
+        return text
+    for folder_name in sorted(os.listdir(source_dir)):
+        folder_path = os.path.join(source_dir, folder_name)
+        if os.path.isdir(folder_path):
+            for content in read_folder(folder_path).values():
+                apply_block_step(content, collect)
+    return subtitles
+
+def best_time(func, subtitles, repeat):
+    """Best wall time of running func over all subtitles, and its output."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = [func(text) for text in subtitles]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the punctuation standardizer.")
+    parser.add_argument('--source', default='data_bg_cleaned', help="folder with the data-N folders the step reads")
+    parser.add_argument('--repeat', type=int, default=3, help="number of timed runs, the best one counts")
+    args = parser.parse_args()
+
+    subtitles = load_subtitles(args.source)
+    print(f"{len(subtitles)} subtitles, {sum(map(len, subtitles))} characters")
+
+    multipass_time, expected = best_time(_multipass_standardize_punctuation, subtitles, args.repeat)
+    single_time, output = best_time(expanded_standardize_punctuation, subtitles, args.repeat)
+
+    mismatches = sum(a != b for a, b in zip(expected, output))
+    print(f"multi-pass:  {multipass_time:.3f}s")
+    print(f"single-pass: {single_time:.3f}s ({multipass_time / single_time:.1f}x faster)")
+    print(f"mismatches:  {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
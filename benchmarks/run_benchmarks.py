@@ -0,0 +1,267 @@
+"""Reproducible benchmarks of every pipeline stage on a synthetic corpus.
+
+A deterministic corpus is generated with synthetic_srt, every stage is timed
+on it (best of --repeat runs) and run once more under tracemalloc for its
+peak memory. Results are written as JSON; given a baseline JSON from an
+earlier run, every benchmark that got slower by more than --threshold is
+reported and the exit status is 1.
+
+    python benchmarks/run_benchmarks.py --output benchmarks/baseline.json
+    ... change something ...
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_srt import DEFAULT_SETTINGS, ENCODINGS, Settings, write_corpus
+from clean_pipeline import DEFAULT_CHAIN, STEPS, apply_step, read_folder
+from data_aligned import align_subtitles
+from data_encode import convert_to_utf8, detect_encoding
+from data_similarity_scoring import AdvancedSimilarityCalculator
+from data_tokenized import BPE
+from srt_parser import parse_srt, parse_srt_table
+
+DEFAULT_OUTPUT = os.path.join('benchmarks', 'latest.json')
+DEFAULT_SCALING = [250, 500, 1000, 2000]
+
+# How much input a benchmark processes, to turn its time into throughputs
+Workload = namedtuple('Workload', ['files', 'cues', 'bytes'])
+
+BENCHMARKS = {}
+
+def register_benchmark(name, setup):
+    """Register a benchmark; setup(corpus) returns (run, Workload) and run() does the timed work."""
+    BENCHMARKS[name] = setup
+
+
+class Corpus:
+    """The synthetic corpus every benchmark runs on, in the forms the stages take."""
+
+    def __init__(self, work_dir, files, settings):
+        self.work_dir = work_dir
+        self.raw_folders = write_corpus(os.path.join(work_dir, 'raw'), files, settings, ENCODINGS)
+        self.folders = write_corpus(os.path.join(work_dir, 'utf8'), files, settings)
+        self.paths = [os.path.join(folder, name) for folder in self.folders for name in sorted(os.listdir(folder))]
+        self.raw_paths = [os.path.join(folder, name) for folder in self.raw_folders for name in sorted(os.listdir(folder))]
+        self.contents = [read_folder(folder) for folder in self.folders]
+        self.tables = [parse_srt_table(path) for path in self.paths]
+        self.pairs = list(zip(self.tables[0::2], self.tables[1::2]))
+
+        self.hindi, self.telugu = [], []
+        for hindi_subs, telugu_subs in self.pairs:
+            for hindi_sub, telugu_sub in align_subtitles(hindi_subs, telugu_subs):
+                self.hindi.append(hindi_sub.text)
+                self.telugu.append(telugu_sub.text)
+
+        self.workload = Workload(files=len(self.paths), cues=sum(len(table) for table in self.tables),
+                                 bytes=sum(os.path.getsize(path) for path in self.paths))
+
+    def text_workload(self, texts):
+        return Workload(files=len(self.pairs), cues=len(texts), bytes=sum(len(text.encode('utf-8')) for text in texts))
+
+
+def bench_encode(corpus):
+    dest_dir = os.path.join(corpus.work_dir, 'encoded')
+    os.makedirs(dest_dir, exist_ok=True)
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i, path in enumerate(corpus.raw_paths):
+                convert_to_utf8(path, os.path.join(dest_dir, f"{i}.srt"), detect_encoding(path))
+    raw_bytes = sum(os.path.getsize(path) for path in corpus.raw_paths)
+    return run, corpus.workload._replace(bytes=raw_bytes)
+
+def bench_parse_srt(corpus):
+    return lambda: [parse_srt(path) for path in corpus.paths], corpus.workload
+
+def bench_parse_srt_table(corpus):
+    return lambda: [parse_srt_table(path) for path in corpus.paths], corpus.workload
+
+def step_benchmark(step):
+    """Benchmark of one cleaning step, run the way clean_pipeline runs it."""
+    def setup(corpus):
+        return lambda: [apply_step(step, contents) for contents in corpus.contents], corpus.workload
+    return setup
+
+def bench_clean_chain(corpus):
+    def run():
+        for contents in corpus.contents:
+            for name in DEFAULT_CHAIN:
+                contents, _ = apply_step(STEPS[name], contents)
+    return run, corpus.workload
+
+def bench_align_subtitles(corpus):
+    return lambda: [align_subtitles(hindi, telugu) for hindi, telugu in corpus.pairs], corpus.workload
+
+def bench_bpe_train(corpus):
+    return lambda: BPE(corpus.hindi, 1000).train(), corpus.text_workload(corpus.hindi)
+
+def bench_bpe_tokenize(corpus):
+    bpe = BPE(corpus.hindi, 1000)
+    bpe.train()
+    def run():
+        # A fresh tokenizer each run, so the word cache starts out empty
+        tokenizer = BPE([], bpe.vocab_size)
+        tokenizer.merges = bpe.merges
+        tokenizer.tokenize_batch(corpus.hindi)
+    return run, corpus.text_workload(corpus.hindi)
+
+def bench_similarity(corpus):
+    def run():
+        AdvancedSimilarityCalculator().calculate_similarity_scores(corpus.hindi, corpus.telugu)
+    return run, corpus.text_workload(corpus.hindi + corpus.telugu)
+
+register_benchmark('encode', bench_encode)
+register_benchmark('parse_srt', bench_parse_srt)
+register_benchmark('parse_srt_table', bench_parse_srt_table)
+for name, step in STEPS.items():
+    register_benchmark(f'clean.{name}', step_benchmark(step))
+register_benchmark('clean.chain', bench_clean_chain)
+register_benchmark('align_subtitles', bench_align_subtitles)
+register_benchmark('bpe.train', bench_bpe_train)
+register_benchmark('bpe.tokenize', bench_bpe_tokenize)
+register_benchmark('similarity', bench_similarity)
+
+
+def best_time(run, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def peak_memory(run):
+    """Peak memory allocated by Python (and NumPy) while run() runs, in bytes."""
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(run, workload, repeat):
+    seconds = best_time(run, repeat)
+    return {
+        'seconds': seconds,
+        'files_per_s': workload.files / seconds,
+        'cues_per_s': workload.cues / seconds,
+        'mb_per_s': workload.bytes / 1e6 / seconds,
+        'peak_mb': peak_memory(run) / 1e6,
+        'workload': workload._asdict(),
+    }
+
+def alignment_scaling(cue_counts, settings, repeat):
+    """Time of align_subtitles on one file pair of each cue count."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        curve = []
+        for cues in cue_counts:
+            folder = write_corpus(work_dir, 1, settings._replace(cues=cues))[0]
+            hindi, telugu = (parse_srt_table(os.path.join(folder, f"{lang}-1.srt")) for lang in ('hin', 'tel'))
+            seconds = best_time(lambda: align_subtitles(hindi, telugu), repeat)
+            curve.append({'cues': cues, 'seconds': seconds, 'cues_per_s': 2 * cues / seconds})
+            print(f"  {cues:6d} cues: {seconds:.4f}s")
+    return curve
+
+def run_benchmarks(names, files, settings, repeat, scaling):
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': dict(settings._asdict(), files=files, repeat=repeat),
+        'benchmarks': {},
+        'scaling': {},
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        print(f"Generating {files} synthetic file pairs of {settings.cues} subtitles...")
+        corpus = Corpus(work_dir, files, settings)
+        for name in names:
+            run, workload = BENCHMARKS[name](corpus)
+            result = results['benchmarks'][name] = measure(run, workload, repeat)
+            print(f"{name:24s} {result['seconds']:8.4f}s {result['files_per_s']:9.1f} files/s "
+                  f"{result['cues_per_s']:11.0f} cues/s {result['mb_per_s']:7.2f} MB/s {result['peak_mb']:8.1f} MB peak")
+    if scaling:
+        print("align_subtitles scaling:")
+        results['scaling']['align_subtitles'] = alignment_scaling(scaling, settings, repeat)
+    return results
+
+def compare(results, baseline, threshold):
+    """Names of the benchmarks more than threshold slower than in baseline."""
+    if baseline.get('settings') != results['settings']:
+        print("⚠️ The baseline was run with different settings, timings may not be comparable")
+    # Points of the scaling curves are compared like benchmarks of their own
+    timings = dict(results['benchmarks'])
+    before_timings = dict(baseline.get('benchmarks', {}))
+    for source, target in ((results, timings), (baseline, before_timings)):
+        for curve_name, curve in source.get('scaling', {}).items():
+            target.update((f"{curve_name}@{point['cues']}", point) for point in curve)
+
+    regressions = []
+    print(f"\n{'benchmark':24s} {'baseline':>9s} {'now':>9s} {'change':>8s}")
+    for name, result in timings.items():
+        if name not in before_timings:
+            continue
+        before = before_timings[name]['seconds']
+        change = result['seconds'] / before - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  ❌ regression'
+        print(f"{name:24s} {before:8.4f}s {result['seconds']:8.4f}s {change:+8.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on a synthetic corpus.")
+    parser.add_argument('--only', help=f"comma separated benchmarks to run (available: {', '.join(BENCHMARKS)})")
+    parser.add_argument('--files', type=int, default=10, help="number of synthetic file pairs")
+    parser.add_argument('--cues', type=int, default=DEFAULT_SETTINGS.cues, help="subtitles per file")
+    parser.add_argument('--line-words', type=int, default=DEFAULT_SETTINGS.line_words, help="average words per line")
+    parser.add_argument('--noise', type=float, default=DEFAULT_SETTINGS.noise, help="fraction of noisy subtitles")
+    parser.add_argument('--drift', type=float, default=DEFAULT_SETTINGS.drift, help="relative timing drift of Telugu")
+    parser.add_argument('--jitter', type=float, default=DEFAULT_SETTINGS.jitter, help="timing jitter of Telugu in seconds")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SETTINGS.seed)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per benchmark, the best one counts")
+    parser.add_argument('--scaling', default=','.join(map(str, DEFAULT_SCALING)),
+                        help="comma separated cue counts for the alignment scaling curve ('' to skip)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON file to write the results to")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="slowdown (as a fraction) above which a benchmark counts as a regression")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(',')] if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    settings = Settings(args.cues, args.line_words, args.noise, args.drift, args.jitter, args.seed)
+    scaling = [int(cues) for cues in args.scaling.split(',') if cues.strip()]
+
+    results = run_benchmarks(names, args.files, settings, args.repeat, scaling)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=1)
+    print(f"Results saved to '{args.output}'.")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} benchmarks got slower by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"✅ No benchmark got slower by more than {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Deterministic synthetic Hindi/Telugu subtitle pairs for the benchmarks.
+
+The same seed and settings always give byte-identical files, so timings of
+different runs are measured on exactly the same input.
+"""
+import argparse
+import os
+import random
+from collections import namedtuple
+from itertools import accumulate
+
+# Consonants, vowel signs and the virama of both scripts
+SCRIPTS = {
+    'hin': ([chr(c) for c in range(0x0915, 0x093A)], [chr(c) for c in range(0x093E, 0x094D)], '्'),
+    'tel': ([chr(c) for c in range(0x0C15, 0x0C3A) if c not in (0x0C29, 0x0C34)],
+            [chr(c) for c in range(0x0C3E, 0x0C4D) if c not in (0x0C45, 0x0C49)], '్'),
+}
+SENTENCE_ENDS = {'hin': ['।', '?', '!'], 'tel': ['.', '?', '!']}
+VOCABULARY_SIZE = 2000
+# Zipf distributed word choice, so tokenizers see realistic repetition
+WORD_WEIGHTS = list(accumulate(1 / rank for rank in range(1, VOCABULARY_SIZE + 1)))
+
+# The kinds of noise the cleaning steps remove or normalize, one picked per noisy cue
+NOISE = [
+    lambda text, lang: f"<i>{text}</i>",                                      # html
+    lambda text, lang: f"[{'संगीत' if lang == 'hin' else 'సంగీతం'}] {text}",   # background tag
+    lambda text, lang: f"\u202b{text}\u202c",                                 # bidi controls
+    lambda text, lang: text.replace(' ', ' \u200b', 1),                       # unprintable
+    lambda text, lang: f"{text} {'१२३' if lang == 'hin' else '৪৫'}",          # indic numerals
+    lambda text, lang: f"\u201c{text}\u201d \u2026",                          # typographic punctuation
+    lambda text, lang: f"{text} caf\u00e9",                                    # accents / other scripts
+]
+
+# Generator settings; drift stretches Telugu times by that fraction, jitter is in seconds
+Settings = namedtuple('Settings', ['cues', 'line_words', 'noise', 'drift', 'jitter', 'seed'])
+DEFAULT_SETTINGS = Settings(cues=400, line_words=6, noise=0.1, drift=0.001, jitter=0.05, seed=0)
+
+# Encodings the raw files are written in, cycled over the files
+ENCODINGS = ['utf-8', 'utf-8-sig', 'utf-16']
+
+
+def vocabulary(lang, rng):
+    """Random words of a script, more frequent first."""
+    consonants, vowel_signs, virama = SCRIPTS[lang]
+    words = []
+    for _ in range(VOCABULARY_SIZE):
+        syllables = []
+        for _ in range(rng.randint(1, 4)):
+            syllable = rng.choice(consonants)
+            roll = rng.random()
+            if roll < 0.6:
+                syllable += rng.choice(vowel_signs)
+            elif roll < 0.7:
+                syllable += virama + rng.choice(consonants)
+            syllables.append(syllable)
+        words.append(''.join(syllables))
+    return words
+
+def format_time(seconds):
+    """SRT timestamp of a time in seconds."""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+def cue_times(count, rng):
+    """(start, end) of count consecutive cues."""
+    times = []
+    position = rng.uniform(1, 60)
+    for _ in range(count):
+        start = position + rng.uniform(0.2, 2.0)
+        end = start + rng.uniform(0.8, 5.0)
+        times.append((start, end))
+        position = end
+    return times
+
+def cue_text(lang, words, settings, rng):
+    """One or two subtitle lines of roughly line_words words, maybe with some noise."""
+    lines = []
+    for _ in range(1 if rng.random() < 0.7 else 2):
+        count = max(1, int(rng.gauss(settings.line_words, settings.line_words / 3)))
+        line = ' '.join(rng.choices(words, cum_weights=WORD_WEIGHTS, k=count))
+        if rng.random() < 0.5:
+            line += rng.choice(SENTENCE_ENDS[lang])
+        lines.append(line)
+    text = '\n'.join(lines)
+    if rng.random() < settings.noise:
+        text = rng.choice(NOISE)(text, lang)
+    return text
+
+def format_srt(times, texts):
+    return ''.join(f"{i}\n{format_time(start)} --> {format_time(end)}\n{text}\n\n"
+                   for i, ((start, end), text) in enumerate(zip(times, texts), start=1))
+
+def generate_pair(settings=DEFAULT_SETTINGS, number=0):
+    """Hindi and Telugu SRT text of one synthetic file pair."""
+    rng = random.Random(f"{settings.seed}-{number}")
+    times = cue_times(settings.cues, rng)
+    telugu_times = []
+    for start, end in times:
+        shift = rng.gauss(0, settings.jitter)
+        telugu_times.append((start * (1 + settings.drift) + shift, end * (1 + settings.drift) + shift))
+
+    pair = {}
+    for lang, lang_times in (('hin', times), ('tel', telugu_times)):
+        words = vocabulary(lang, random.Random(f"{settings.seed}-{lang}"))
+        pair[lang] = format_srt(lang_times, [cue_text(lang, words, settings, rng) for _ in lang_times])
+    return pair['hin'], pair['tel']
+
+def write_corpus(dest_dir, files, settings=DEFAULT_SETTINGS, encodings=('utf-8',)):
+    """Write files data-N folders of hin-N.srt/tel-N.srt pairs, returning the folder paths.
+
+    File pair N is written in encodings[(N - 1) % len(encodings)].
+    """
+    folders = []
+    for number in range(1, files + 1):
+        folder = os.path.join(dest_dir, f"data-{number}")
+        os.makedirs(folder, exist_ok=True)
+        encoding = encodings[(number - 1) % len(encodings)]
+        for lang, text in zip(('hin', 'tel'), generate_pair(settings, number)):
+            with open(os.path.join(folder, f"{lang}-{number}.srt"), 'w', encoding=encoding, newline='\n') as f:
+                f.write(text)
+        folders.append(folder)
+    return folders
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic Hindi/Telugu subtitle corpus.")
+    parser.add_argument('dest', help="folder for the data-N folders")
+    parser.add_argument('--files', type=int, default=10, help="number of file pairs")
+    parser.add_argument('--cues', type=int, default=DEFAULT_SETTINGS.cues, help="subtitles per file")
+    parser.add_argument('--line-words', type=int, default=DEFAULT_SETTINGS.line_words, help="average words per line")
+    parser.add_argument('--noise', type=float, default=DEFAULT_SETTINGS.noise, help="fraction of noisy subtitles")
+    parser.add_argument('--drift', type=float, default=DEFAULT_SETTINGS.drift, help="relative timing drift of Telugu")
+    parser.add_argument('--jitter', type=float, default=DEFAULT_SETTINGS.jitter, help="timing jitter of Telugu in seconds")
+    parser.add_argument('--encodings', default='utf-8', help=f"comma separated encodings to cycle through (e.g. {','.join(ENCODINGS)})")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SETTINGS.seed)
+    args = parser.parse_args()
+
+    settings = Settings(args.cues, args.line_words, args.noise, args.drift, args.jitter, args.seed)
+    folders = write_corpus(args.dest, args.files, settings, args.encodings.split(','))
+    print(f"Wrote {len(folders)} file pairs to '{args.dest}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Content-hash incremental build cache for the pipeline stages.
+
+Each stage keeps a manifest in its destination folder recording, for every
+output it wrote, the hashes of the input files it was built from and the
+hash of the stage's code and parameters. On the next run an output is only
+rebuilt if one of its inputs or the stage itself changed. Since downstream
+stages hash the files written by upstream stages, a change in one stage
+cascades to exactly the outputs it affected further down the pipeline.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = '.manifest.json'
+
+
+def file_hash(path):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stage_hash(source_files, params=None):
+    """Hash of a stage's source code and parameters."""
+    digest = hashlib.sha256()
+    for path in sorted(set(os.path.abspath(p) for p in source_files)):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """Manifest of the outputs a stage wrote into one destination folder."""
+
+    def __init__(self, destination_dir, stage, force=False):
+        self.path = os.path.join(destination_dir, MANIFEST_NAME)
+        self.stage = stage
+        self.entries = {}
+        self._states = {}  # file states computed during this run
+        # With force the old manifest is ignored and everything is rebuilt
+        if not force and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                manifest = {}
+            # A change in the stage's code or parameters invalidates every output
+            if manifest.get('stage') == stage:
+                self.entries = manifest.get('entries', {})
+
+    def _input_state(self, path, known=None):
+        """[size, mtime_ns, sha256] of a file, reusing a known hash if the file wasn't touched."""
+        stat = os.stat(path)
+        for state in (known, self._states.get(path)):
+            if state and state[0] == stat.st_size and state[1] == stat.st_mtime_ns:
+                return state
+        state = [stat.st_size, stat.st_mtime_ns, file_hash(path)]
+        self._states[path] = state
+        return state
+
+    def is_fresh(self, key, input_paths, output_paths=None):
+        """Check whether the outputs for key are up to date with their inputs.
+
+        If output_paths is None the outputs recorded last time are expected.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        if output_paths is None:
+            output_paths = entry['outputs']
+        if not all(os.path.exists(path) for path in output_paths):
+            return False
+        if sorted(entry['outputs']) != sorted(output_paths):
+            return False
+
+        recorded = entry['inputs']
+        if sorted(recorded) != sorted(input_paths):
+            return False
+        for path in input_paths:
+            state = self._input_state(path, recorded[path])
+            if state[2] != recorded[path][2]:
+                return False
+            recorded[path] = state  # remember the new mtime of unchanged content
+        return True
+
+    def record(self, key, input_paths, output_paths):
+        """Record that the outputs for key were built from the given inputs."""
+        previous = self.entries.get(key, {}).get('inputs', {})
+        self.entries[key] = {
+            'inputs': {path: self._input_state(path, previous.get(path)) for path in input_paths},
+            'outputs': sorted(output_paths),
+        }
+
+    def prune(self, keys):
+        """Forget entries whose key is not in keys (e.g. removed input folders)."""
+        for key in list(self.entries):
+            if key not in keys:
+                del self.entries[key]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'stage': self.stage, 'entries': self.entries}, f, ensure_ascii=False, indent=1)
@@ -0,0 +1,133 @@
+"""Compiled str.translate tables for the per-character cleaning steps.
+
+A step that only maps, deletes or filters single characters is described
+declaratively by a CharSpec. Any number of specs, applied one after the
+other, compile into a single translate table, so several steps cost one
+str.translate call. Tables are cached per combination of specs and fill
+themselves in as new characters are seen; CodepointTable does the same for
+any per-character function.
+
+str.translate looks every character up in the table, which is slower than
+a regex scan for text that needs no change at all, so each table also gets
+a character class of what it may change and only translates from the first
+match on.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+# What one step does to a single character. The character is deleted if it is
+# in deletions, outside every allowed range (when ranges are given) or its
+# category starts with one of deleted_categories; otherwise it is replaced by
+# its mapping, if any. Ranges are inclusive (first, last) codepoint pairs.
+CharSpec = namedtuple('CharSpec', ['mapping', 'deletions', 'allowed_ranges', 'deleted_categories'])
+
+# Blocks most of the corpus is written in, filled in when a table is built
+PRECOMPUTED_RANGES = [(0x0000, 0x0080), (0x0900, 0x0980), (0x0C00, 0x0C80)]
+
+# The character class only lists BMP characters one by one; characters above
+# it are always translated, as long lists of astral ranges make re scan slowly
+BMP_END = 0x10000
+ASTRAL = (BMP_END, 0x10FFFF)
+
+
+def char_spec(mapping=None, deletions='', allowed_ranges=(), deleted_categories=()):
+    """Build a (hashable) CharSpec from plain dicts, strings and lists."""
+    return CharSpec(tuple(sorted((mapping or {}).items())), frozenset(deletions),
+                    tuple(allowed_ranges), tuple(deleted_categories))
+
+def apply_spec(spec, c, mapping=None):
+    """What a single spec turns one character into.
+
+    mapping is dict(spec.mapping), which callers running many characters
+    through the same spec build once and pass in.
+    """
+    if c in spec.deletions:
+        return ''
+    if spec.allowed_ranges and not any(first <= ord(c) <= last for first, last in spec.allowed_ranges):
+        return ''
+    if spec.deleted_categories and unicodedata.category(c).startswith(spec.deleted_categories):
+        return ''
+    if mapping is None:
+        mapping = dict(spec.mapping)
+    return mapping.get(c, c)
+
+@lru_cache(maxsize=None)
+def changed_codepoints(spec):
+    """BMP codepoints a spec doesn't leave as they are, worked out once per spec."""
+    # A character is changed if it is deleted by any rule or mapped to something else
+    changed = {ord(c) for c, replacement in spec.mapping if replacement != c}
+    changed.update(ord(c) for c in spec.deletions)
+    if spec.allowed_ranges:
+        # Everything in the gaps between the allowed ranges is deleted
+        start = 0
+        for first, last in sorted(spec.allowed_ranges):
+            changed.update(range(start, min(first, BMP_END)))
+            start = max(start, last + 1)
+        changed.update(range(start, BMP_END))
+    if spec.deleted_categories:
+        category = unicodedata.category
+        changed.update(codepoint for codepoint in range(BMP_END) if codepoint not in changed
+                       and category(chr(codepoint)).startswith(spec.deleted_categories))
+    return frozenset(codepoint for codepoint in changed if codepoint < BMP_END)
+
+def character_class(codepoints):
+    """Regex character class matching the given codepoints and everything above the BMP."""
+    ranges = []
+    for codepoint in sorted(codepoints):
+        if ranges and ranges[-1][1] == codepoint - 1:
+            ranges[-1][1] = codepoint
+        else:
+            ranges.append([codepoint, codepoint])
+    ranges.append(ASTRAL)
+    return '[%s]' % ''.join(re.escape(chr(first)) if first == last else
+                            '%s-%s' % (re.escape(chr(first)), re.escape(chr(last)))
+                            for first, last in ranges)
+
+
+class CodepointTable(dict):
+    """str.translate table of a per-character function, filled in as characters are seen."""
+
+    def __init__(self, func, ranges=PRECOMPUTED_RANGES):
+        super().__init__()
+        self.func = func
+        for start, end in ranges:
+            for codepoint in range(start, end):
+                self[codepoint] = func(chr(codepoint))
+
+    def __missing__(self, codepoint):
+        value = self[codepoint] = self.func(chr(codepoint))
+        return value
+
+class TranslateTable(CodepointTable):
+    """str.translate table of a chain of specs, filled in as characters are seen."""
+
+    def __init__(self, specs, ranges=PRECOMPUTED_RANGES):
+        self.specs = specs
+        self.mappings = [dict(spec.mapping) for spec in specs]
+        # A character the chain changes is changed by at least one of its specs
+        self.pattern = re.compile(character_class(set().union(*map(changed_codepoints, specs))))
+        super().__init__(self.convert, ranges)
+
+    def convert(self, c):
+        """Run one character through every spec in turn."""
+        text = c
+        for spec, mapping in zip(self.specs, self.mappings):
+            text = ''.join(apply_spec(spec, ch, mapping) for ch in text)
+        return text
+
+@lru_cache(maxsize=None)
+def compile_table(*specs):
+    """The translate table applying specs in order, compiled once per combination."""
+    return TranslateTable(specs)
+
+def translate(text, *specs):
+    """Apply one or more specs to text in a single str.translate call."""
+    table = compile_table(*specs)
+    match = table.pattern.search(text)
+    if not match:
+        return text
+    # Everything before the first match is left as it is
+    start = match.start()
+    return text[:start] + text[start:].translate(table)
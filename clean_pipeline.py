@@ -0,0 +1,323 @@
+"""Single-pass cleaning pipeline for the subtitle corpus.
+
+Every hin/tel pair is read once, run through the configured chain of
+cleaning steps in memory and only the final result is written to disk.
+Each step behaves exactly like its standalone script, so the output
+matches running the scripts one after another.
+"""
+import argparse
+import os
+import re
+import sys
+from collections import namedtuple
+
+import char_tables
+from char_tables import apply_spec, translate
+from data_bg_cleaner import remove_background_noise
+from data_punctuation_standardizer import expanded_standardize_punctuation
+from data_number_standardizer import standardize_numbers
+from data_lang_cleaner import is_valid_pair
+from data_Html_cleaner import clean_text
+from data_unprintable_cleaner import UNPRINTABLE_SPEC, remove_non_printable
+from data_invalid_lang_range_cleaner import HINDI_TELUGU_SPEC, remove_non_hindi_telugu
+from data_deaccented import deaccent_text
+from build_cache import BuildCache, stage_hash
+from parallel_runner import add_jobs_argument, run_parallel
+from stage_metrics import add_metrics_arguments, configure, count_cues, file_metrics, stage_metrics
+
+# How a step walks an SRT file, mirroring the standalone scripts:
+#   'line'  - applied to every non-empty, non-timestamp line
+#   'block' - applied to the joined text of each subtitle
+#   'text'  - applied to the whole file content
+#   'pair'  - decides whether a hin/tel pair is kept at all
+# A line step whose func is translate(line, spec), followed by strip() if
+# strip is set, also gives its CharSpec, so runs of them can share a table.
+Step = namedtuple('Step', ['name', 'kind', 'func', 'output_dir', 'spec', 'strip'], defaults=(None, False))
+
+STEPS = {}
+
+def register_step(name, kind, func, output_dir, spec=None, strip=False):
+    """Register a cleaning step under the given name."""
+    STEPS[name] = Step(name, kind, func, output_dir, spec, strip)
+
+register_step('bg', 'line', remove_background_noise, 'data_bg_cleaned')
+register_step('punctuation', 'block', expanded_standardize_punctuation, 'data_punctuation_standardized')
+register_step('numbers', 'block', standardize_numbers, 'data_number_standardized')
+register_step('lang', 'pair', is_valid_pair, 'data_lang_cleaned')
+register_step('html', 'text', clean_text, 'data_Html_cleaned')
+register_step('unprintable', 'line', remove_non_printable, 'data_unprintable_cleaned', UNPRINTABLE_SPEC)
+register_step('range', 'line', remove_non_hindi_telugu, 'data_invalid_lang_range_cleaned', HINDI_TELUGU_SPEC,
+              strip=True)
+register_step('deaccent', 'block', deaccent_text, 'data_deaccented')
+
+DEFAULT_CHAIN = ['bg', 'punctuation', 'numbers', 'lang', 'html', 'unprintable', 'range', 'deaccent']
+
+SUBTITLE_NUMBER = re.compile(r'^\d+$')
+
+
+def split_lines(content):
+    """Split content into lines the way reading a text file does (keeping '\\n')."""
+    lines = content.split('\n')
+    result = [line + '\n' for line in lines[:-1]]
+    if lines[-1]:
+        result.append(lines[-1])
+    return result
+
+def apply_line_step(content, func):
+    """Apply func to every non-empty line that isn't a timestamp."""
+    output = []
+    for line in split_lines(content):
+        if '-->' not in line and line.strip():
+            output.append(func(line) + '\n')
+        else:
+            output.append(line)
+    return ''.join(output)
+
+def deletes_only(step):
+    """Whether a step only deletes characters, the newline included, through its CharSpec."""
+    return step.spec is not None and not step.spec.mapping and apply_spec(step.spec, '\n') == ''
+
+def translate_runs(steps):
+    """End of the run of steps sharing one translate call that starts at each step.
+
+    Consecutive steps that only delete characters are merged, as long as
+    only the last of them strips its result.
+    """
+    ends = []
+    for i in range(len(steps)):
+        end = i + 1
+        if deletes_only(steps[i]):
+            while end < len(steps) and deletes_only(steps[end]) and not steps[end - 1].strip:
+                end += 1
+        ends.append(end)
+    return ends
+
+def apply_line_steps(content, steps):
+    """Apply several line steps one after the other in a single walk over the lines.
+
+    Each step sees a line exactly as its own apply_line_step would have.
+    Consecutive steps that only delete characters run as one translate call.
+    """
+    ends = translate_runs(steps)
+    output = []
+    for line in split_lines(content):
+        i = 0
+        while i < len(steps):
+            if '-->' in line or not line.strip():
+                break
+            if ends[i] > i + 1:
+                run = steps[i:ends[i]]
+                text = translate(line, *(step.spec for step in run))
+                if run[-1].strip:
+                    text = text.strip()
+                # Deleting characters can't make a '-->' without a '>' or a blank
+                # line that isn't blank, so no step in between would have stopped
+                if '>' not in line and text.strip():
+                    line = text + '\n'
+                    i = ends[i]
+                    continue
+            line = steps[i].func(line) + '\n'
+            i += 1
+            if line.count('\n') > 1:
+                # The step split the line, the remaining steps see the pieces separately
+                line = apply_line_steps(line, steps[i:])
+                break
+        output.append(line)
+    return ''.join(output)
+
+def apply_block_step(content, func):
+    """Apply func to the joined text lines of every subtitle."""
+    output = []
+    subtitle_text = []
+    for line in split_lines(content):
+        line = line.strip()
+        if SUBTITLE_NUMBER.match(line) or '-->' in line:
+            # Subtitle number or timestamp - keep as is
+            if subtitle_text:
+                output.append(func(' '.join(subtitle_text)) + '\n\n')
+                subtitle_text = []
+            output.append(line + '\n')
+        elif line:
+            subtitle_text.append(line)
+        else:
+            if subtitle_text:
+                output.append(func(' '.join(subtitle_text)) + '\n\n')
+                subtitle_text = []
+            else:
+                output.append('\n')
+
+    # Handle any remaining subtitle text
+    if subtitle_text:
+        output.append(func(' '.join(subtitle_text)) + '\n')
+    return ''.join(output)
+
+def apply_step(step, contents):
+    """Run one step over the contents of a folder ({file name: content})."""
+    if step.kind == 'pair':
+        hindi = [name for name in contents if name.startswith('hin-')]
+        telugu = [name for name in contents if name.startswith('tel-')]
+        if hindi and telugu and not step.func(contents[hindi[0]], contents[telugu[0]]):
+            return {name: '' for name in contents}, True
+        return contents, False
+
+    if step.kind == 'line':
+        apply = apply_line_step
+    elif step.kind == 'block':
+        apply = apply_block_step
+    else:
+        apply = lambda content, func: func(content)
+    return {name: apply(content, step.func) for name, content in contents.items()}, False
+
+
+def read_folder(folder_path):
+    """Read every .srt file in a folder into {file name: content}."""
+    contents = {}
+    for file_name in sorted(os.listdir(folder_path)):
+        if file_name.endswith('.srt'):
+            with open(os.path.join(folder_path, file_name), 'r', encoding='utf-8') as srt_file:
+                contents[file_name] = srt_file.read()
+    return contents
+
+def write_folder(folder_path, contents):
+    """Write {file name: content} into a folder."""
+    os.makedirs(folder_path, exist_ok=True)
+    for file_name, content in contents.items():
+        with open(os.path.join(folder_path, file_name), 'w', encoding='utf-8') as output_file:
+            output_file.write(content)
+
+def changed_lines(before, after):
+    """Number of lines of after differing from the line at the same position in before."""
+    changed = 0
+    for name, content in after.items():
+        old_lines, new_lines = before[name].split('\n'), content.split('\n')
+        changed += sum(a != b for a, b in zip(old_lines, new_lines)) + abs(len(old_lines) - len(new_lines))
+    return changed
+
+def clean_folder(source_folder, destination_folder, chain=DEFAULT_CHAIN,
+                 materialize_dir=None, invalid_dir=None):
+    """Clean one data-N folder, returning True if the pair was rejected.
+
+    If materialize_dir is given, the output of every step is also written to
+    materialize_dir/<step output dir>/<folder>, like the standalone scripts do.
+    Rejected pairs are kept in invalid_dir as they were before the rejecting step.
+    """
+    folder_name = os.path.basename(os.path.normpath(source_folder))
+    file_names = sorted(f for f in os.listdir(source_folder) if f.endswith('.srt'))
+    with file_metrics('clean', folder_name, [os.path.join(source_folder, f) for f in file_names],
+                      [os.path.join(destination_folder, f) for f in file_names]) as metrics:
+        contents = read_folder(source_folder)
+        metrics.add(cues=sum(count_cues(content) for content in contents.values()))
+        rejected = False
+
+        # Runs of line steps share a walk over the lines, unless every step's output is wanted
+        groups = []
+        for name in chain:
+            step = STEPS[name]
+            if groups and step.kind == 'line' and groups[-1][-1].kind == 'line' and not materialize_dir:
+                groups[-1].append(step)
+            else:
+                groups.append([step])
+
+        for steps in groups:
+            step = steps[-1]
+            before = contents
+            with metrics.step('+'.join(s.name for s in steps)):
+                if len(steps) > 1:
+                    contents = {name: apply_line_steps(content, steps) for name, content in contents.items()}
+                    step_rejected = False
+                else:
+                    contents, step_rejected = apply_step(step, contents)
+            if metrics.enabled:
+                metrics.add(lines_changed=changed_lines(before, contents))
+            if step_rejected:
+                rejected = True
+                if invalid_dir:
+                    write_folder(os.path.join(invalid_dir, folder_name), before)
+            if materialize_dir:
+                write_folder(os.path.join(materialize_dir, step.output_dir, folder_name), contents)
+
+        write_folder(destination_folder, contents)
+    return rejected
+
+def chain_hash(chain):
+    """Hash of the code and configuration of a cleaning chain, for the build cache."""
+    # The translate tables of the steps are built from char_tables
+    source_files = [__file__, char_tables.__file__]
+    source_files += [sys.modules[STEPS[name].func.__module__].__file__ for name in chain]
+    return stage_hash(source_files, {'chain': list(chain)})
+
+def clean_directory(source_dir, destination_dir, chain=DEFAULT_CHAIN,
+                    materialize_dir=None, invalid_dir='lang_clean_invalid', jobs=None, force=False):
+    """Clean every data-N folder of source_dir into destination_dir using jobs processes.
+
+    Folders whose files and cleaning chain haven't changed since the last run
+    are skipped, unless force is set or the steps are being materialized.
+    """
+    os.makedirs(destination_dir, exist_ok=True)
+    cache = BuildCache(destination_dir, chain_hash(chain), force=force or bool(materialize_dir))
+    rejected_folders = []
+
+    tasks = []
+    folder_files = {}
+    for folder_name in sorted(os.listdir(source_dir)):
+        folder_path = os.path.join(source_dir, folder_name)
+        if os.path.isdir(folder_path) and folder_name.startswith('data-'):
+            destination_folder = os.path.join(destination_dir, folder_name)
+            file_names = sorted(f for f in os.listdir(folder_path) if f.endswith('.srt'))
+            input_paths = [os.path.join(folder_path, f) for f in file_names]
+            output_paths = [os.path.join(destination_folder, f) for f in file_names]
+            folder_files[folder_name] = (input_paths, output_paths)
+
+            if cache.is_fresh(folder_name, input_paths, output_paths):
+                continue
+            tasks.append((folder_path, destination_folder, chain, materialize_dir, invalid_dir))
+
+    print(f"{len(tasks)} of {len(folder_files)} folders need cleaning")
+    cache.prune(folder_files)
+
+    for task, rejected, error in run_parallel(clean_folder, tasks, jobs):
+        folder_name = os.path.basename(task[0])
+        if error:
+            print(f"Error processing folder {folder_name}:\n{error}")
+            continue
+        cache.record(folder_name, *folder_files[folder_name])
+        if rejected:
+            rejected_folders.append(folder_name)
+        print(f"Cleaned folder: {folder_name}")
+    cache.save()
+
+    if rejected_folders:
+        print(f"Cleared content of the following folders due to incorrect language detection: {', '.join(rejected_folders)}")
+    return rejected_folders
+
+def run(source_dir='data_encode', destination_dir='data_deaccented', chain=DEFAULT_CHAIN,
+        materialize_dir=None, invalid_dir='lang_clean_invalid', jobs=None, force=False):
+    """Run the cleaning chain over source_dir into destination_dir as one pipeline stage."""
+    with stage_metrics('clean'):
+        clean_directory(source_dir, destination_dir, chain, materialize_dir, invalid_dir, jobs, force)
+    print(f"All files have been processed and saved to '{destination_dir}'.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the subtitle cleaning steps in a single pass.")
+    parser.add_argument('--source', default='data_encode', help="folder with the UTF-8 encoded data-N folders")
+    parser.add_argument('--dest', default='data_deaccented', help="folder for the cleaned data-N folders")
+    parser.add_argument('--steps', default=','.join(DEFAULT_CHAIN),
+                        help=f"comma separated cleaning steps to run, in order (available: {', '.join(STEPS)})")
+    parser.add_argument('--materialize', metavar='DIR', nargs='?', const='.', default=None,
+                        help="also write the output of every step under DIR (default: current folder), for debugging")
+    parser.add_argument('--invalid', default='lang_clean_invalid', help="folder for pairs rejected by the lang step")
+    parser.add_argument('--force', action='store_true', help="rebuild every folder, ignoring the build cache")
+    add_jobs_argument(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    chain = [name.strip() for name in args.steps.split(',') if name.strip()]
+    unknown = [name for name in chain if name not in STEPS]
+    if unknown:
+        parser.error(f"unknown steps: {', '.join(unknown)}")
+
+    run(args.source, args.dest, chain, args.materialize, args.invalid, args.jobs, args.force)
+
+if __name__ == "__main__":
+    main()
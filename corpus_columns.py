@@ -0,0 +1,335 @@
+"""Columnar files for the aligned, tokenized and scored corpora.
+
+The stages normally exchange tab-separated text, which can't hold a tab in a
+subtitle and has to be split line by line again by every reader. A column
+table keeps each column apart instead, so a reader memory-maps the file and
+only touches the columns it needs.
+
+Tables are written as Arrow IPC files (.arrow) when pyarrow is installed and
+in the NumPy layout below (.cols) otherwise; readers tell them apart by the
+suffix. The NumPy layout is a single file:
+
+    8 bytes   magic b'HINTELC1'
+    8 bytes   header length, little-endian uint64
+    header    JSON: {"rows": N, "columns": [{"name": ..., "type": ...,
+              "sections": [[offset, length], ...]}, ...]}
+    data      the sections, each starting on a multiple of ALIGNMENT bytes;
+              offsets count from the first ALIGNMENT boundary after the header
+
+A numeric column ('int64' or 'float64') has one section of N little-endian
+values. A 'text' column has three: N + 1 int64 byte offsets, N + 1 int64
+character offsets, then the UTF-8 encoded texts one after the other, text i
+being data[offsets[i]:offsets[i + 1]]. The character offsets give the same
+split of the data decoded at once, which is much faster for whole columns.
+"""
+import argparse
+import importlib.util
+import json
+import mmap
+import os
+import re
+import struct
+
+import numpy as np
+
+MAGIC = b'HINTELC1'
+ALIGNMENT = 64
+
+NUMPY_SUFFIX = '.cols'
+ARROW_SUFFIX = '.arrow'
+TABLE_SUFFIXES = (NUMPY_SUFFIX, ARROW_SUFFIX)
+
+NUMERIC_TYPES = {'int64': '<i8', 'float64': '<f8'}
+
+# Types of the corpus columns: the film (data-N folder) a row comes from, the
+# times of its two cues, its Hindi and Telugu text and its similarity score
+CORPUS_COLUMNS = {
+    'film': 'int64',
+    'hindi_start': 'float64',
+    'hindi_end': 'float64',
+    'telugu_start': 'float64',
+    'telugu_end': 'float64',
+    'hindi': 'text',
+    'telugu': 'text',
+    'score': 'float64',
+}
+# Columns a stage copies from its input table to its output table unchanged
+CARRIED_COLUMNS = ['film', 'hindi_start', 'hindi_end', 'telugu_start', 'telugu_end']
+
+SCORED_HEADER = "Hindi\tTelugu\tSimilarity_Score\n"
+
+
+def table_suffix():
+    """Suffix of newly written tables: Arrow if pyarrow is installed, else the NumPy layout."""
+    return ARROW_SUFFIX if importlib.util.find_spec('pyarrow') else NUMPY_SUFFIX
+
+def is_table(path):
+    return path.endswith(TABLE_SUFFIXES)
+
+def film_id(path):
+    """The film number in a corpus file name (data-N_...), or -1 if it has none."""
+    match = re.search(r'data-(\d+)', os.path.basename(path))
+    return int(match.group(1)) if match else -1
+
+def column_type(name, values):
+    """Type of a column: its corpus column type, or guessed from its values."""
+    if name in CORPUS_COLUMNS:
+        return CORPUS_COLUMNS[name]
+    if isinstance(values, (TextColumn, ArrowTextColumn)) or (len(values) and isinstance(values[0], str)):
+        return 'text'
+    return 'int64' if np.asarray(values).dtype.kind in 'iub' else 'float64'
+
+
+class TextColumn:
+    """A text column read from a table, decoding single texts on access."""
+
+    def __init__(self, offsets, character_offsets, data):
+        self.offsets = offsets
+        self.character_offsets = character_offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return str(self.data[self.offsets[row]:self.offsets[row + 1]], 'utf-8')
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def tolist(self):
+        """Every text, decoding the whole column at once."""
+        offsets = self.character_offsets.tolist()
+        text = str(self.data, 'utf-8')
+        return [text[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+class ArrowTextColumn:
+    """A text column of a memory-mapped Arrow table, converting single texts on access."""
+
+    def __init__(self, array):
+        self.array = array
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return self.array[row].as_py()
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def tolist(self):
+        """Every text, converting the whole column at once."""
+        return self.array.to_pylist()
+
+
+class ColumnTable:
+    """The columns read from a table file, by name."""
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __len__(self):
+        return self.rows
+
+
+def _aligned(position):
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+def _write_numpy(path, columns, rows):
+    sections = []
+    header_columns = []
+    position = 0
+    for name, values in columns.items():
+        kind = column_type(name, values)
+        if kind == 'text':
+            values = list(values)
+            encoded = [text.encode('utf-8') for text in values]
+            offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+            np.cumsum([len(text) for text in encoded], out=offsets[1:])
+            character_offsets = np.zeros(len(values) + 1, dtype='<i8')
+            np.cumsum([len(text) for text in values], out=character_offsets[1:])
+            buffers = [offsets.tobytes(), character_offsets.tobytes(), b''.join(encoded)]
+        else:
+            buffers = [np.ascontiguousarray(values, dtype=NUMERIC_TYPES[kind]).tobytes()]
+        column_sections = []
+        for buffer in buffers:
+            position = _aligned(position)
+            column_sections.append([position, len(buffer)])
+            sections.append((position, buffer))
+            position += len(buffer)
+        header_columns.append({'name': name, 'type': kind, 'sections': column_sections})
+
+    header = json.dumps({'rows': rows, 'columns': header_columns}).encode('utf-8')
+    base = _aligned(len(MAGIC) + 8 + len(header))
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for offset, buffer in sections:
+            f.seek(base + offset)
+            f.write(buffer)
+        # The file ends after the last section, even if it is empty
+        f.truncate(base + position)
+
+def _read_numpy(path, names):
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a column table")
+    header_length, = struct.unpack_from('<Q', mm, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(mm[header_start:header_start + header_length])
+    base = _aligned(header_start + header_length)
+    rows = header['rows']
+
+    available = {column['name']: column for column in header['columns']}
+    columns = {}
+    for name in names or available:
+        if name not in available:
+            raise KeyError(f"{path} has no column {name!r}")
+        column = available[name]
+        sections = [(base + offset, length) for offset, length in column['sections']]
+        if column['type'] == 'text':
+            (offsets_at, _), (characters_at, _), (data_at, data_length) = sections
+            columns[name] = TextColumn(np.frombuffer(mm, dtype='<i8', count=rows + 1, offset=offsets_at),
+                                       np.frombuffer(mm, dtype='<i8', count=rows + 1, offset=characters_at),
+                                       memoryview(mm)[data_at:data_at + data_length])
+        else:
+            (at, _), = sections
+            columns[name] = np.frombuffer(mm, dtype=NUMERIC_TYPES[column['type']], count=rows, offset=at)
+    return ColumnTable(rows, columns)
+
+def _write_arrow(path, columns, rows):
+    import pyarrow as pa
+
+    arrays = {}
+    for name, values in columns.items():
+        kind = column_type(name, values)
+        if kind == 'text':
+            arrays[name] = pa.array(list(values), type=pa.large_string())
+        else:
+            arrays[name] = pa.array(np.asarray(values, dtype=NUMERIC_TYPES[kind]))
+    table = pa.table(arrays)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+def _read_arrow(path, names):
+    import pyarrow as pa
+
+    # Reading a memory-mapped file only maps its buffers, nothing is copied
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    missing = [name for name in names or () if name not in table.column_names]
+    if missing:
+        raise KeyError(f"{path} has no column {missing[0]!r}")
+    if names:
+        table = table.select(names)
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            columns[name] = ArrowTextColumn(column)
+        elif column.num_chunks == 1:
+            # A view of the mapped buffer, as the columns have no nulls
+            columns[name] = column.chunk(0).to_numpy()
+        else:
+            columns[name] = column.to_numpy()
+    return ColumnTable(table.num_rows, columns)
+
+def write_table(path, columns):
+    """Write equally long columns (a dict of name -> values) as a table.
+
+    The suffix of path picks the format. The file is written next to path
+    and renamed over it, so readers never see half a table.
+    """
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"columns of {path} have different lengths: {sorted(lengths)}")
+    rows = lengths.pop() if lengths else 0
+    temp_path = path + '.tmp'
+    if path.endswith(ARROW_SUFFIX):
+        _write_arrow(temp_path, columns, rows)
+    elif path.endswith(NUMPY_SUFFIX):
+        _write_numpy(temp_path, columns, rows)
+    else:
+        raise ValueError(f"{path} doesn't end in one of {', '.join(TABLE_SUFFIXES)}")
+    os.replace(temp_path, path)
+
+def read_table(path, names=None):
+    """Memory-map a table, giving only the named columns (default: all of them).
+
+    Numeric columns come as NumPy arrays, text columns as sequences of str
+    that only convert the texts that are accessed (or all of them at once
+    with tolist()).
+    """
+    if path.endswith(ARROW_SUFFIX):
+        return _read_arrow(path, names)
+    return _read_numpy(path, names)
+
+def carried_columns(path, rows):
+    """Film and cue time columns an output of the given number of rows takes over from its input file.
+
+    An input table passes them on as they are; for a TSV file only the film
+    number of its name is known.
+    """
+    if is_table(path):
+        table = read_table(path)
+        return {name: table[name] for name in CARRIED_COLUMNS if name in table}
+    return {'film': np.full(rows, film_id(path), dtype=np.int64)}
+
+def export_tsv(table_path, tsv_path):
+    """Write a table as the TSV file the pipeline writes without tables.
+
+    Tables with a score column get the header and score column of the
+    similarity stage, the others are plain Hindi<TAB>Telugu lines.
+    """
+    table = read_table(table_path)
+    with open(tsv_path, 'w', encoding='utf-8') as f:
+        if 'score' in table:
+            f.write(SCORED_HEADER)
+            for hindi, telugu, score in zip(table['hindi'], table['telugu'], table['score']):
+                f.write(f"{hindi}\t{telugu}\t{score:.4f}\n")
+        else:
+            for hindi, telugu in zip(table['hindi'], table['telugu']):
+                f.write(f"{hindi}\t{telugu}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export column tables to the TSV files the pipeline writes.")
+    parser.add_argument('paths', nargs='+', help="tables, or folders whose tables to export")
+    parser.add_argument('--dest', default=None, help="folder for the TSV files (default: next to each table)")
+    args = parser.parse_args()
+
+    table_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            table_paths += [os.path.join(path, name) for name in sorted(os.listdir(path)) if is_table(name)]
+        else:
+            table_paths.append(path)
+
+    for table_path in table_paths:
+        dest_dir = args.dest or os.path.dirname(table_path)
+        os.makedirs(dest_dir or '.', exist_ok=True)
+        tsv_path = os.path.join(dest_dir, os.path.splitext(os.path.basename(table_path))[0] + '.tsv')
+        export_tsv(table_path, tsv_path)
+        print(f"Exported {table_path} -> {tsv_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,17 @@
+import argparse
 import os
 import re
 
+from stage_metrics import add_metrics_arguments, configure, count_cues, file_metrics, stage_metrics
+
 source_base_dir = 'data_lang_cleaned'  # Replace with the actual path to your data folder
 destination_base_dir = 'data_Html_cleaned'  # Replace with the actual path to your data-bg-cleaned folder
 
 rtl_embed = '\u202B'
 pop_directional_formatting = '\u202C'
 
-os.makedirs(destination_base_dir, exist_ok=True)
-
 def clean_text(text):
+    # Two str.replace scans beat a translate table on whole files
     text = text.replace(rtl_embed, '')
     text = text.replace(pop_directional_formatting, '')
     
@@ -17,24 +19,44 @@ def clean_text(text):
     
     return text
 
-for folder in os.listdir(source_base_dir):
-    folder_path = os.path.join(source_base_dir, folder)
+def run(source_base_dir=source_base_dir, destination_base_dir=destination_base_dir):
+    """Clean the hin/tel files of every data-N folder of source_base_dir."""
+    os.makedirs(destination_base_dir, exist_ok=True)
+
+    with stage_metrics('html'):
+        for folder in os.listdir(source_base_dir):
+            folder_path = os.path.join(source_base_dir, folder)
+
+            if os.path.isdir(folder_path) and folder.startswith('data-'):
+                destination_folder = os.path.join(destination_base_dir, folder)
+                os.makedirs(destination_folder, exist_ok=True)
+
+                for file_name in os.listdir(folder_path):
+                    if file_name.startswith('hin-') or file_name.startswith('tel-'):
+                        source_file_path = os.path.join(folder_path, file_name)
+                        destination_file_path = os.path.join(destination_folder, file_name)
+
+                        with file_metrics('html', source_file_path, [source_file_path], [destination_file_path]) as metrics:
+                            with open(source_file_path, 'r', encoding='utf-8') as file:
+                                content = file.read()
 
-    if os.path.isdir(folder_path) and folder.startswith('data-'):
-        destination_folder = os.path.join(destination_base_dir, folder)
-        os.makedirs(destination_folder, exist_ok=True)
+                            cleaned_content = clean_text(content)
+                            metrics.add(cues=count_cues(content))
 
-        for file_name in os.listdir(folder_path):
-            if file_name.startswith('hin-') or file_name.startswith('tel-'):
-                source_file_path = os.path.join(folder_path, file_name)
-                destination_file_path = os.path.join(destination_folder, file_name)
+                            with open(destination_file_path, 'w', encoding='utf-8') as cleaned_file:
+                                cleaned_file.write(cleaned_content)
+                    
+                        print(f"Cleaned {file_name} in folder {folder}")
 
-                with open(source_file_path, 'r', encoding='utf-8') as file:
-                    content = file.read()
+def main():
+    parser = argparse.ArgumentParser(description="Remove bidi controls and <i> tags from the subtitles.")
+    parser.add_argument('--source', default=source_base_dir, help="folder with the language checked data-N folders")
+    parser.add_argument('--dest', default=destination_base_dir, help="folder for the cleaned data-N folders")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
 
-                cleaned_content = clean_text(content)
+    run(args.source, args.dest)
 
-                with open(destination_file_path, 'w', encoding='utf-8') as cleaned_file:
-                    cleaned_file.write(cleaned_content)
-                
-                print(f"Cleaned {file_name} in folder {folder}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
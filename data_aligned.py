@@ -1,91 +1,218 @@
+import argparse
 import os
 import re
-from srt_parser import parse_srt, Subtitle
+from collections import namedtuple
+import numpy as np
+import srt_parser
+from srt_parser import parse_srt_table, Subtitle, SubtitleTable
 from dtaidistance import dtw
+import corpus_columns
+from corpus_columns import film_id, is_table, table_suffix, write_table
+from build_cache import BuildCache, stage_hash
+from parallel_runner import add_jobs_argument, run_parallel
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
 
+# Widens the candidate window of time_based_indices so rounding in the
+# durations can never drop an overlapping pair (candidates are re-checked exactly)
+OVERLAP_SLACK = 1e-6
+
+# Start/end times and text lengths of a file's subtitles, plus an id per
+# subtitle that is shared by equal subtitles (same times and text, as in
+# Subtitle.__eq__) so the matching treats them as one subtitle like before.
+SubtitleColumns = namedtuple('SubtitleColumns', ['start', 'end', 'length', 'ids'])
+
+def subtitle_columns(subs):
+    """Build the column arrays used by the alignment for a SubtitleTable or list of subtitles."""
+    ids = {}
+    if isinstance(subs, SubtitleTable):
+        texts = [subs.text(row) for row in range(len(subs))]
+        return SubtitleColumns(
+            start=np.frombuffer(subs.start_time, dtype=np.float64),
+            end=np.frombuffer(subs.end_time, dtype=np.float64),
+            length=np.diff(np.frombuffer(subs.text_offsets, dtype=np.int64)),
+            ids=np.array([ids.setdefault(key, i) for i, key in enumerate(zip(subs.start_time, subs.end_time, texts))],
+                         dtype=np.int64),
+        )
+
+    return SubtitleColumns(
+        start=np.array([sub.start_time for sub in subs], dtype=np.float64),
+        end=np.array([sub.end_time for sub in subs], dtype=np.float64),
+        length=np.array([len(sub.text) for sub in subs], dtype=np.int64),
+        ids=np.array([ids.setdefault((sub.start_time, sub.end_time, sub.text), i)
+                      for i, sub in enumerate(subs)], dtype=np.int64),
+    )
+
+def time_scores(hindi, telugu, hi, ti):
+    """Time overlap of each (hi, ti) pair divided by their combined time range."""
+    overlap = np.maximum(0, np.minimum(hindi.end[hi], telugu.end[ti]) - np.maximum(hindi.start[hi], telugu.start[ti]))
+    total_duration = np.maximum(hindi.end[hi], telugu.end[ti]) - np.minimum(hindi.start[hi], telugu.start[ti])
+    valid = total_duration > 0
+    return np.divide(overlap, total_duration, out=np.zeros(len(hi)), where=valid), valid
+
+def length_differences(hindi, telugu, hi, ti):
+    """Relative text length difference of each (hi, ti) pair."""
+    max_length = np.maximum(hindi.length[hi], telugu.length[ti])
+    valid = max_length > 0
+    difference = np.abs(hindi.length[hi] - telugu.length[ti])
+    return np.divide(difference, max_length, out=np.zeros(len(hi)), where=valid), valid
+
+def time_based_indices(hindi, telugu, threshold=0.5):
+    """Index pairs of subtitles overlapping by more than threshold of their time range.
+
+    Only Telugu subtitles that can overlap a Hindi subtitle are compared with it:
+    they are sorted by start time and the candidates are found with a binary
+    search, using the longest Telugu duration to bound how early an overlapping
+    one can start. Pairs come out ordered by Hindi index, then Telugu index.
+    """
+    n, m = len(hindi.start), len(telugu.start)
+    if threshold < 0:
+        # Even non-overlapping pairs pass a negative threshold, so compare them all
+        hi, ti = np.divmod(np.arange(n * m, dtype=np.int64), m)
+    else:
+        order = np.argsort(telugu.start, kind='stable')
+        starts = telugu.start[order]
+        max_duration = np.max(telugu.end - telugu.start) if m else 0.0
+
+        # A Telugu subtitle has to start before the Hindi one ends and end after it starts
+        first = np.searchsorted(starts, hindi.start - max_duration - OVERLAP_SLACK, side='left')
+        last = np.searchsorted(starts, hindi.end, side='left')
+        counts = np.maximum(last - first, 0)
+
+        hi = np.repeat(np.arange(n, dtype=np.int64), counts)
+        offsets = np.arange(len(hi)) - np.repeat(np.cumsum(counts) - counts, counts)
+        ti = order[np.repeat(first, counts) + offsets]
+        by_pair = np.lexsort((ti, hi))
+        hi, ti = hi[by_pair], ti[by_pair]
+
+    scores, valid = time_scores(hindi, telugu, hi, ti)
+    keep = valid & (scores > threshold)
+    return hi[keep], ti[keep]
 
 def time_based_alignment(hindi_subs, telugu_subs, threshold=0.5):
-    aligned_pairs = []
-    for h_sub in hindi_subs:
-        for t_sub in telugu_subs:
-            overlap = max(0, min(h_sub.end_time, t_sub.end_time) - max(h_sub.start_time, t_sub.start_time))
-            total_duration = max(h_sub.end_time, t_sub.end_time) - min(h_sub.start_time, t_sub.start_time)
-            if total_duration > 0 and overlap / total_duration > threshold:
-                aligned_pairs.append((h_sub, t_sub))
-    return aligned_pairs
-
-def length_based_refinement(aligned_pairs, max_length_diff=0.25):
-    refined_pairs = []
-    for h_sub, t_sub in aligned_pairs:
-        max_length = max(len(h_sub.text), len(t_sub.text))
-        if max_length > 0 and abs(len(h_sub.text) - len(t_sub.text)) / max_length <= max_length_diff:
-            refined_pairs.append((h_sub, t_sub))
-    return refined_pairs
-
-def dtw_alignment(unaligned_hindi, unaligned_telugu):
-    if not unaligned_hindi or not unaligned_telugu:
-        return []
-
-    hindi_lengths = [len(sub.text) for sub in unaligned_hindi]
-    telugu_lengths = [len(sub.text) for sub in unaligned_telugu]
+    """Subtitle pairs for time_based_indices."""
+    hi, ti = time_based_indices(subtitle_columns(hindi_subs), subtitle_columns(telugu_subs), threshold)
+    return [(hindi_subs[i], telugu_subs[j]) for i, j in zip(hi.tolist(), ti.tolist())]
+
+def length_based_refinement(hindi, telugu, hi, ti, max_length_diff=0.25):
+    """Keep the index pairs whose text lengths differ by at most max_length_diff."""
+    differences, valid = length_differences(hindi, telugu, hi, ti)
+    keep = valid & (differences <= max_length_diff)
+    return hi[keep], ti[keep]
+
+def dtw_alignment(hindi, telugu, unaligned_hindi, unaligned_telugu):
+    """Index pairs from a DTW warping path over the text lengths of the unaligned subtitles."""
+    if not len(unaligned_hindi) or not len(unaligned_telugu):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    hindi_lengths = hindi.length[unaligned_hindi].tolist()
+    telugu_lengths = telugu.length[unaligned_telugu].tolist()
     
-    alignment = dtw.warping_path(hindi_lengths, telugu_lengths)
+    alignment = np.array(dtw.warping_path(hindi_lengths, telugu_lengths), dtype=np.int64).reshape(-1, 2)
     
-    dtw_pairs = [(unaligned_hindi[i], unaligned_telugu[j]) for i, j in alignment]
-    return dtw_pairs
+    return unaligned_hindi[alignment[:, 0]], unaligned_telugu[alignment[:, 1]]
 
-def score_alignment(hindi_sub, telugu_sub):
-    time_overlap = max(0, min(hindi_sub.end_time, telugu_sub.end_time) - max(hindi_sub.start_time, telugu_sub.start_time))
-    total_duration = max(hindi_sub.end_time, telugu_sub.end_time) - min(hindi_sub.start_time, telugu_sub.start_time)
-    time_score = time_overlap / total_duration if total_duration > 0 else 0
-    
-    max_length = max(len(hindi_sub.text), len(telugu_sub.text))
-    length_score = 1 - abs(len(hindi_sub.text) - len(telugu_sub.text)) / max_length if max_length > 0 else 0
+def score_alignments(hindi, telugu, hi, ti):
+    """Score of every (hi, ti) index pair: 0.6 * time overlap score + 0.4 * length similarity."""
+    time_score, _ = time_scores(hindi, telugu, hi, ti)
+    differences, valid = length_differences(hindi, telugu, hi, ti)
+    length_score = np.where(valid, 1 - differences, 0)
     return 0.6 * time_score + 0.4 * length_score
 
-def final_alignment(time_based_pairs, length_refined_pairs, dtw_pairs):
-    all_pairs = time_based_pairs + length_refined_pairs + dtw_pairs
-    scored_pairs = [(pair, score_alignment(*pair)) for pair in all_pairs]
-    scored_pairs.sort(key=lambda x: x[1], reverse=True)
+def final_alignment(hindi, telugu, hi, ti):
+    """Greedily pick the best scoring pairs so every subtitle is used at most once."""
+    # Drop repeated (hindi, telugu) pairs, keeping the first one
+    _, first = np.unique(hi * len(telugu.start) + ti, return_index=True)
+    first.sort()
+    hi, ti = hi[first], ti[first]
+
+    scores = score_alignments(hindi, telugu, hi, ti)
+    by_score = np.argsort(-scores, kind='stable')
     
-    final_pairs = []
-    used_hindi = set()
-    used_telugu = set()
+    used_hindi = np.zeros(len(hindi.start), dtype=bool)
+    used_telugu = np.zeros(len(telugu.start), dtype=bool)
+    hindi_ids = hindi.ids[hi].tolist()
+    telugu_ids = telugu.ids[ti].tolist()
     
-    for (h_sub, t_sub), score in scored_pairs:
-        if h_sub not in used_hindi and t_sub not in used_telugu:
-            final_pairs.append((h_sub, t_sub))
-            used_hindi.add(h_sub)
-            used_telugu.add(t_sub)
+    selected = []
+    for k in by_score.tolist():
+        h_id, t_id = hindi_ids[k], telugu_ids[k]
+        if not used_hindi[h_id] and not used_telugu[t_id]:
+            selected.append(k)
+            used_hindi[h_id] = True
+            used_telugu[t_id] = True
     
-    return final_pairs
+    return hi[selected], ti[selected]
 
 def align_subtitles(hindi_subs, telugu_subs):
-    time_based_pairs = time_based_alignment(hindi_subs, telugu_subs)
-    length_refined_pairs = length_based_refinement(time_based_pairs)
+    """Align two SubtitleTables (or lists of subtitles) into one-to-one subtitle pairs."""
+    hindi = subtitle_columns(hindi_subs)
+    telugu = subtitle_columns(telugu_subs)
+
+    time_hi, time_ti = time_based_indices(hindi, telugu)
+    refined_hi, refined_ti = length_based_refinement(hindi, telugu, time_hi, time_ti)
     
-    aligned_hindi = set(pair[0] for pair in length_refined_pairs)
-    aligned_telugu = set(pair[1] for pair in length_refined_pairs)
-    unaligned_hindi = [sub for sub in hindi_subs if sub not in aligned_hindi]
-    unaligned_telugu = [sub for sub in telugu_subs if sub not in aligned_telugu]
+    unaligned_hindi = np.flatnonzero(~np.isin(hindi.ids, hindi.ids[refined_hi]))
+    unaligned_telugu = np.flatnonzero(~np.isin(telugu.ids, telugu.ids[refined_ti]))
     
-    dtw_pairs = dtw_alignment(unaligned_hindi, unaligned_telugu)
-    final_pairs = final_alignment(time_based_pairs, length_refined_pairs, dtw_pairs)
+    dtw_hi, dtw_ti = dtw_alignment(hindi, telugu, unaligned_hindi, unaligned_telugu)
+    final_hi, final_ti = final_alignment(
+        hindi, telugu,
+        np.concatenate([time_hi, refined_hi, dtw_hi]),
+        np.concatenate([time_ti, refined_ti, dtw_ti]),
+    )
     
-    return final_pairs
+    return [(hindi_subs[i], telugu_subs[j]) for i, j in zip(final_hi.tolist(), final_ti.tolist())]
 
-def main():
-    source_base_dir = 'data_deaccented'
-    destination_base_dir = 'data_aligned'
+def aligned_columns(aligned_pairs, film):
+    """Table columns of the aligned pairs of one film."""
+    return {
+        'film': [film] * len(aligned_pairs),
+        'hindi_start': [hindi_sub.start_time for hindi_sub, telugu_sub in aligned_pairs],
+        'hindi_end': [hindi_sub.end_time for hindi_sub, telugu_sub in aligned_pairs],
+        'telugu_start': [telugu_sub.start_time for hindi_sub, telugu_sub in aligned_pairs],
+        'telugu_end': [telugu_sub.end_time for hindi_sub, telugu_sub in aligned_pairs],
+        'hindi': [hindi_sub.text for hindi_sub, telugu_sub in aligned_pairs],
+        'telugu': [telugu_sub.text for hindi_sub, telugu_sub in aligned_pairs],
+    }
 
+def align_file(hindi_path, telugu_path, dest_file_path):
+    """Align one pair of subtitle files and save the pairs as TSV, or as a table if dest_file_path is one."""
+    with file_metrics('align', dest_file_path, [hindi_path, telugu_path], [dest_file_path]) as metrics:
+        hindi_subs = parse_srt_table(hindi_path)
+        telugu_subs = parse_srt_table(telugu_path)
+        metrics.add(cues=len(hindi_subs) + len(telugu_subs))
+
+        aligned_pairs = align_subtitles(hindi_subs, telugu_subs)
+
+        if is_table(dest_file_path):
+            write_table(dest_file_path, aligned_columns(aligned_pairs, film_id(dest_file_path)))
+        else:
+            with open(dest_file_path, 'w', encoding='utf-8') as f:
+                for hindi_sub, telugu_sub in aligned_pairs:
+                    f.write(f"{hindi_sub.text}\t{telugu_sub.text}\n")
+    return len(aligned_pairs)
+
+def run(source_base_dir='data_deaccented', destination_base_dir='data_aligned', force=False, jobs=None,
+        output_format='tsv'):
+    """Align every hin/tel pair of source_base_dir into a file in destination_base_dir.
+
+    With output_format 'columnar' the pairs are written as column tables
+    (see corpus_columns) with their cue times and film number.
+    """
     os.makedirs(destination_base_dir, exist_ok=True)
+    source_files = [__file__, srt_parser.__file__]
+    suffix = '.tsv'
+    if output_format == 'columnar':
+        source_files.append(corpus_columns.__file__)
+        suffix = table_suffix()
+    cache = BuildCache(destination_base_dir, stage_hash(source_files), force=force)
 
-    for folder_name in os.listdir(source_base_dir):
+    tasks = []
+    expected = set()
+    for folder_name in sorted(os.listdir(source_base_dir)):
         folder_path = os.path.join(source_base_dir, folder_name)
         
         if os.path.isdir(folder_path) and folder_name.startswith('data-'):
-            print(f"\nProcessing folder: {folder_name}")
-            
             # Find all Hindi and Telugu subtitle files in the folder
             hindi_files = [f for f in os.listdir(folder_path) if f.startswith('hin-') and f.endswith('.srt')]
             telugu_files = [f for f in os.listdir(folder_path) if f.startswith('tel-') and f.endswith('.srt')]
@@ -94,32 +221,50 @@ def main():
             hindi_files.sort()
             telugu_files.sort()
             
-            # Process each pair of files
+            # Queue each pair of files
             for hindi_file, telugu_file in zip(hindi_files, telugu_files):
                 hindi_path = os.path.join(folder_path, hindi_file)
                 telugu_path = os.path.join(folder_path, telugu_file)
                 
-                print(f"Aligning: {hindi_file} and {telugu_file}")
-                
-                hindi_subs = parse_srt(hindi_path)
-                telugu_subs = parse_srt(telugu_path)
-                
-                aligned_pairs = align_subtitles(hindi_subs, telugu_subs)
-                
                 # Extract the number from the filename (e.g., 'hin-1.srt' -> '1')
                 file_number = re.search(r'-(\d+)\.srt', hindi_file).group(1)
                 
-                dest_file_path = os.path.join(destination_base_dir, f'{folder_name}_aligned_{file_number}.tsv')
-                with open(dest_file_path, 'w', encoding='utf-8') as f:
-                    for hindi_sub, telugu_sub in aligned_pairs:
-                        f.write(f"{hindi_sub.text}\t{telugu_sub.text}\n")
-                
-                print(f"Aligned subtitles saved to: {dest_file_path}")
+                dest_file_path = os.path.join(destination_base_dir, f'{folder_name}_aligned_{file_number}{suffix}')
+                if not cache.is_fresh(dest_file_path, [hindi_path, telugu_path], [dest_file_path]):
+                    tasks.append((hindi_path, telugu_path, dest_file_path))
+                expected.add(dest_file_path)
             
             if not hindi_files or not telugu_files:
                 print(f"No matching subtitle files found in folder: {folder_name}")
 
+    print(f"{len(tasks)} of {len(expected)} file pairs need aligning")
+    cache.prune(expected)
+
+    with stage_metrics('align'):
+        for (hindi_path, telugu_path, dest_file_path), pair_count, error in run_parallel(align_file, tasks, jobs):
+            print(f"Aligning: {os.path.basename(hindi_path)} and {os.path.basename(telugu_path)}")
+            if error:
+                print(f"Error aligning {hindi_path}:\n{error}")
+            else:
+                cache.record(dest_file_path, [hindi_path, telugu_path], [dest_file_path])
+                print(f"Aligned subtitles saved to: {dest_file_path}")
+    cache.save()
+
     print("\nAlignment process completed.")
 
+def main():
+    parser = argparse.ArgumentParser(description="Align Hindi and Telugu subtitles into TSV pairs.")
+    parser.add_argument('--source', default='data_deaccented', help="folder with the cleaned data-N folders")
+    parser.add_argument('--dest', default='data_aligned', help="folder for the aligned TSV files")
+    parser.add_argument('--force', action='store_true', help="realign every file, ignoring the build cache")
+    parser.add_argument('--format', default='tsv', choices=['tsv', 'columnar'],
+                        help="write TSV files or column tables with the cue times (see corpus_columns)")
+    add_jobs_argument(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    run(args.source, args.dest, force=args.force, jobs=args.jobs, output_format=args.format)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
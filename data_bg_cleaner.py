@@ -1,39 +1,61 @@
+import argparse
 import os
 import re
 
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
+
 def remove_background_noise(text):
     cleaned_text = re.sub(r'\[.*?\]', '', text)
     return cleaned_text.strip()  
 
-source_directory = r"D:\College Material\Sem 5\NLP Project\NLP_Project_Hintel\data_encode"  # Replace with the path to the 'data-encoded' folder
-destination_directory = r"D:\College Material\Sem 5\NLP Project\NLP_Project_Hintel\data_bg_cleaned"  # Replace with the path to the 'data-bg-cleaned' folder
-
-os.makedirs(destination_directory, exist_ok=True)
-
-for root, dirs, files in os.walk(source_directory):
-    for file in files:
-        if file.endswith(".srt"):
-            source_file_path = os.path.join(root, file)
-            print(f"Processing file: {source_file_path}")
-            
-            relative_path = os.path.relpath(root, source_directory)
-            dest_folder = os.path.join(destination_directory, relative_path)
-            os.makedirs(dest_folder, exist_ok=True)
-
-            output_file_path = os.path.join(dest_folder, file)
-            
-            with open(source_file_path, 'r', encoding='utf-8') as srt_file:
-                lines = srt_file.readlines()
-
-            with open(output_file_path, 'w', encoding='utf-8') as output_file:
-                for line in lines:
-                    # Process only non-empty lines that don't contain timestamps
-                    if '-->' not in line and line.strip():
-                        cleaned_line = remove_background_noise(line)
-                        output_file.write(cleaned_line + '\n')
-                    else:
-                        output_file.write(line)
-
-            print(f"Cleaned file saved at: {output_file_path}")
-
-print("All files have been processed and saved to 'data-bg-cleaned'.")
\ No newline at end of file
+source_directory = "data_encode"  # Replace with the path to the 'data-encoded' folder
+destination_directory = "data_bg_cleaned"  # Replace with the path to the 'data-bg-cleaned' folder
+
+def run(source_directory=source_directory, destination_directory=destination_directory):
+    """Remove the [background noise] tags of every .srt file under source_directory."""
+    os.makedirs(destination_directory, exist_ok=True)
+
+    with stage_metrics('bg'):
+        for root, dirs, files in os.walk(source_directory):
+            for file in files:
+                if file.endswith(".srt"):
+                    source_file_path = os.path.join(root, file)
+                    print(f"Processing file: {source_file_path}")
+                
+                    relative_path = os.path.relpath(root, source_directory)
+                    dest_folder = os.path.join(destination_directory, relative_path)
+                    os.makedirs(dest_folder, exist_ok=True)
+
+                    output_file_path = os.path.join(dest_folder, file)
+                
+                    with file_metrics('bg', source_file_path, [source_file_path], [output_file_path]) as metrics:
+                        with open(source_file_path, 'r', encoding='utf-8') as srt_file:
+                            lines = srt_file.readlines()
+
+                        with open(output_file_path, 'w', encoding='utf-8') as output_file:
+                            for line in lines:
+                                # Process only non-empty lines that don't contain timestamps
+                                if '-->' not in line and line.strip():
+                                    cleaned_line = remove_background_noise(line)
+                                    metrics.add(lines_changed=cleaned_line + '\n' != line)
+                                    output_file.write(cleaned_line + '\n')
+                                else:
+                                    metrics.add(cues='-->' in line)
+                                    output_file.write(line)
+
+                    print(f"Cleaned file saved at: {output_file_path}")
+
+    print(f"All files have been processed and saved to '{destination_directory}'.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove [background noise] tags from the subtitles.")
+    parser.add_argument('--source', default=source_directory, help="folder with the UTF-8 encoded .srt files")
+    parser.add_argument('--dest', default=destination_directory, help="folder for the tag-free .srt files")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    run(args.source, args.dest)
+
+if __name__ == "__main__":
+    main()
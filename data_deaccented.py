@@ -1,19 +1,24 @@
+import argparse
 import os
 import re
 import unicodedata
 
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
+
 def deaccent_text(text):
     # Convert accented characters to their base form
     nfkd_form = unicodedata.normalize('NFKD', text)
     return ''.join([c for c in nfkd_form if not unicodedata.combining(c)])
 
 def process_srt_file_deaccent(input_path, output_path):
+    cues = 0
     with open(input_path, 'r', encoding='utf-8') as infile, open(output_path, 'w', encoding='utf-8') as outfile:
         subtitle_text = []
         for line in infile:
             line = line.strip()
             if re.match(r'^\d+$', line) or '-->' in line:
                 # Subtitle number or timestamp - write as is
+                cues += '-->' in line
                 if subtitle_text:
                     deaccented_text = deaccent_text(' '.join(subtitle_text))
                     outfile.write(deaccented_text + '\n\n')
@@ -35,23 +40,41 @@ def process_srt_file_deaccent(input_path, output_path):
         if subtitle_text:
             deaccented_text = deaccent_text(' '.join(subtitle_text))
             outfile.write(deaccented_text + '\n')
+    return cues
 
 # Directory paths
 source_directory = "data_invalid_lang_range_cleaned"
 destination_directory = 'data_deaccented'
 
-os.makedirs(destination_directory, exist_ok=True)
+def run(source_directory=source_directory, destination_directory=destination_directory):
+    """Strip the accents of every .srt file under source_directory."""
+    os.makedirs(destination_directory, exist_ok=True)
 
-for root, dirs, files in os.walk(source_directory):
-    for file in files:
-        if file.endswith(".srt"):
-            source_file_path = os.path.join(root, file)
-            relative_path = os.path.relpath(root, source_directory)
-            dest_folder = os.path.join(destination_directory, relative_path)
-            os.makedirs(dest_folder, exist_ok=True)
-            output_file_path = os.path.join(dest_folder, file)
+    with stage_metrics('deaccent'):
+        for root, dirs, files in os.walk(source_directory):
+            for file in files:
+                if file.endswith(".srt"):
+                    source_file_path = os.path.join(root, file)
+                    relative_path = os.path.relpath(root, source_directory)
+                    dest_folder = os.path.join(destination_directory, relative_path)
+                    os.makedirs(dest_folder, exist_ok=True)
+                    output_file_path = os.path.join(dest_folder, file)
             
-            process_srt_file_deaccent(source_file_path, output_file_path)
-            print(f"Processed: {source_file_path} -> {output_file_path}")
+                    with file_metrics('deaccent', source_file_path, [source_file_path], [output_file_path]) as metrics:
+                        metrics.add(cues=process_srt_file_deaccent(source_file_path, output_file_path))
+                    print(f"Processed: {source_file_path} -> {output_file_path}")
+
+    print(f"All files have been processed and saved to '{destination_directory}'.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Strip accents from the subtitles.")
+    parser.add_argument('--source', default=source_directory, help="folder with the range cleaned .srt files")
+    parser.add_argument('--dest', default=destination_directory, help="folder for the deaccented .srt files")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    run(args.source, args.dest)
 
-print("All files have been processed and saved to 'data-deaccented'.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
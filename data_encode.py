@@ -1,26 +1,118 @@
+import argparse
+import codecs
 import os
-import chardet
+import shutil
+
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
 
 # === CONFIGURATION ===
-SOURCE_BASE_DIR = r'D:\SEMESTER_5\NLP_M2025\HIntel\NLP_Project_Hintel\data'       # Source folder (raw .srt files)
-DEST_BASE_DIR   = r'D:\SEMESTER_5\NLP_M2025\HIntel\NLP_Project_Hintel\data_encode'  # Destination folder (UTF-8 encoded files)
+SOURCE_BASE_DIR = 'data'         # Source folder (raw .srt files)
+DEST_BASE_DIR   = 'data_encode'  # Destination folder (UTF-8 encoded files)
+
+# Byte order marks, longest first since the UTF-32 LE one starts with the UTF-16 LE one
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Bytes read at a time, and at most fed to chardet when a file isn't UTF-8
+CHUNK_SIZE = 1 << 16
+SAMPLE_SIZE = 1 << 20
+
+
+def is_utf8(file_path, offset=0):
+    """Check that a file (from offset on) is valid UTF-8, without keeping it in memory."""
+    decoder = codecs.getincrementaldecoder('utf-8')('strict')
+    try:
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                decoder.decode(chunk)
+            decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
 
 
 def detect_encoding(file_path):
-    """Detect file encoding using chardet."""
+    """Detect file encoding: BOM first, then strict UTF-8, then chardet on a sample."""
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    if is_utf8(file_path):
+        return 'utf-8'
+
+    # chardet is only needed for the few files that aren't UTF-8
+    from chardet import UniversalDetector
+    detector = UniversalDetector()
     with open(file_path, 'rb') as f:
-        raw_data = f.read()
-        result = chardet.detect(raw_data)
-    return result['encoding']
+        for _ in range(SAMPLE_SIZE // CHUNK_SIZE):
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            detector.feed(chunk)
+            if detector.done:
+                break
+    detector.close()
+    return detector.result['encoding']
+
+
+def _unlink(dest_path):
+    """Remove dest_path if it exists.
+
+    An earlier run with link set may have left it a hard link to its source,
+    so it is removed rather than overwritten, which would change the source.
+    """
+    if os.path.lexists(dest_path):
+        os.remove(dest_path)
+
+
+def copy_utf8(source_path, dest_path, offset=0, link=False):
+    """Copy a file that is already UTF-8, skipping offset bytes (a BOM) at the start.
+
+    Line endings are turned into '\\n' like reading the file as text would.
+    Files with nothing to change are hard-linked if link is set.
+    """
+    with open(source_path, 'rb') as src_file:
+        src_file.seek(offset)
+        content = src_file.read()
+    _unlink(dest_path)
+    if b'\r' in content:
+        content = content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    elif offset == 0:
+        if link:
+            try:
+                os.link(source_path, dest_path)
+                return
+            except OSError:
+                pass  # e.g. a different drive or a file system without hard links
+        shutil.copyfile(source_path, dest_path)
+        return
+    with open(dest_path, 'wb') as dest_file:
+        dest_file.write(content)
 
 
-def convert_to_utf8(source_path, dest_path, src_encoding):
+def convert_to_utf8(source_path, dest_path, src_encoding, link=False):
     """Convert a single file to UTF-8 encoding."""
     try:
+        offset = len(codecs.BOM_UTF8) if src_encoding == 'utf-8-sig' else 0
+        if src_encoding == 'utf-8' or (offset and is_utf8(source_path, offset)):
+            # Already UTF-8, only the BOM (if any) has to go
+            copy_utf8(source_path, dest_path, offset, link)
+            print(f"✅ Copied: {os.path.basename(source_path)} (already UTF-8)")
+            return
+
         with open(source_path, 'r', encoding=src_encoding or 'utf-8-sig', errors='replace') as src_file:
             content = src_file.read()
 
-        with open(dest_path, 'w', encoding='utf-8') as dest_file:
+        _unlink(dest_path)
+        with open(dest_path, 'w', encoding='utf-8', newline='\n') as dest_file:
             dest_file.write(content)
 
         print(f"✅ Converted: {os.path.basename(source_path)} → UTF-8")
@@ -28,7 +120,7 @@ def convert_to_utf8(source_path, dest_path, src_encoding):
         print(f"❌ Error converting {source_path}: {e}")
 
 
-def process_folder(source_folder, dest_folder):
+def process_folder(source_folder, dest_folder, link=False):
     """Process all .srt files in a single folder."""
     os.makedirs(dest_folder, exist_ok=True)
     srt_files = [f for f in os.listdir(source_folder) if f.endswith('.srt')]
@@ -42,30 +134,48 @@ def process_folder(source_folder, dest_folder):
         dest_path = os.path.join(dest_folder, file_name)
 
         print(f"\nProcessing file: {file_name}")
-        encoding = detect_encoding(source_path)
-        print(f"Detected encoding: {encoding}")
+        with file_metrics('encode', source_path, [source_path], [dest_path]) as metrics:
+            with metrics.step('detect'):
+                encoding = detect_encoding(source_path)
+            print(f"Detected encoding: {encoding}")
 
-        convert_to_utf8(source_path, dest_path, encoding)
+            with metrics.step('convert'):
+                convert_to_utf8(source_path, dest_path, encoding, link)
 
 
-def main():
-    """Main function to walk through all data folders and convert files."""
-    if not os.path.exists(SOURCE_BASE_DIR):
-        print(f"❌ Source folder not found: {SOURCE_BASE_DIR}")
+def run(source=SOURCE_BASE_DIR, dest=DEST_BASE_DIR, link=False):
+    """Walk through all data folders of source and convert their files into dest."""
+    if not os.path.exists(source):
+        print(f"❌ Source folder not found: {source}")
         return
 
-    os.makedirs(DEST_BASE_DIR, exist_ok=True)
+    os.makedirs(dest, exist_ok=True)
 
-    for folder_name in os.listdir(SOURCE_BASE_DIR):
-        source_folder = os.path.join(SOURCE_BASE_DIR, folder_name)
+    with stage_metrics('encode'):
+        for folder_name in sorted(os.listdir(source)):
+            source_folder = os.path.join(source, folder_name)
 
-        if os.path.isdir(source_folder) and folder_name.startswith('data-'):
-            dest_folder = os.path.join(DEST_BASE_DIR, folder_name)
-            print(f"\n📂 Processing folder: {folder_name}")
-            process_folder(source_folder, dest_folder)
+            if os.path.isdir(source_folder) and folder_name.startswith('data-'):
+                dest_folder = os.path.join(dest, folder_name)
+                print(f"\n📂 Processing folder: {folder_name}")
+                process_folder(source_folder, dest_folder, link)
 
     print("\n🎉 All .srt files have been converted to UTF-8 and saved in:")
-    print(f"   {DEST_BASE_DIR}")
+    print(f"   {dest}")
+
+
+def main():
+    """Main function to convert the files of the folders given on the command line."""
+    parser = argparse.ArgumentParser(description="Convert the raw .srt files to UTF-8.")
+    parser.add_argument('--source', default=SOURCE_BASE_DIR, help="folder with the raw data-N folders")
+    parser.add_argument('--dest', default=DEST_BASE_DIR, help="folder for the UTF-8 encoded data-N folders")
+    parser.add_argument('--link', action='store_true',
+                        help="hard-link files that are already UTF-8 instead of copying them")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    run(args.source, args.dest, args.link)
 
 
 # === RUN SCRIPT ===
@@ -1,51 +1,82 @@
+import argparse
+import logging
 import os
-import re
+
+from char_tables import char_spec, translate
+from stage_metrics import SampledLog, add_metrics_arguments, configure, file_metrics, stage_metrics
+
+# Devanagari, Telugu, the danda signs and printable ASCII
+HINDI_TELUGU_SPEC = char_spec(allowed_ranges=[(0x0900, 0x097F), (0x0C00, 0x0C7F), (0x0964, 0x0965), (0x0020, 0x007F)])
 
 def remove_non_hindi_telugu(text):
-    cleaned_text = re.sub(r'[^\u0900-\u097F\u0C00-\u0C7F\u0964\u0965\u0020-\u007F]', '', text)
+    cleaned_text = translate(text, HINDI_TELUGU_SPEC)
     return cleaned_text.strip()
 
 source_directory = "data_unprintable_cleaned"  
 destination_directory = "data_invalid_lang_range_cleaned" 
 
+logger = logging.getLogger(__name__)
+
+
+def clean_file(source_file_path, output_file_path):
+    """Clean one .srt file, logging a sample of the changed lines."""
+    with file_metrics('range', source_file_path, [source_file_path], [output_file_path]) as metrics:
+        with open(source_file_path, 'r', encoding='utf-8') as srt_file:
+            lines = srt_file.readlines()
+
+        changed_lines = SampledLog(logger)
+        with open(output_file_path, 'w', encoding='utf-8') as output_file:
+            for line in lines:
+                if '-->' not in line and line.strip():
+                    cleaned_line = remove_non_hindi_telugu(line)
+
+                    if line.strip() != cleaned_line:
+                        changed_lines("Changed line:\nOriginal: %s\nCleaned: %s\n", line.strip(), cleaned_line)
+
+                    output_file.write(cleaned_line + '\n')
+                else:
+                    if '-->' in line:
+                        metrics.add(cues=1)
+                    output_file.write(line)
+        changed_lines.finish('changed lines')
+        metrics.add(lines_changed=changed_lines.count)
+
+        if not changed_lines.count:
+            logger.info("No changes made in %s.", source_file_path)
+        else:
+            logger.info("Cleaned file saved at: %s (%d lines changed)", output_file_path, changed_lines.count)
+
 
-os.makedirs(destination_directory, exist_ok=True)
+def run(source_directory=source_directory, destination_directory=destination_directory):
+    """Remove the characters outside the allowed ranges from every .srt file under source_directory."""
+    os.makedirs(destination_directory, exist_ok=True)
 
-changes_made = False
+    with stage_metrics('range'):
+        for root, dirs, files in os.walk(source_directory):
+            for file in files:
+                if file.endswith(".srt"):
+                    source_file_path = os.path.join(root, file)
+                    logger.info("\nProcessing file: %s", source_file_path)
 
-for root, dirs, files in os.walk(source_directory):
-    for file in files:
-        if file.endswith(".srt"):
-            source_file_path = os.path.join(root, file)
-            print(f"\nProcessing file: {source_file_path}")
-            
-            relative_path = os.path.relpath(root, source_directory)
-            dest_folder = os.path.join(destination_directory, relative_path)
-            os.makedirs(dest_folder, exist_ok=True)
+                    relative_path = os.path.relpath(root, source_directory)
+                    dest_folder = os.path.join(destination_directory, relative_path)
+                    os.makedirs(dest_folder, exist_ok=True)
 
-            output_file_path = os.path.join(dest_folder, file)
-            
-            with open(source_file_path, 'r', encoding='utf-8') as srt_file:
-                lines = srt_file.readlines()
+                    output_file_path = os.path.join(dest_folder, file)
+                    clean_file(source_file_path, output_file_path)
 
-            with open(output_file_path, 'w', encoding='utf-8') as output_file:
-                for line in lines:
-                    if '-->' not in line and line.strip():
-                        cleaned_line = remove_non_hindi_telugu(line)
-                        
-                        if line.strip() != cleaned_line:
-                            changes_made = True
-                            print(f"Changed line:\nOriginal: {line.strip()}\nCleaned: {cleaned_line}\n")
+    print(f"All files have been processed and saved to '{destination_directory}'.")
 
-                        output_file.write(cleaned_line + '\n')
-                    else:
-                        output_file.write(line)
 
-            if not changes_made:
-                print(f"No changes made in {source_file_path}.")
-            else:
-                print(f"Cleaned file saved at: {output_file_path}")
+def main():
+    parser = argparse.ArgumentParser(description="Remove characters outside the Hindi, Telugu and ASCII ranges.")
+    parser.add_argument('--source', default=source_directory, help="folder with the unprintable cleaned .srt files")
+    parser.add_argument('--dest', default=destination_directory, help="folder for the cleaned .srt files")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
 
-            changes_made = False
+    run(args.source, args.dest)
 
-print("All files have been processed and saved to 'data-lang-cleaned'.")
+if __name__ == "__main__":
+    main()
@@ -1,90 +1,226 @@
+import argparse
+import mmap
 import os
+import re
 import shutil
-from langdetect import detect, DetectorFactory
-from langdetect.lang_detect_exception import LangDetectException
 
-# Set seed for consistent language detection results
-DetectorFactory.seed = 0
+from stage_metrics import add_metrics_arguments, configure, count_cues, file_metrics, stage_metrics
 
 # Path to the main data folder and output folders
 data_folder = "data_number_standardized"
 cleaned_folder = "data_lang_cleaned"
 invalid_folder = "lang_clean_invalid"
 
-# List to hold the folders where files were modified
-modified_folders = []
-
-# Ensure output directories exist
-os.makedirs(cleaned_folder, exist_ok=True)
-os.makedirs(invalid_folder, exist_ok=True)
-
-# Iterate through the index folders inside the data folder
-folders = sorted(os.listdir(data_folder))
-
-# Iterate through the index folders inside the data folder
-for folder_name in folders:
-    folder_path = os.path.join(data_folder, folder_name)
-
-    # Check if it's a directory
-    if os.path.isdir(folder_path):
-        # Extract the folder index from the folder name (e.g., 'data-1' -> '1')
-        folder_index = folder_name.split('-')[-1]
-
-        # Construct file paths for Hindi and Telugu files
-        hindi_file = os.path.join(folder_path, f"hin-{folder_index}.srt")
-        telugu_file = os.path.join(folder_path, f"tel-{folder_index}.srt")
-
-        # Paths for cleaned and invalid files
-        cleaned_folder_path = os.path.join(cleaned_folder, folder_name)
-        invalid_folder_path = os.path.join(invalid_folder, folder_name)
-
-        # Ensure the cleaned folder exists
-        os.makedirs(cleaned_folder_path, exist_ok=True)
-
-        # Copy both files to the cleaned folder
-        cleaned_hindi_file = os.path.join(cleaned_folder_path, f"hin-{folder_index}.srt")
-        cleaned_telugu_file = os.path.join(cleaned_folder_path, f"tel-{folder_index}.srt")
-        shutil.copy(hindi_file, cleaned_hindi_file)
-        shutil.copy(telugu_file, cleaned_telugu_file)
-
-        try:
-            # Read and detect the language of the Hindi file
-            with open(hindi_file, 'r', encoding='utf-8') as h_file:
-                hindi_text = h_file.read()
-                try:
-                    detected_hindi_lang = detect(hindi_text)
-                except LangDetectException:
-                    detected_hindi_lang = None  # Handle cases with empty or undetectable content
-
-            # Read and detect the language of the Telugu file
-            with open(telugu_file, 'r', encoding='utf-8') as t_file:
-                telugu_text = t_file.read()
-                try:
-                    detected_telugu_lang = detect(telugu_text)
-                except LangDetectException:
-                    detected_telugu_lang = None  # Handle cases with empty or undetectable content
-
-            # If either the Hindi file is not detected as 'hi' or the Telugu file is not detected as 'te'
-            if detected_hindi_lang != 'hi' or detected_telugu_lang != 'te':
-                # Move invalid files to the invalid folder
-                os.makedirs(invalid_folder_path, exist_ok=True)
-                invalid_hindi_file = os.path.join(invalid_folder_path, f"hin-{folder_index}.srt")
-                invalid_telugu_file = os.path.join(invalid_folder_path, f"tel-{folder_index}.srt")
-                shutil.move(cleaned_hindi_file, invalid_hindi_file)
-                shutil.move(cleaned_telugu_file, invalid_telugu_file)
-
-                # Empty the corresponding files in the cleaned folder
-                open(cleaned_hindi_file, 'w').close()
-                open(cleaned_telugu_file, 'w').close()
-
-                # Track the modified folder
-                modified_folders.append(folder_name)
-
-        except Exception as e:
-            print(f"Error processing folder {folder_name}: {e}")
-
-# Print the folders where the files were emptied
-if modified_folders:
-    print(f"Cleared content of the following folders due to incorrect language detection: {', '.join(modified_folders)}")
-else:
-    print("No files were modified.")
\ No newline at end of file
+# Unicode blocks of the scripts we expect, and the language each one means
+SCRIPTS = {
+    'hi': re.compile('[\u0900-\u097f]'),  # Devanagari
+    'te': re.compile('[\u0c00-\u0c7f]'),  # Telugu
+}
+# Letters of any other script
+OTHER_LETTERS = re.compile('[^\\W\\d_\u0900-\u097f\u0c00-\u0c7f]')
+
+# The script gate decides once it has seen this many letters and one script
+# makes up at least SCRIPT_CONFIDENCE of them
+MIN_SCRIPT_LETTERS = 200
+SCRIPT_CONFIDENCE = 0.8
+
+# Average bytes per line the sampling probes a file at before reading it whole
+PROBE_BYTES = 16
+
+def _spread(count):
+    """Indices 0..count-1 in an order that samples the whole range early (0, n/2, n/4, 3n/4, ...)."""
+    seen = set()
+    step = 1 << max(count - 1, 0).bit_length()
+    while step:
+        for i in range(0, count, step):
+            if i not in seen:
+                seen.add(i)
+                yield i
+        step //= 2
+
+def _sampled_lines(buffer, newline):
+    """Lines of a str or bytes-like buffer, starting with lines spread over all of it.
+
+    Lines are probed at positions spread over the buffer (so opening credits
+    don't come first), then every line not probed yet follows in order. Only
+    the lines taken are sliced out, so a caller stopping early never reads
+    the rest of a memory-mapped file.
+    """
+    size = len(buffer)
+    seen = set()
+    for i in _spread(max(1, size // PROBE_BYTES)):
+        start = buffer.rfind(newline, 0, i * PROBE_BYTES) + 1
+        if start not in seen:
+            seen.add(start)
+            end = buffer.find(newline, start)
+            yield buffer[start:end if end != -1 else size]
+    start = 0
+    while start < size:
+        end = buffer.find(newline, start)
+        end = end if end != -1 else size
+        if start not in seen:
+            yield buffer[start:end]
+        start = end + 1
+
+def _script_language(lines):
+    """script_language of the given subtitle file lines, in the order they're sampled."""
+    counts = dict.fromkeys(list(SCRIPTS) + [None], 0)
+    for line in (part.strip() for line in lines for part in line.splitlines()):
+        # Only the subtitle text, not the numbers and timestamps
+        if not line or '-->' in line or line.isdigit():
+            continue
+        for language, pattern in SCRIPTS.items():
+            counts[language] += len(pattern.findall(line))
+        counts[None] += len(OTHER_LETTERS.findall(line))
+
+        total = sum(counts.values())
+        if total >= MIN_SCRIPT_LETTERS:
+            language = max(counts, key=counts.get)
+            if counts[language] >= SCRIPT_CONFIDENCE * total:
+                return language
+
+    total = sum(counts.values())
+    language = max(counts, key=counts.get)
+    if total and counts[language] >= SCRIPT_CONFIDENCE * total:
+        return language
+    return None
+
+def script_language(text):
+    """Guess the language of a text from the script of its letters.
+
+    Subtitle lines are sampled from all over the text (so opening credits
+    don't decide alone) until enough letters were seen for one script to
+    clearly dominate. Returns 'hi', 'te' or None if the text isn't clearly
+    in either.
+
+    Any Devanagari text counts as 'hi', so Marathi or Nepali subtitles pass
+    as Hindi, where langdetect would have told them apart.
+    """
+    return _script_language(_sampled_lines(text, '\n'))
+
+def file_language(file_path):
+    """script_language of a UTF-8 file, reading only the lines it samples."""
+    with open(file_path, 'rb') as file:
+        if not os.fstat(file.fileno()).st_size:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _script_language(line.decode('utf-8') for line in _sampled_lines(mm, b'\n'))
+
+def langdetect_language(text):
+    """Detect the language of a text with langdetect, or None if it can't be detected."""
+    # langdetect loads all its language profiles, so it's only imported when needed
+    from langdetect import detect, DetectorFactory
+    from langdetect.lang_detect_exception import LangDetectException
+
+    # Set seed for consistent language detection results
+    DetectorFactory.seed = 0
+    try:
+        return detect(text)
+    except LangDetectException:
+        return None  # Handle cases with empty or undetectable content
+
+def detect_language(text):
+    """Detect the language of a text, or None if it can't be detected.
+
+    The script gate decides almost every file; langdetect is only asked about
+    texts that aren't clearly Devanagari or Telugu.
+    """
+    return script_language(text) or langdetect_language(text)
+
+def is_valid_pair(hindi_text, telugu_text):
+    """Check that the Hindi text is detected as 'hi' and the Telugu text as 'te'."""
+    return detect_language(hindi_text) == 'hi' and detect_language(telugu_text) == 'te'
+
+def detect_file_language(file_path):
+    """detect_language of a file, only reading it whole if the script gate can't decide."""
+    language = file_language(file_path)
+    if language:
+        return language
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return langdetect_language(file.read())
+
+def is_valid_file_pair(hindi_file, telugu_file):
+    """is_valid_pair of the texts of two files."""
+    return detect_file_language(hindi_file) == 'hi' and detect_file_language(telugu_file) == 'te'
+
+def run(data_folder=data_folder, cleaned_folder=cleaned_folder, invalid_folder=invalid_folder):
+    """Copy the valid pairs of data_folder to cleaned_folder and the others to invalid_folder."""
+    # List to hold the folders where files were modified
+    modified_folders = []
+
+    # Ensure output directories exist
+    os.makedirs(cleaned_folder, exist_ok=True)
+    os.makedirs(invalid_folder, exist_ok=True)
+
+    # Iterate through the index folders inside the data folder
+    folders = sorted(os.listdir(data_folder))
+
+    # Iterate through the index folders inside the data folder
+    with stage_metrics('lang'):
+        for folder_name in folders:
+            folder_path = os.path.join(data_folder, folder_name)
+
+            # Check if it's a directory
+            if os.path.isdir(folder_path):
+                # Extract the folder index from the folder name (e.g., 'data-1' -> '1')
+                folder_index = folder_name.split('-')[-1]
+
+                # Construct file paths for Hindi and Telugu files
+                hindi_file = os.path.join(folder_path, f"hin-{folder_index}.srt")
+                telugu_file = os.path.join(folder_path, f"tel-{folder_index}.srt")
+
+                # Paths for cleaned and invalid files
+                cleaned_folder_path = os.path.join(cleaned_folder, folder_name)
+                invalid_folder_path = os.path.join(invalid_folder, folder_name)
+
+                outputs = [os.path.join(cleaned_folder_path, os.path.basename(path)) for path in (hindi_file, telugu_file)]
+                with file_metrics('lang', folder_name, [hindi_file, telugu_file], outputs) as metrics:
+                    try:
+                        # The files are only read as far as detecting their language needs
+                        valid = is_valid_file_pair(hindi_file, telugu_file)
+                        if metrics.enabled:
+                            for path in (hindi_file, telugu_file):
+                                with open(path, 'r', encoding='utf-8') as file:
+                                    metrics.add(cues=count_cues(file.read()))
+                    except Exception as e:
+                        print(f"Error processing folder {folder_name}: {e}")
+                        valid = True  # keep the files as they are
+
+                    # Copy both files to the cleaned folder, or, if either the Hindi file is not
+                    # detected as 'hi' or the Telugu file is not detected as 'te', to the invalid
+                    # folder and leave empty files in the cleaned folder
+                    os.makedirs(cleaned_folder_path, exist_ok=True)
+                    cleaned_hindi_file = os.path.join(cleaned_folder_path, f"hin-{folder_index}.srt")
+                    cleaned_telugu_file = os.path.join(cleaned_folder_path, f"tel-{folder_index}.srt")
+                    if valid:
+                        shutil.copy(hindi_file, cleaned_hindi_file)
+                        shutil.copy(telugu_file, cleaned_telugu_file)
+                    else:
+                        os.makedirs(invalid_folder_path, exist_ok=True)
+                        shutil.copy(hindi_file, os.path.join(invalid_folder_path, f"hin-{folder_index}.srt"))
+                        shutil.copy(telugu_file, os.path.join(invalid_folder_path, f"tel-{folder_index}.srt"))
+                        open(cleaned_hindi_file, 'w').close()
+                        open(cleaned_telugu_file, 'w').close()
+
+                        # Track the modified folder
+                        modified_folders.append(folder_name)
+
+    # Print the folders where the files were emptied
+    if modified_folders:
+        print(f"Cleared content of the following folders due to incorrect language detection: {', '.join(modified_folders)}")
+    else:
+        print("No files were modified.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Empty the pairs whose files aren't in Hindi and Telugu.")
+    parser.add_argument('--source', default=data_folder, help="folder with the number standardized data-N folders")
+    parser.add_argument('--dest', default=cleaned_folder, help="folder for the checked data-N folders")
+    parser.add_argument('--invalid', default=invalid_folder, help="folder for the pairs that aren't Hindi and Telugu")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    run(args.source, args.dest, args.invalid)
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,31 @@
+import argparse
 import os
 import re
 
+from char_tables import char_spec, translate
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
+
+# Indic to Arabic numeral mapping (Hindi and Bengali numerals)
+NUMBERS_SPEC = char_spec(mapping={
+    '०': '0', '१': '1', '२': '2', '३': '3', '४': '4',
+    '५': '5', '६': '6', '७': '7', '८': '8', '९': '9',
+    '১': '1', '২': '2', '৩': '3', '৪': '4',
+    '৫': '5', '৬': '6', '৭': '7', '৮': '8', '৯': '9'
+})
+
 def standardize_numbers(text):
-    # Define a dictionary for Indic to Arabic numeral mapping (Hindi and Bengali numerals)
-    indic_to_arabic = {
-        '०': '0', '१': '1', '२': '2', '३': '3', '४': '4',
-        '५': '5', '६': '6', '७': '7', '८': '8', '९': '9',
-        '১': '1', '২': '2', '৩': '3', '৪': '4', 
-        '৫': '5', '৬': '6', '৭': '7', '৮': '8', '৯': '9'
-    }
-    
-    # Replace all Indic numerals with Arabic numerals using regex
-    def replace_indic_numerals(match):
-        return indic_to_arabic.get(match.group(0), match.group(0))
-    
     # Replace any Indic numeral found in the text
-    return re.sub(r'[०-९১-৯]', replace_indic_numerals, text)
+    return translate(text, NUMBERS_SPEC)
 
 def process_srt_file_with_numbers(input_path, output_path):
+    cues = 0
     with open(input_path, 'r', encoding='utf-8') as infile, open(output_path, 'w', encoding='utf-8') as outfile:
         subtitle_text = []
         for line in infile:
             line = line.strip()
             if re.match(r'^\d+$', line) or '-->' in line:
                 # Subtitle number or timestamp - write as is
+                cues += '-->' in line
                 if subtitle_text:
                     standardized_text = standardize_numbers(' '.join(subtitle_text))
                     outfile.write(standardized_text + '\n\n')
@@ -45,23 +47,41 @@ def process_srt_file_with_numbers(input_path, output_path):
         if subtitle_text:
             standardized_text = standardize_numbers(' '.join(subtitle_text))
             outfile.write(standardized_text + '\n')
+    return cues
 
 # Directory paths
 source_directory = r"./data_punctuation_standardized"
 destination_directory = r"./data_number_standardized"
 
-os.makedirs(destination_directory, exist_ok=True)
+def run(source_directory=source_directory, destination_directory=destination_directory):
+    """Replace the Indic numerals of every .srt file under source_directory."""
+    os.makedirs(destination_directory, exist_ok=True)
 
-for root, dirs, files in os.walk(source_directory):
-    for file in files:
-        if file.endswith(".srt"):
-            source_file_path = os.path.join(root, file)
-            relative_path = os.path.relpath(root, source_directory)
-            dest_folder = os.path.join(destination_directory, relative_path)
-            os.makedirs(dest_folder, exist_ok=True)
-            output_file_path = os.path.join(dest_folder, file)
+    with stage_metrics('numbers'):
+        for root, dirs, files in os.walk(source_directory):
+            for file in files:
+                if file.endswith(".srt"):
+                    source_file_path = os.path.join(root, file)
+                    relative_path = os.path.relpath(root, source_directory)
+                    dest_folder = os.path.join(destination_directory, relative_path)
+                    os.makedirs(dest_folder, exist_ok=True)
+                    output_file_path = os.path.join(dest_folder, file)
             
-            process_srt_file_with_numbers(source_file_path, output_file_path)
-            print(f"Processed: {source_file_path} -> {output_file_path}")
+                    with file_metrics('numbers', source_file_path, [source_file_path], [output_file_path]) as metrics:
+                        metrics.add(cues=process_srt_file_with_numbers(source_file_path, output_file_path))
+                    print(f"Processed: {source_file_path} -> {output_file_path}")
+
+    print(f"All files have been processed and saved to '{destination_directory}'.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replace Indic numerals with Arabic ones.")
+    parser.add_argument('--source', default=source_directory, help="folder with the punctuation standardized .srt files")
+    parser.add_argument('--dest', default=destination_directory, help="folder for the standardized .srt files")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    run(args.source, args.dest)
 
-print("All files have been processed and saved to 'data-number-standardized'.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,71 @@
+import argparse
 import os
 import re
 import unicodedata
 
-def expanded_standardize_punctuation(text):
-    # Expanded punctuation mapping
-    punct_map = {
-        # Basic punctuation
-        '।': '.', # Hindi full stop to period
-        '॥': '.', # Hindi double danda to period
-        'ред': '.', # Telugu full stop to period
-        '…': '...', # Ellipsis
-        '‥': '..', # Two-dot leader to double period
-        
-        # Quotes
-        ''': "'", ''': "'", # Single quotes
-        '"': '"', '"': '"', # Double quotes
-        '„': '"', '‟': '"', # Double low-9 quotation mark and reversed double quotation mark
-        '「': '"', '」': '"', # Corner brackets as quotes
-        '『': ''', '』': ''', # White corner brackets as single quotes
-        
-        # Dashes and Hyphens
-        '—': '-', '–': '-', # Em dash and en dash to hyphen
-        '‐': '-', '‑': '-', '‒': '-', # Various Unicode hyphens to ASCII hyphen
-        
-        # Other punctuation
-        '،': ',', # Arabic comma to comma
-        '、': ',', # Ideographic comma to comma
-        '；': ';', # Fullwidth semicolon to semicolon
-        '：': ':', # Fullwidth colon to colon
-        '！': '!', # Fullwidth exclamation mark to ASCII
-        '？': '?', # Fullwidth question mark to ASCII
-        '（': '(', '）': ')', # Fullwidth parentheses to ASCII
-        '［': '[', '］': ']', # Fullwidth square brackets to ASCII
-        '｛': '{', '｝': '}', # Fullwidth curly braces to ASCII
-        '《': '<', '》': '>', # Double angle brackets to less/greater than
-        '〈': '<', '〉': '>', # Single angle brackets to less/greater than
-        
-        # Hindi-specific
-        '॰': '.', # Abbreviation sign to period
-        
-        # Telugu-specific
-        'ఽ': "'", # Telugu sign avagraha to apostrophe
-    }
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
+
+# Expanded punctuation mapping
+PUNCT_MAP = {
+    # Basic punctuation
+    '।': '.', # Hindi full stop to period
+    '॥': '.', # Hindi double danda to period
+    'ред': '.', # Telugu full stop to period
+    '…': '...', # Ellipsis
+    '‥': '..', # Two-dot leader to double period
+    
+    # Quotes
+    ''': "'", ''': "'", # Single quotes
+    '"': '"', '"': '"', # Double quotes
+    '„': '"', '‟': '"', # Double low-9 quotation mark and reversed double quotation mark
+    '「': '"', '」': '"', # Corner brackets as quotes
+    '『': ''', '』': ''', # White corner brackets as single quotes
+    
+    # Dashes and Hyphens
+    '—': '-', '–': '-', # Em dash and en dash to hyphen
+    '‐': '-', '‑': '-', '‒': '-', # Various Unicode hyphens to ASCII hyphen
+    
+    # Other punctuation
+    '،': ',', # Arabic comma to comma
+    '、': ',', # Ideographic comma to comma
+    '；': ';', # Fullwidth semicolon to semicolon
+    '：': ':', # Fullwidth colon to colon
+    '！': '!', # Fullwidth exclamation mark to ASCII
+    '？': '?', # Fullwidth question mark to ASCII
+    '（': '(', '）': ')', # Fullwidth parentheses to ASCII
+    '［': '[', '］': ']', # Fullwidth square brackets to ASCII
+    '｛': '{', '｝': '}', # Fullwidth curly braces to ASCII
+    '《': '<', '》': '>', # Double angle brackets to less/greater than
+    '〈': '<', '〉': '>', # Single angle brackets to less/greater than
+    
+    # Hindi-specific
+    '॰': '.', # Abbreviation sign to period
     
+    # Telugu-specific
+    'ఽ': "'", # Telugu sign avagraha to apostrophe
+}
+
+# The mapping as one str.translate table. Like the original per-character
+# re.sub over [^\w\s], it only covers single characters that are neither
+# word characters nor whitespace.
+PUNCT_TABLE = str.maketrans({char: replacement for char, replacement in PUNCT_MAP.items()
+                             if len(char) == 1 and re.fullmatch(r'[^\w\s]', char)})
+# Most subtitles contain none of them, and searching is cheaper than translating
+PUNCT_CHARS = re.compile('[%s]' % re.escape(''.join(map(chr, PUNCT_TABLE))))
+
+# Whitespace around a punctuation mark, or whitespace other than a single space
+SPACING = re.compile(r'\s*([.,:;!?])\s*|\s{2,}|[^\S ]')
+
+def _spacing(match):
+    # No space before punctuation, one after it and between words
+    punct = match.group(1)
+    return punct + ' ' if punct else ' '
+
+def _multipass_standardize_punctuation(text):
+    """The step by step version of expanded_standardize_punctuation."""
     def replace_punct(match):
         char = match.group(0)
-        return punct_map.get(char, char)
+        return PUNCT_MAP.get(char, char)
     
     # Replace punctuation using the mapping
     text = re.sub(r'[^\w\s]', replace_punct, text)
@@ -73,13 +93,31 @@ def expanded_standardize_punctuation(text):
     
     return text.strip()
 
+def expanded_standardize_punctuation(text):
+    """Map punctuation to ASCII and standardize the spacing around it.
+
+    Once the punctuation has a space after it, repeated marks can't follow
+    each other anymore and the spaces after sentence ends are collapsed
+    anyway, so one pass over the whitespace gives the same result as the
+    separate rules in _multipass_standardize_punctuation.
+    """
+    if '\n' in text:
+        # Rules for line starts and ends only matter with several lines
+        return _multipass_standardize_punctuation(text)
+    if PUNCT_CHARS.search(text):
+        text = text.translate(PUNCT_TABLE)
+    text = unicodedata.normalize('NFKC', text)
+    return SPACING.sub(_spacing, text).strip()
+
 def process_srt_file(input_path, output_path):
+    cues = 0
     with open(input_path, 'r', encoding='utf-8') as infile, open(output_path, 'w', encoding='utf-8') as outfile:
         subtitle_text = []
         for line in infile:
             line = line.strip()
             if re.match(r'^\d+$', line) or '-->' in line:
                 # Subtitle number or timestamp - write as is
+                cues += '-->' in line
                 if subtitle_text:
                     standardized_text = expanded_standardize_punctuation(' '.join(subtitle_text))
                     outfile.write(standardized_text + '\n\n')
@@ -101,23 +139,41 @@ def process_srt_file(input_path, output_path):
         if subtitle_text:
             standardized_text = expanded_standardize_punctuation(' '.join(subtitle_text))
             outfile.write(standardized_text + '\n')
+    return cues
 
 # Directory paths
 source_directory = r"./data_bg_cleaned"
 destination_directory = r"./data_punctuation_standardized"
 
-os.makedirs(destination_directory, exist_ok=True)
+def run(source_directory=source_directory, destination_directory=destination_directory):
+    """Standardize the punctuation of every .srt file under source_directory."""
+    os.makedirs(destination_directory, exist_ok=True)
 
-for root, dirs, files in os.walk(source_directory):
-    for file in files:
-        if file.endswith(".srt"):
-            source_file_path = os.path.join(root, file)
-            relative_path = os.path.relpath(root, source_directory)
-            dest_folder = os.path.join(destination_directory, relative_path)
-            os.makedirs(dest_folder, exist_ok=True)
-            output_file_path = os.path.join(dest_folder, file)
+    with stage_metrics('punctuation'):
+        for root, dirs, files in os.walk(source_directory):
+            for file in files:
+                if file.endswith(".srt"):
+                    source_file_path = os.path.join(root, file)
+                    relative_path = os.path.relpath(root, source_directory)
+                    dest_folder = os.path.join(destination_directory, relative_path)
+                    os.makedirs(dest_folder, exist_ok=True)
+                    output_file_path = os.path.join(dest_folder, file)
             
-            process_srt_file(source_file_path, output_file_path)
-            print(f"Processed: {source_file_path} -> {output_file_path}")
+                    with file_metrics('punctuation', source_file_path, [source_file_path], [output_file_path]) as metrics:
+                        metrics.add(cues=process_srt_file(source_file_path, output_file_path))
+                    print(f"Processed: {source_file_path} -> {output_file_path}")
+
+    print(f"All files have been processed and saved to '{destination_directory}'.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Standardize the punctuation of the subtitles.")
+    parser.add_argument('--source', default=source_directory, help="folder with the tag-free .srt files")
+    parser.add_argument('--dest', default=destination_directory, help="folder for the standardized .srt files")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    run(args.source, args.dest)
 
-print("All files have been processed and saved to 'data_punctuation_standardized'.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
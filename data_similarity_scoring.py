@@ -1,14 +1,117 @@
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import argparse
 import os
-from collections import defaultdict
-import re
-from typing import List, Tuple, Set, Dict
+from functools import lru_cache
+import sys
+from typing import TYPE_CHECKING, List, Tuple, Set
 import unicodedata
+import corpus_columns
+from corpus_columns import carried_columns, is_table, read_table, table_suffix, write_table
+from build_cache import BuildCache, stage_hash
+import char_tables
+from char_tables import CodepointTable
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
+
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Number of distinct sentences whose structure and normalized form are remembered
+SENTENCE_CACHE_SIZE = 1 << 16
+
+def _char_structure(c: str) -> str:
+    """Structural feature of one character: itself if space or punctuation, else its category."""
+    category = unicodedata.category(c)
+    return c if c.isspace() or category.startswith('P') else category
+
+def _char_normalized(c: str) -> str:
+    """NFKD decomposition of one character without its combining marks."""
+    return ''.join(d for d in unicodedata.normalize('NFKD', c) if not unicodedata.combining(d))
+
+STRUCTURE_TABLE = CodepointTable(_char_structure)
+# NFKD works character by character apart from reordering combining marks,
+# which are all dropped, so it can be applied through a table too
+NORMALIZE_TABLE = CodepointTable(_char_normalized)
+
+@lru_cache(maxsize=SENTENCE_CACHE_SIZE)
+def text_structure(text: str) -> str:
+    """Replace every character but spaces and punctuation with its Unicode category."""
+    return text.translate(STRUCTURE_TABLE)
+
+class StructureArrays:
+    """STRUCTURE_TABLE as NumPy arrays, to compute the structure of many texts at once.
+
+    Every character's structure is one or two characters long (itself or its
+    category), stored as the code points first and second (0 if there is none).
+    Code points missing from the arrays are looked up in the table when seen.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.first = np.zeros(sys.maxunicode + 1, dtype=np.uint32)
+        self.second = np.zeros(sys.maxunicode + 1, dtype=np.uint32)
+        self.known = np.zeros(sys.maxunicode + 1, dtype=bool)
+        self._add(list(table))
+
+    def _add(self, codepoints):
+        for codepoint in codepoints:
+            value = self.table[codepoint]
+            self.first[codepoint] = ord(value[0])
+            self.second[codepoint] = ord(value[1]) if len(value) > 1 else 0
+            self.known[codepoint] = True
+
+    def __call__(self, texts: List[str]) -> List[str]:
+        """The structure of every text."""
+        codepoints = np.frombuffer(''.join(texts).encode('utf-32-le'), dtype=np.uint32)
+        unknown = ~self.known[codepoints]
+        if unknown.any():
+            self._add(np.unique(codepoints[unknown]).tolist())
+
+        first = self.first[codepoints]
+        second = self.second[codepoints]
+        has_second = second != 0
+        lengths = 1 + has_second
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        output = np.empty(int(ends[-1]) if len(ends) else 0, dtype=np.uint32)
+        output[starts] = first
+        output[starts[has_second] + 1] = second[has_second]
+        structure = output.tobytes().decode('utf-32-le')
+
+        # Cut the joined structure back into one string per text
+        text_ends = np.cumsum([len(text) for text in texts], dtype=np.int64)
+        bounds = [0] + np.concatenate(([0], ends))[text_ends].tolist()
+        return [structure[start:end] for start, end in zip(bounds, bounds[1:])]
+
+@lru_cache(maxsize=None)
+def _structure_arrays() -> StructureArrays:
+    return StructureArrays(STRUCTURE_TABLE)
+
+def text_structures(texts: List[str]) -> List[str]:
+    """text_structure of many texts at once."""
+    return _structure_arrays()(texts)
+
+@lru_cache(maxsize=SENTENCE_CACHE_SIZE)
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and strip diacritics."""
+    return ' '.join(text.split()).translate(NORMALIZE_TABLE)
+
+def char_ngrams(text: str, n_range: Tuple[int, int] = (1, 3)) -> Set[str]:
+    """Character n-grams of the normalized text."""
+    ngrams = set()
+    normalized_text = normalize_text(text)
+    for n in range(n_range[0], n_range[1] + 1):
+        for i in range(len(normalized_text) - n + 1):
+            ngrams.add(normalized_text[i:i+n])
+    return ngrams
 
 class AdvancedSimilarityCalculator:
+    # Weights of the char, structural and length similarities in the combined score
+    weights = (0.5, 0.3, 0.2)
+
     def __init__(self):
+        # sklearn takes about a second to import, so it's only imported once a calculator is made
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
         self.char_vectorizer = TfidfVectorizer(
             lowercase=False, 
             analyzer='char',
@@ -23,28 +126,16 @@ class AdvancedSimilarityCalculator:
     
     def _normalize_text(self, text: str) -> str:
         """Normalize text by removing extra spaces and diacritics."""
-        text = ' '.join(text.split())
-        return ''.join(c for c in unicodedata.normalize('NFKD', text)
-                      if not unicodedata.combining(c))
+        return normalize_text(text)
     
     def _get_text_structure(self, text: str) -> str:
         """Extract structural features from text."""
-        # Replace characters with their Unicode category
-        structure = [unicodedata.category(c) for c in text]
-        # Keep spaces and punctuation
-        for i, c in enumerate(text):
-            if c.isspace() or unicodedata.category(c).startswith('P'):
-                structure[i] = c
-        return ''.join(structure)
+        # Characters are replaced with their Unicode category, keeping spaces and punctuation
+        return text_structure(text)
     
     def _get_ngrams(self, text: str, n_range: Tuple[int, int] = (1, 3)) -> Set[str]:
         """Generate character n-grams from text."""
-        ngrams = set()
-        normalized_text = self._normalize_text(text)
-        for n in range(n_range[0], n_range[1] + 1):
-            for i in range(len(normalized_text) - n + 1):
-                ngrams.add(normalized_text[i:i+n])
-        return ngrams
+        return char_ngrams(text, n_range)
 
     def calculate_similarity_score(self, text1: str, text2: str) -> float:
         """Calculate a combined similarity score."""
@@ -54,7 +145,7 @@ class AdvancedSimilarityCalculator:
         length_similarity = self._calculate_length_similarity(text1, text2)
         
         # Weighted combination of similarities
-        weights = [0.5, 0.3, 0.2]  # Adjust these weights as needed
+        weights = self.weights
         combined_score = (
             weights[0] * char_similarity +
             weights[1] * struct_similarity +
@@ -62,8 +153,45 @@ class AdvancedSimilarityCalculator:
         )
         return combined_score
 
+    def calculate_similarity_scores(self, texts1: List[str], texts2: List[str],
+                                    per_pair: bool = False) -> np.ndarray:
+        """Calculate the combined similarity score of every pair (texts1[i], texts2[i]).
+
+        The vectorizers are fitted once on all the given texts, so the IDF
+        weights come from the whole batch. With per_pair they are fitted on
+        each pair alone, exactly like calculate_similarity_score.
+        """
+        if per_pair:
+            return np.array([self.calculate_similarity_score(text1, text2)
+                             for text1, text2 in zip(texts1, texts2)])
+
+        char_similarity = self._paired_cosine_similarity(self.char_vectorizer, texts1, texts2)
+        struct_similarity = self._paired_cosine_similarity(
+            self.structure_vectorizer, text_structures(texts1), text_structures(texts2))
+        len1 = np.array([len(text) for text in texts1])
+        len2 = np.array([len(text) for text in texts2])
+        # Same as _calculate_length_similarity, which also gives 1 for two empty texts
+        length_similarity = 1 - np.abs(len1 - len2) / np.maximum(np.maximum(len1, len2), 1)
+
+        weights = self.weights
+        return (weights[0] * char_similarity +
+                weights[1] * struct_similarity +
+                weights[2] * length_similarity)
+
+    @staticmethod
+    def _paired_cosine_similarity(vectorizer: 'TfidfVectorizer', texts1: List[str], texts2: List[str]) -> np.ndarray:
+        """Cosine similarity of texts1[i] and texts2[i] for every i, fitting the vectorizer once."""
+        try:
+            vectors = vectorizer.fit_transform(list(texts1) + list(texts2))
+        except ValueError:
+            return np.zeros(len(texts1))
+        # TF-IDF rows are L2-normalized, so the cosine is the dot product of matching rows
+        count = len(texts1)
+        return np.asarray(vectors[:count].multiply(vectors[count:]).sum(axis=1)).ravel()
+
     def _calculate_char_similarity(self, text1: str, text2: str) -> float:
         """Calculate character-level similarity."""
+        from sklearn.metrics.pairwise import cosine_similarity
         try:
             vectors = self.char_vectorizer.fit_transform([text1, text2])
             return cosine_similarity(vectors[0:1], vectors[1:2])[0][0]
@@ -72,6 +200,7 @@ class AdvancedSimilarityCalculator:
 
     def _calculate_structural_similarity(self, text1: str, text2: str) -> float:
         """Calculate structural similarity."""
+        from sklearn.metrics.pairwise import cosine_similarity
         struct1 = self._get_text_structure(text1)
         struct2 = self._get_text_structure(text2)
         try:
@@ -81,15 +210,21 @@ class AdvancedSimilarityCalculator:
             return 0.0
 
     def _calculate_length_similarity(self, text1: str, text2: str) -> float:
-        """Calculate length-based similarity."""
+        """Calculate length-based similarity; two empty texts count as the same length."""
         len1, len2 = len(text1), len(text2)
-        return 1 - abs(len1 - len2) / max(len1, len2)
+        return 1 - abs(len1 - len2) / max(len1, len2, 1)
 
 class ParallelTextProcessor:
-    def __init__(self, calculator: AdvancedSimilarityCalculator):
+    def __init__(self, calculator: AdvancedSimilarityCalculator, per_pair: bool = False):
         self.calculator = calculator
+        # Fit the vectorizers on every pair alone instead of once per file
+        self.per_pair = per_pair
     
     def load_tokenized_data(self, file_path: str) -> Tuple[List[str], List[str]]:
+        if is_table(file_path):
+            # Tables keep every pair, also those with tabs or nothing on one side
+            table = read_table(file_path, ['hindi', 'telugu'])
+            return list(table['hindi']), list(table['telugu'])
         hindi_texts, telugu_texts = [], []
         with open(file_path, 'r', encoding='utf-8') as f:
             for line in f:
@@ -101,34 +236,62 @@ class ParallelTextProcessor:
                     print(f"Skipping malformed line: {line.strip()}")
         return hindi_texts, telugu_texts
     
-    def process_file(self, input_path: str, output_path: str) -> None:
-        hindi_texts, telugu_texts = self.load_tokenized_data(input_path)
-        
-        if not hindi_texts or not telugu_texts:
-            print(f"Skipping empty file: {input_path}")
-            return
-        
-        similarities = [
-            self.calculator.calculate_similarity_score(h, t)
-            for h, t in zip(hindi_texts, telugu_texts)
-        ]
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write("Hindi\tTelugu\tSimilarity_Score\n")
-            for h, t, s in zip(hindi_texts, telugu_texts, similarities):
-                f.write(f"{h}\t{t}\t{s:.4f}\n")
+    def process_file(self, input_path: str, output_path: str) -> bool:
+        """Score one tokenized file, returning False if it was empty and skipped.
+
+        If output_path is a table, the texts and scores are written as one,
+        together with the film and cue times of the input.
+        """
+        with file_metrics('score', input_path, [input_path], [output_path]) as metrics:
+            hindi_texts, telugu_texts = self.load_tokenized_data(input_path)
+            
+            if not hindi_texts or not telugu_texts:
+                print(f"Skipping empty file: {input_path}")
+                return False
+            metrics.add(cues=len(hindi_texts))
+            
+            similarities = self.calculator.calculate_similarity_scores(
+                hindi_texts, telugu_texts, per_pair=self.per_pair)
+            
+            if is_table(output_path):
+                write_table(output_path, dict(carried_columns(input_path, len(hindi_texts)),
+                                              hindi=hindi_texts, telugu=telugu_texts, score=similarities))
+                return True
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write("Hindi\tTelugu\tSimilarity_Score\n")
+                for h, t, s in zip(hindi_texts, telugu_texts, similarities):
+                    f.write(f"{h}\t{t}\t{s:.4f}\n")
+        return True
 
-def process_directory(input_dir: str, output_dir: str) -> None:
+def process_directory(input_dir: str, output_dir: str, force: bool = False, per_pair: bool = False,
+                      output_format: str = 'tsv') -> None:
+    """Score every tokenized file, skipping files unchanged since the last run.
+
+    The input files may be TSV files or column tables; with output_format
+    'columnar' the scores are written as column tables (see corpus_columns).
+    """
     os.makedirs(output_dir, exist_ok=True)
     calculator = AdvancedSimilarityCalculator()
-    processor = ParallelTextProcessor(calculator)
+    processor = ParallelTextProcessor(calculator, per_pair=per_pair)
+    # The structure and normalization tables are built by char_tables
+    source_files = [__file__, char_tables.__file__]
+    suffix = '.tsv'
+    if output_format == 'columnar':
+        source_files.append(corpus_columns.__file__)
+        suffix = table_suffix()
+    cache = BuildCache(output_dir, stage_hash(source_files, {'per_pair': per_pair}), force=force)
     
-    for filename in os.listdir(input_dir):
-        if filename.endswith('.tsv'):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, f'similarity_{filename}')
-            processor.process_file(input_path, output_path)
-            print(f"Processed {filename}")
+    filenames = [filename for filename in os.listdir(input_dir) if filename.endswith('.tsv') or is_table(filename)]
+    cache.prune(filenames)
+    for filename in filenames:
+        input_path = os.path.join(input_dir, filename)
+        output_path = os.path.join(output_dir, f'similarity_{os.path.splitext(filename)[0]}{suffix}')
+        if cache.is_fresh(filename, [input_path]):
+            continue
+        written = processor.process_file(input_path, output_path)
+        cache.record(filename, [input_path], [output_path] if written else [])
+        print(f"Processed {filename}")
+    cache.save()
 
 def run_tests() -> None:
     calculator = AdvancedSimilarityCalculator()
@@ -153,10 +316,29 @@ def run_tests() -> None:
         similarity = calculator.calculate_similarity_score(hindi, telugu)
         print(f"Similarity score: {similarity:.4f}")
 
-if __name__ == "__main__":
+def run(input_dir: str = 'data_tokenized', output_dir: str = 'data_similarity_scoring',
+        force: bool = False, per_pair: bool = False, output_format: str = 'tsv') -> None:
+    """Score the tokenized files of input_dir into output_dir as a pipeline stage."""
+    with stage_metrics('score'):
+        process_directory(input_dir, output_dir, force=force, per_pair=per_pair, output_format=output_format)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score the similarity of the tokenized sentence pairs.")
+    parser.add_argument('--source', default='data_tokenized', help="folder with the tokenized TSV files or tables")
+    parser.add_argument('--dest', default='data_similarity_scoring', help="folder for the scored TSV files")
+    parser.add_argument('--force', action='store_true', help="rescore every file, ignoring the build cache")
+    parser.add_argument('--per-pair', action='store_true',
+                        help="fit the TF-IDF vectorizers on every pair alone (slow) instead of once per file")
+    parser.add_argument('--format', default='tsv', choices=['tsv', 'columnar'],
+                        help="write TSV files or column tables with the scores (see corpus_columns)")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
     run_tests()
     
     print("\nProcessing actual files...")
-    input_dir = 'data_tokenized'
-    output_dir = 'data_similarity_scoring'
-    process_directory(input_dir, output_dir)
\ No newline at end of file
+    run(args.source, args.dest, force=args.force, per_pair=args.per_pair, output_format=args.format)
+
+if __name__ == "__main__":
+    main()
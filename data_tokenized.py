@@ -1,104 +1,381 @@
+import argparse
+import heapq
 import os
 import re
-from collections import defaultdict
-from transformers import AutoTokenizer
+import string
+import unicodedata
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from functools import lru_cache
+from itertools import chain, islice
+import numpy as np
+import corpus_columns
+from corpus_columns import carried_columns, is_table, read_table, table_suffix, write_table
+from build_cache import BuildCache, stage_hash
+from parallel_runner import add_jobs_argument, run_parallel
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
+
+# Number of distinct words whose split BPE.tokenize remembers
+WORD_CACHE_SIZE = 1 << 16
+# Lines read at a time by the streaming mode, which bounds its memory use
+STREAM_CHUNK_LINES = 4096
+
+# Characters Unicode marks as White_Space (str.isspace() also accepts \x1c-\x1f)
+WHITESPACE = ('\t\n\x0b\x0c\r\x20\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005'
+              '\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000')
+
+MODEL_HEADER = '#bpe-merges vocab_size='
+
+# Merges files written next to the tokenized data, one per language
+MODEL_FILES = {'hindi': 'hindi.bpe', 'telugu': 'telugu.bpe'}
+
+# Vocabularies of the token ids, one token per line in id order
+VOCAB_FILES = {'hindi': 'hindi.vocab', 'telugu': 'telugu.vocab'}
+# Folder of the token-id shards in each output folder
+IDS_DIR = 'ids'
+
+@lru_cache(maxsize=None)
+def _pre_tokenizer_pattern():
+    """Regex matching the words and punctuation marks pre_tokenize splits text into."""
+    # ASCII punctuation plus every Unicode punctuation character; there are
+    # none beyond the first two planes, so only those are scanned
+    punctuation = set(string.punctuation)
+    punctuation.update(c for c in map(chr, range(0x20000)) if unicodedata.category(c).startswith('P'))
+    punctuation = re.escape(''.join(sorted(punctuation)))
+    whitespace = re.escape(WHITESPACE)
+    return re.compile(f'[^{whitespace}{punctuation}]+|[{punctuation}]')
+
+def pre_tokenize(text):
+    """Split text into words the same way as BERT's pre-tokenizer.
+
+    Whitespace separates words and is dropped; every punctuation character
+    becomes a word of its own.
+    """
+    return _pre_tokenizer_pattern().findall(text)
+
+def count_words(texts):
+    """Count the pre-tokenized words of several texts, in order of first appearance."""
+    # Whitespace never ends up in a word, so the texts can be split in one go
+    return Counter(pre_tokenize('\n'.join(texts)))
 
 class BPE():
     """Byte-Pair Encoding: Subword-based tokenization algorithm."""
 
-    def __init__(self, corpus, vocab_size):
+    def __init__(self, corpus, vocab_size, cache_size=WORD_CACHE_SIZE):
         """Initialize BPE tokenizer."""
         self.corpus = corpus
         self.vocab_size = vocab_size
-        self.tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
         self.word_freqs = defaultdict(int)
         self.splits = {}
         self.merges = {}
+        # Subtitle vocabulary is very repetitive, so most words are cache hits
+        self.cache_size = cache_size
+        # Size of the vocabulary before any merge, known once trained
+        self.base_vocab_size = None
+        self._encoders = {}
 
-    def train(self):
-        """Train BPE tokenizer."""
+    def train(self, word_freqs=None):
+        """Train BPE tokenizer.
+
+        word_freqs, as returned by count_words, can be given instead of a corpus.
+        """
         # Count word frequencies
-        for text in self.corpus:
-            words_with_offsets = self.tokenizer.backend_tokenizer.pre_tokenizer.pre_tokenize_str(text)
-            new_words = [word for word, offset in words_with_offsets]
-            for word in new_words:
-                self.word_freqs[word] += 1
+        if word_freqs is None:
+            word_freqs = count_words(self.corpus)
+        self.word_freqs.update(word_freqs)
 
         # Create the base vocabulary from the corpus
         alphabet = sorted(set(char for word in self.word_freqs for char in word))
         vocab = ["</w>"] + alphabet.copy()
+        self.base_vocab_size = len(vocab)
 
         # Split each word into individual characters before training
         self.splits = {word: [c for c in word] for word in self.word_freqs.keys()}
 
+        # Words are referred to by their position in word_freqs, which is also
+        # the order the original full rescan visited them in
+        words = list(self.word_freqs)
+        freqs = [self.word_freqs[word] for word in words]
+        splits = [self.splits[word] for word in words]
+
+        pair_freqs = defaultdict(int)
+        pair_words = defaultdict(set)
+        for rank, split in enumerate(splits):
+            for pair in zip(split, split[1:]):
+                pair_freqs[pair] += freqs[rank]
+                pair_words[pair].add(rank)
+        first_word = {pair: min(ranks) for pair, ranks in pair_words.items()}
+
+        # Max-heap of (-frequency, first word, first position, pair). Ties go to the
+        # pair seen first when scanning words in order, like max() over a freshly
+        # computed pair_freqs dict does. Outdated entries are skipped when popped.
+        heap = []
+        current = {}
+
+        def push(pair):
+            split = splits[first_word[pair]]
+            position = next(i for i in range(len(split) - 1) if split[i] == pair[0] and split[i + 1] == pair[1])
+            entry = (-pair_freqs[pair], first_word[pair], position)
+            if current.get(pair) != entry:
+                current[pair] = entry
+                heapq.heappush(heap, entry + (pair,))
+
+        for pair in pair_freqs:
+            push(pair)
+
         # Merge the most frequent pairs until the vocabulary size is reached
         while len(vocab) < self.vocab_size:
-            pair_freqs = self.compute_pair_freqs()
-            if not pair_freqs:
+            while heap and current.get(heap[0][3]) != heap[0][:3]:
+                heapq.heappop(heap)
+            if not heap:
                 break
-            best_pair = max(pair_freqs, key=pair_freqs.get)
-            self.splits = self.merge_pair(*best_pair)
+            best_pair = heap[0][3]
+
+            # Only the words containing the pair change
+            touched = set()
+            for rank in list(pair_words[best_pair]):
+                old_split = splits[rank]
+                new_split = self._merge_split(old_split, *best_pair)
+                old_pairs = list(zip(old_split, old_split[1:]))
+                new_pairs = list(zip(new_split, new_split[1:]))
+                for pair in old_pairs:
+                    pair_freqs[pair] -= freqs[rank]
+                for pair in new_pairs:
+                    pair_freqs[pair] += freqs[rank]
+
+                old_pairs, new_pairs = set(old_pairs), set(new_pairs)
+                for pair in old_pairs - new_pairs:
+                    pair_words[pair].discard(rank)
+                for pair in new_pairs - old_pairs:
+                    pair_words[pair].add(rank)
+                    if rank < first_word.get(pair, len(words)):
+                        first_word[pair] = rank
+                splits[rank] = new_split
+                touched |= old_pairs | new_pairs
+
+            for pair in touched:
+                ranks = pair_words[pair]
+                if not ranks:
+                    del pair_words[pair], pair_freqs[pair], first_word[pair]
+                    current.pop(pair, None)
+                    continue
+                if first_word[pair] not in ranks:
+                    first_word[pair] = min(ranks)
+                push(pair)
+
             self.merges[best_pair] = best_pair[0] + best_pair[1]
             vocab.append(best_pair[0] + best_pair[1])
+
+        self.splits = dict(zip(words, splits))
+        self._encoders = {}
         return self.merges
 
-    def compute_pair_freqs(self):
-        """Compute the frequency of each pair."""
-        pair_freqs = defaultdict(int)
-        for word, freq in self.word_freqs.items():
-            split = self.splits[word]
-            if len(split) == 1:
-                continue
-            for i in range(len(split) - 1):
-                pair = (split[i], split[i + 1])
-                pair_freqs[pair] += freq
-        return pair_freqs
-
-    def merge_pair(self, a, b):
-        """Merge the given pair."""
-        new_splits = {}
-        for word in self.word_freqs:
-            split = self.splits[word]
-            if len(split) == 1:
-                new_splits[word] = split
-                continue
-            
-            i = 0
-            new_split = []
-            while i < len(split):
-                if i < len(split) - 1 and split[i] == a and split[i + 1] == b:
-                    new_split.append(a + b)
-                    i += 2
-                else:
-                    new_split.append(split[i])
-                    i += 1
-            new_splits[word] = new_split
-        return new_splits
+    @staticmethod
+    def _merge_split(split, a, b):
+        """Merge every occurrence of the pair (a, b) in one word's split."""
+        if len(split) == 1:
+            return split
+        
+        i = 0
+        new_split = []
+        while i < len(split):
+            if i < len(split) - 1 and split[i] == a and split[i + 1] == b:
+                new_split.append(a + b)
+                i += 2
+            else:
+                new_split.append(split[i])
+                i += 1
+        return new_split
+
+    def merge_count(self, vocab_size):
+        """Number of merges a vocabulary of vocab_size is made of.
+
+        Merges are learned in order, so training up to a smaller vocabulary
+        stops at a prefix of the merges of a larger one.
+        """
+        if self.base_vocab_size is None:
+            raise ValueError("The base vocabulary size is only known for a trained tokenizer")
+        return max(0, min(len(self.merges), vocab_size - self.base_vocab_size))
+
+    def truncated(self, vocab_size):
+        """Tokenizer with the merges training only up to vocab_size would have learned."""
+        bpe = BPE([], vocab_size, self.cache_size)
+        bpe.merges = dict(islice(self.merges.items(), self.merge_count(vocab_size)))
+        bpe.base_vocab_size = self.base_vocab_size
+        return bpe
+
+    def _word_encoder(self, limits=None):
+        """Cached function splitting one pre-tokenized word with the current merges.
+
+        With limits, a sorted tuple of merge counts, the function returns the
+        split made by the first n merges for every n in limits.
+        """
+        key = limits
+        if key not in self._encoders:
+            ranks = {pair: rank for rank, pair in enumerate(self.merges)}
+            merge_order = list(self.merges)
+
+            def encode_word(word):
+                split = list(word)
+                splits = []
+                # Applying the lowest ranked pair present, but never one ranked
+                # before the last merge applied, is the same as applying every
+                # merge in order like the original loop did
+                next_rank = 0
+                for limit in limits or (len(merge_order),):
+                    while len(split) > 1:
+                        rank = min((ranks[pair] for pair in zip(split, split[1:])
+                                    if next_rank <= ranks.get(pair, -1) < limit), default=None)
+                        if rank is None:
+                            break
+                        split = self._merge_split(split, *merge_order[rank])
+                        next_rank = rank + 1
+                    splits.append(tuple(split))
+                    next_rank = max(next_rank, limit)
+                return tuple(splits) if limits else splits[0]
+
+            self._encoders[key] = lru_cache(maxsize=self.cache_size)(encode_word)
+        return self._encoders[key]
 
     def tokenize(self, text):
         """Tokenize a given text with trained BPE tokenizer."""
-        pre_tokenize_result = self.tokenizer.backend_tokenizer.pre_tokenizer.pre_tokenize_str(text)
-        pre_tokenized_text = [word for word, offset in pre_tokenize_result]
-        splits_text = [[l for l in word] for word in pre_tokenized_text]
-
-        for pair, merge in self.merges.items():
-            for idx, split in enumerate(splits_text):
-                i = 0
-                while i < len(split) - 1:
-                    if split[i] == pair[0] and split[i + 1] == pair[1]:
-                        split = split[:i] + [merge] + split[i + 2:]
-                    else:
-                        i += 1
-                splits_text[idx] = split
-        result = sum(splits_text, [])
+        encode_word = self._word_encoder()
+        result = []
+        for word in pre_tokenize(text):
+            result.extend(encode_word(word))
         return result
 
+    def tokenize_batch(self, lines):
+        """Tokenize several texts, returning a list of tokens for each."""
+        return [self.tokenize(line) for line in lines]
+
+    def tokenize_sizes(self, lines, vocab_sizes):
+        """Tokenize several texts as the tokenizers truncated to each of vocab_sizes would.
+
+        Every word is split once for all sizes. Returns {vocab size: list of
+        tokens for each text}.
+        """
+        limits = tuple(sorted(set(self.merge_count(size) for size in vocab_sizes)))
+        encode_word = self._word_encoder(limits)
+        results = [[] for _ in limits]
+        for line in lines:
+            line_tokens = [[] for _ in limits]
+            for word in pre_tokenize(line):
+                for tokens, split in zip(line_tokens, encode_word(word)):
+                    tokens.extend(split)
+            for result, tokens in zip(results, line_tokens):
+                result.append(tokens)
+        by_limit = dict(zip(limits, results))
+        return {size: by_limit[self.merge_count(size)] for size in vocab_sizes}
+
+    def save(self, path):
+        """Save the learned merges, one 'left right' pair per line in merge order."""
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(f"{MODEL_HEADER}{self.vocab_size}\n")
+            for left, right in self.merges:
+                file.write(f"{left} {right}\n")
+
+    @classmethod
+    def load(cls, path):
+        """Load a tokenizer saved with save(), ready to tokenize without training."""
+        with open(path, 'r', encoding='utf-8') as file:
+            header = file.readline().rstrip('\n')
+            if not header.startswith(MODEL_HEADER):
+                raise ValueError(f"Not a BPE merges file: {path}")
+            bpe = cls([], int(header[len(MODEL_HEADER):]))
+            for line in file:
+                # Tokens never contain whitespace, so the first space separates the pair
+                left, right = line.rstrip('\n').split(' ')
+                bpe.merges[(left, right)] = left + right
+        return bpe
+
+class VocabularySizeError(ValueError):
+    """A vocabulary size that leaves a tokenizer without any merge."""
+
+def parse_vocab_sizes(value: str):
+    """argparse type of --vocab-sizes: a comma separated list of positive sizes."""
+    try:
+        sizes = [int(size) for size in value.split(',') if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a comma separated list of integers: {value!r}")
+    if not sizes:
+        raise argparse.ArgumentTypeError("no vocabulary size given")
+    if min(sizes) <= 0:
+        raise argparse.ArgumentTypeError(f"vocabulary sizes must be positive: {value!r}")
+    return sizes
+
+def base_vocab_size(word_freqs):
+    """Size of the vocabulary training on word_freqs starts from, before any merge."""
+    return len({char for word in word_freqs for char in word}) + 1
+
+def train_merges(word_freqs, vocab_size: int):
+    """Train a BPE tokenizer on word frequencies and return its merges and base vocabulary size."""
+    bpe = BPE([], vocab_size)
+    bpe.train(word_freqs)
+    return bpe.merges, bpe.base_vocab_size
+
+def count_tsv_words(file_path: str, chunk_lines: int = None):
+    """Count the Hindi and Telugu words of one aligned TSV file or table.
+
+    With chunk_lines the file is read that many lines at a time instead of
+    all at once; the counts are the same.
+    """
+    if not chunk_lines:
+        lines = load_pairs(file_path)
+        return count_words(hindi for hindi, telugu in lines), count_words(telugu for hindi, telugu in lines)
+    hindi_counts, telugu_counts = Counter(), Counter()
+    for lines in iter_pair_chunks(file_path, chunk_lines):
+        hindi_counts.update(count_words(hindi for hindi, telugu in lines))
+        telugu_counts.update(count_words(telugu for hindi, telugu in lines))
+    return hindi_counts, telugu_counts
+
+def _check(result, what):
+    """Unwrap a TaskResult, raising if its task failed."""
+    if result.error:
+        raise RuntimeError(f"{what} failed:\n{result.error}")
+    return result.result
+
 def load_tsv(file_path: str):
     """Load the TSV file and return its contents."""
     with open(file_path, 'r', encoding='utf-8') as file:
         lines = file.readlines()
     return [line.strip().split('\t') for line in lines]
 
+def load_pairs(file_path: str):
+    """Load the [hindi, telugu] pairs of a TSV file or column table."""
+    if is_table(file_path):
+        table = read_table(file_path, ['hindi', 'telugu'])
+        return [[hindi, telugu] for hindi, telugu in zip(table['hindi'], table['telugu'])]
+    return load_tsv(file_path)
+
+def iter_pair_chunks(file_path: str, chunk_lines: int = STREAM_CHUNK_LINES):
+    """Yield the [hindi, telugu] pairs of a TSV file or column table, chunk_lines pairs at a time."""
+    if is_table(file_path):
+        table = read_table(file_path, ['hindi', 'telugu'])
+        hindi, telugu = table['hindi'], table['telugu']
+        for start in range(0, len(table), chunk_lines):
+            yield [[hindi[row], telugu[row]] for row in range(start, min(start + chunk_lines, len(table)))]
+        return
+    with open(file_path, 'r', encoding='utf-8') as file:
+        while True:
+            lines = list(islice(file, chunk_lines))
+            if not lines:
+                return
+            yield [line.strip().split('\t') for line in lines]
+
+def tokenize_pairs(lines, hindi_tokenizer, telugu_tokenizer, vocab_sizes, pretrained=False):
+    """Tokenize [hindi, telugu] pairs for every vocabulary size.
+
+    Returns {vocab size: tokens of each Hindi text} and the same for Telugu.
+    Pretrained (loaded) tokenizers are used as they are, for their one size.
+    """
+    if pretrained:
+        return ({vocab_sizes[0]: hindi_tokenizer.tokenize_batch(hindi for hindi, telugu in lines)},
+                {vocab_sizes[0]: telugu_tokenizer.tokenize_batch(telugu for hindi, telugu in lines)})
+    # Each word is split once for all vocabulary sizes
+    return (hindi_tokenizer.tokenize_sizes((hindi for hindi, telugu in lines), vocab_sizes),
+            telugu_tokenizer.tokenize_sizes((telugu for hindi, telugu in lines), vocab_sizes))
+
 def extract_index(filename: str) -> int:
     """Extract the index from the input filename."""
     match = re.search(r'data-(\d+)', filename)
@@ -106,74 +383,380 @@ def extract_index(filename: str) -> int:
         return int(match.group(1))
     return None
 
-def save_tokenized_data(output_dir: str, index: int, tokenized_hin: list, tokenized_tel: list):
-    """Save tokenized data to the output folder with the specified naming convention."""
-    output_filename = f"data-{index}_tokenized_{index}.tsv"
+def save_tokenized_data(output_dir: str, index: int, tokenized_hin: list, tokenized_tel: list,
+                        suffix: str = '.tsv', columns: dict = None):
+    """Save tokenized data to the output folder with the specified naming convention.
+
+    With a table suffix the data is saved as a column table, together with
+    the given extra columns (film and cue times).
+    """
+    output_filename = f"data-{index}_tokenized_{index}{suffix}"
     output_path = os.path.join(output_dir, output_filename)
     os.makedirs(output_dir, exist_ok=True)
     
+    if is_table(output_path):
+        write_table(output_path, dict(columns or {}, hindi=tokenized_hin, telugu=tokenized_tel))
+        return output_filename
     with open(output_path, 'w', encoding='utf-8') as file:
         for hin, tel in zip(tokenized_hin, tokenized_tel):
             file.write(f"{hin}\t{tel}\n")
     return output_filename
 
-def process_tsv_files(data_dir: str, output_dir: str, vocab_size: int):
-    """Process all TSV files in the data directory with BPE and save the results."""
-    hindi_sentences = []
-    telugu_sentences = []
-    file_data = {}
-
-    # First, collect all sentences for training
-    print("Collecting sentences for training...")
-    for root, _, files in os.walk(data_dir):
-        for file in files:
-            if file.endswith('.tsv'):
+class TokenVocabulary:
+    """Ids of the tokens of one tokenizer, growing as tokens it can't make are seen.
+
+    The characters the merges are built from come first, in code point
+    order, then the merged tokens in merge order, so tokenizers with the
+    same merges give their tokens the same ids. Characters no merge uses
+    are added in the order they are first seen.
+    """
+
+    def __init__(self, merges):
+        tokens = sorted({char for pair in merges for part in pair for char in part})
+        tokens += merges.values()
+        self.ids = {}
+        for token in tokens:
+            self.ids.setdefault(token, len(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def encode(self, tokens):
+        """Ids of a list of tokens."""
+        ids = self.ids
+        return [ids[token] if token in ids else ids.setdefault(token, len(ids)) for token in tokens]
+
+    def save(self, path):
+        """Save the tokens one per line, line i (from 0) holding the token of id i."""
+        with open(path, 'w', encoding='utf-8') as file:
+            for token in self.ids:
+                file.write(f"{token}\n")
+
+def load_vocabulary(path: str):
+    """Tokens of a vocabulary saved by TokenVocabulary.save, indexed by id."""
+    with open(path, 'r', encoding='utf-8', newline='\n') as file:
+        return file.read().split('\n')[:-1]
+
+def token_id_paths(ids_dir: str, index: int, language: str):
+    """Paths of the token ids and the sentence offsets of one shard."""
+    return (os.path.join(ids_dir, f"data-{index}.{language}.ids.npy"),
+            os.path.join(ids_dir, f"data-{index}.{language}.offsets.npy"))
+
+def save_token_ids(ids_dir: str, index: int, language: str, sentences: list):
+    """Save the token ids of a file's sentences as a flat array plus sentence offsets.
+
+    Sentence i is ids[offsets[i]:offsets[i + 1]]. The ids are uint16 unless
+    some id doesn't fit, then uint32; offsets are int64.
+    """
+    os.makedirs(ids_dir, exist_ok=True)
+    offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+    np.cumsum([len(sentence) for sentence in sentences], out=offsets[1:])
+    ids = np.fromiter(chain.from_iterable(sentences), dtype=np.uint32, count=int(offsets[-1]))
+    if not len(ids) or ids.max() <= np.iinfo(np.uint16).max:
+        ids = ids.astype(np.uint16)
+    ids_path, offsets_path = token_id_paths(ids_dir, index, language)
+    np.save(ids_path, ids)
+    np.save(offsets_path, offsets)
+
+def _npy_from_raw(raw_path: str, path: str, raw_dtype, dtype, length: int):
+    """Turn a file of raw values into a .npy file of the given dtype, a chunk at a time."""
+    if not length:
+        np.save(path, np.zeros(0, dtype=dtype))
+    else:
+        raw = np.memmap(raw_path, dtype=raw_dtype, mode='r', shape=(length,))
+        array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(length,))
+        for start in range(0, length, 1 << 20):
+            array[start:start + (1 << 20)] = raw[start:start + (1 << 20)]
+        array.flush()
+        del raw, array
+    os.remove(raw_path)
+
+class TokenIdWriter:
+    """Writes the token-id shard of one file and language a sentence at a time.
+
+    Used by the streaming mode; the shard is the same as save_token_ids
+    writes. Ids and offsets go to raw temporary files first, as the dtype
+    of the ids is only known at the end.
+    """
+
+    def __init__(self, ids_dir: str, index: int, language: str):
+        os.makedirs(ids_dir, exist_ok=True)
+        self.ids_path, self.offsets_path = token_id_paths(ids_dir, index, language)
+        self.ids_file = open(self.ids_path + '.tmp', 'wb')
+        self.offsets_file = open(self.offsets_path + '.tmp', 'wb')
+        self.offsets_file.write(np.zeros(1, dtype='<i8').tobytes())
+        self.count = 0
+        self.sentences = 0
+        self.max_id = 0
+
+    def write(self, sentences):
+        """Append the ids of several sentences."""
+        for sentence in sentences:
+            ids = np.array(sentence, dtype='<u4')
+            self.ids_file.write(ids.tobytes())
+            self.count += len(ids)
+            self.sentences += 1
+            if len(ids):
+                self.max_id = max(self.max_id, int(ids.max()))
+            self.offsets_file.write(np.array(self.count, dtype='<i8').tobytes())
+
+    def close(self):
+        self.ids_file.close()
+        self.offsets_file.close()
+        dtype = np.uint16 if self.max_id <= np.iinfo(np.uint16).max else np.uint32
+        _npy_from_raw(self.ids_path + '.tmp', self.ids_path, '<u4', dtype, self.count)
+        _npy_from_raw(self.offsets_path + '.tmp', self.offsets_path, '<i8', np.int64, self.sentences + 1)
+
+def stream_tokenized_file(file_path: str, index: int, size_dirs: dict, tokenizers, vocab_sizes,
+                          pretrained=False, vocabularies=None, chunk_lines: int = STREAM_CHUNK_LINES):
+    """Tokenize one file chunk_lines pairs at a time, appending to its TSV outputs.
+
+    Writes the same files as the whole-file path (and the token-id shards
+    if vocabularies are given) while holding only one chunk in memory.
+    Returns the name of the tokenized file and its number of pairs.
+    """
+    output_filename = f"data-{index}_tokenized_{index}.tsv"
+    outputs = {}
+    id_writers = {}
+    pairs = 0
+    try:
+        for size, size_dir in size_dirs.items():
+            os.makedirs(size_dir, exist_ok=True)
+            outputs[size] = open(os.path.join(size_dir, output_filename), 'w', encoding='utf-8')
+            if vocabularies:
+                for language in VOCAB_FILES:
+                    id_writers[size, language] = TokenIdWriter(os.path.join(size_dir, IDS_DIR), index, language)
+        for lines in iter_pair_chunks(file_path, chunk_lines):
+            pairs += len(lines)
+            hindi_tokens, telugu_tokens = tokenize_pairs(lines, *tokenizers, vocab_sizes, pretrained)
+            for size, file in outputs.items():
+                for hindi, telugu in zip(hindi_tokens[size], telugu_tokens[size]):
+                    file.write(f"{' '.join(hindi)}\t{' '.join(telugu)}\n")
+                if vocabularies:
+                    for language, tokens in (('hindi', hindi_tokens[size]), ('telugu', telugu_tokens[size])):
+                        vocabulary = vocabularies[size][language]
+                        id_writers[size, language].write(vocabulary.encode(sentence) for sentence in tokens)
+    finally:
+        for file in outputs.values():
+            file.close()
+        for writer in id_writers.values():
+            writer.close()
+    return output_filename, pairs
+
+class TokenIdCorpus:
+    """The token-id shards of an output folder, memory-mapped.
+
+    corpus[i] is the (Hindi ids, Telugu ids) of sentence pair i, counting
+    through the shards in file index order; vocabularies maps each language
+    to its tokens, indexed by id.
+    """
+
+    def __init__(self, output_dir: str):
+        ids_dir = os.path.join(output_dir, IDS_DIR)
+        self.vocabularies = {language: load_vocabulary(os.path.join(output_dir, name))
+                             for language, name in VOCAB_FILES.items()}
+        indices = sorted(extract_index(name) for name in os.listdir(ids_dir) if name.endswith('.hindi.offsets.npy'))
+        self.shards = []
+        for index in indices:
+            shard = []
+            for language in VOCAB_FILES:
+                ids_path, offsets_path = token_id_paths(ids_dir, index, language)
+                shard.append((np.load(ids_path, mmap_mode='r'), np.load(offsets_path, mmap_mode='r')))
+            self.shards.append(shard)
+        # Number of sentence pairs before each shard
+        self.starts = [0]
+        for shard in self.shards:
+            self.starts.append(self.starts[-1] + len(shard[0][1]) - 1)
+
+    def __len__(self):
+        return self.starts[-1]
+
+    def __getitem__(self, pair):
+        if pair < 0:
+            pair += len(self)
+        if not 0 <= pair < len(self):
+            raise IndexError(pair)
+        shard = bisect_right(self.starts, pair) - 1
+        row = pair - self.starts[shard]
+        return tuple(ids[offsets[row]:offsets[row + 1]] for ids, offsets in self.shards[shard])
+
+def process_tsv_files(data_dir: str, output_dir: str, vocab_size, force: bool = False,
+                      models_dir: str = None, jobs: int = None, output_format: str = 'tsv',
+                      token_ids: bool = True, stream: bool = False):
+    """Process all TSV files in the data directory with BPE and save the results.
+
+    The tokenizers are trained on the whole corpus and their merges saved in
+    output_dir, unless models_dir is given, in which case the merges saved there
+    are loaded instead. Everything is redone if any input file or model changed
+    and nothing is redone otherwise (unless force is set). Word counting is
+    spread over jobs processes and the two languages train side by side.
+
+    vocab_size may also be a list of sizes: the tokenizers are then trained once
+    up to the largest one and every size gets its own output_dir/<size> folder.
+
+    The input files may be TSV files or column tables; with output_format
+    'columnar' the output is written as column tables (see corpus_columns).
+
+    Unless token_ids is false, every output folder also gets the tokens as
+    ids: a vocabulary per language and, per file and language, the flat ids
+    and sentence offsets under ids/ as .npy files that load memory-mapped
+    (see TokenIdCorpus).
+
+    With stream, both the word counting and the tokenizing read the files
+    STREAM_CHUNK_LINES pairs at a time and write the outputs as they go, so
+    memory use depends on the vocabulary rather than the size of the
+    corpus. The outputs are the same; column tables can't be streamed.
+    """
+    if stream and output_format == 'columnar':
+        raise ValueError("The streaming mode writes TSV files only")
+    if isinstance(vocab_size, int):
+        vocab_sizes = [vocab_size]
+        size_dirs = {vocab_size: output_dir}
+    else:
+        vocab_sizes = sorted(set(vocab_size))
+        size_dirs = {size: os.path.join(output_dir, str(size)) for size in vocab_sizes}
+
+    # Files are visited by name: the order words are first seen in breaks ties
+    # between equally frequent pairs, so it must not depend on the file system
+    input_files = {}
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith('.tsv') or is_table(file):
                 index = extract_index(file)
                 if index is not None:
-                    file_path = os.path.join(root, file)
-                    lines = load_tsv(file_path)
-                    file_data[index] = lines
-                    for hindi, telugu in lines:
-                        hindi_sentences.append(hindi)
-                        telugu_sentences.append(telugu)
-
-    # Train tokenizers
-    print(f"Training tokenizers with vocab size {vocab_size}...")
-    hindi_tokenizer = BPE(hindi_sentences, vocab_size)
-    telugu_tokenizer = BPE(telugu_sentences, vocab_size)
-
-    print("Training Hindi tokenizer...")
-    hindi_tokenizer.train()
-    print("Training Telugu tokenizer...")
-    telugu_tokenizer.train()
+                    input_files[index] = os.path.join(root, file)
+
+    input_paths = sorted(input_files.values())
+    suffix = table_suffix() if output_format == 'columnar' else '.tsv'
+    tokenized_names = [f"data-{index}_tokenized_{index}{suffix}" for index in sorted(input_files)]
+    output_paths = [os.path.join(size_dir, name) for size_dir in size_dirs.values() for name in tokenized_names]
+    if models_dir:
+        model_paths = {language: os.path.join(models_dir, name) for language, name in MODEL_FILES.items()}
+        input_paths += sorted(model_paths.values())
+        params = {'pretrained': True, 'vocab_sizes': vocab_sizes}
+    else:
+        output_paths += [os.path.join(size_dir, name) for size_dir in size_dirs.values() for name in MODEL_FILES.values()]
+        params = {'vocab_size': vocab_size}
+    if token_ids:
+        for size_dir in size_dirs.values():
+            output_paths += [os.path.join(size_dir, name) for name in VOCAB_FILES.values()]
+            output_paths += [path for index in sorted(input_files) for language in VOCAB_FILES
+                             for path in token_id_paths(os.path.join(size_dir, IDS_DIR), index, language)]
+    source_files = [__file__]
+    if output_format == 'columnar':
+        source_files.append(corpus_columns.__file__)
+    cache = BuildCache(output_dir, stage_hash(source_files, params), force=force)
+    if cache.is_fresh('corpus', input_paths, output_paths):
+        print("Tokenized files are up to date, skipping training.")
+        return tokenized_names
+
+    if models_dir:
+        if len(vocab_sizes) > 1:
+            raise ValueError("Saved models can't be truncated to several vocabulary sizes")
+        print(f"Loading tokenizers from {models_dir}...")
+        hindi_tokenizer = BPE.load(model_paths['hindi'])
+        telugu_tokenizer = BPE.load(model_paths['telugu'])
+    else:
+        # Count words file by file; merging the counts in file order keeps the
+        # words in order of first appearance, which decides ties in training
+        model_outputs = [os.path.join(size_dir, name) for size_dir in size_dirs.values() for name in MODEL_FILES.values()]
+        with file_metrics('tokenize', 'training', list(input_files.values()), model_outputs) as metrics:
+            print("Counting words for training...")
+            hindi_freqs = Counter()
+            telugu_freqs = Counter()
+            tasks = [(file_path, STREAM_CHUNK_LINES if stream else None) for file_path in input_files.values()]
+            with metrics.step('count_words'):
+                for result in run_parallel(count_tsv_words, tasks, jobs):
+                    hindi_counts, telugu_counts = _check(result, f"Counting words of {result.task[0]}")
+                    hindi_freqs.update(hindi_counts)
+                    telugu_freqs.update(telugu_counts)
+
+            base_sizes = {'Hindi': base_vocab_size(hindi_freqs), 'Telugu': base_vocab_size(telugu_freqs)}
+            too_small = [size for size in vocab_sizes if size <= max(base_sizes.values())]
+            if too_small:
+                raise VocabularySizeError(
+                    f"vocabulary sizes {', '.join(map(str, too_small))} leave no merges, they must be above the "
+                    f"base vocabularies ({', '.join(f'{language} {size}' for language, size in base_sizes.items())})")
+
+            max_size = max(vocab_sizes)
+            print(f"Training Hindi and Telugu tokenizers with vocab size {max_size}...")
+            tasks = [(hindi_freqs, max_size), (telugu_freqs, max_size)]
+            hindi_tokenizer, telugu_tokenizer = BPE([], max_size), BPE([], max_size)
+            with metrics.step('train'):
+                for tokenizer, result in zip((hindi_tokenizer, telugu_tokenizer), run_parallel(train_merges, tasks, jobs)):
+                    tokenizer.merges, tokenizer.base_vocab_size = _check(result, "Training")
+
+            for size, size_dir in size_dirs.items():
+                os.makedirs(size_dir, exist_ok=True)
+                hindi_tokenizer.truncated(size).save(os.path.join(size_dir, MODEL_FILES['hindi']))
+                telugu_tokenizer.truncated(size).save(os.path.join(size_dir, MODEL_FILES['telugu']))
+
+    if token_ids:
+        if models_dir:
+            vocabularies = {vocab_sizes[0]: {'hindi': TokenVocabulary(hindi_tokenizer.merges),
+                                             'telugu': TokenVocabulary(telugu_tokenizer.merges)}}
+        else:
+            vocabularies = {size: {'hindi': TokenVocabulary(hindi_tokenizer.truncated(size).merges),
+                                   'telugu': TokenVocabulary(telugu_tokenizer.truncated(size).merges)}
+                            for size in vocab_sizes}
 
     # Process each file
     processed_files = []
-    for index, lines in sorted(file_data.items()):
+    for index, file_path in sorted(input_files.items()):
         print(f"Processing file with index: {index}")
-        tokenized_hindi = []
-        tokenized_telugu = []
-        
-        for hindi, telugu in lines:
-            tokenized_hindi.append(" ".join(hindi_tokenizer.tokenize(hindi)))
-            tokenized_telugu.append(" ".join(telugu_tokenizer.tokenize(telugu)))
+        file_outputs = [os.path.join(size_dir, f"data-{index}_tokenized_{index}{suffix}") for size_dir in size_dirs.values()]
+        with file_metrics('tokenize', file_path, [file_path], file_outputs) as metrics:
+            if stream:
+                tokenized_filename, pairs = stream_tokenized_file(
+                    file_path, index, size_dirs, (hindi_tokenizer, telugu_tokenizer), vocab_sizes,
+                    pretrained=bool(models_dir), vocabularies=vocabularies if token_ids else None)
+                metrics.add(cues=pairs)
+            else:
+                lines = load_pairs(file_path)
+                metrics.add(cues=len(lines))
+                hindi_tokens, telugu_tokens = tokenize_pairs(lines, hindi_tokenizer, telugu_tokenizer, vocab_sizes,
+                                                             pretrained=bool(models_dir))
 
-        tokenized_filename = save_tokenized_data(output_dir, index, tokenized_hindi, tokenized_telugu)
+                # Tables keep the film and cue times of their input
+                columns = carried_columns(file_path, len(lines)) if output_format == 'columnar' else None
+                for size, size_dir in size_dirs.items():
+                    tokenized_hindi = [" ".join(tokens) for tokens in hindi_tokens[size]]
+                    tokenized_telugu = [" ".join(tokens) for tokens in telugu_tokens[size]]
+                    tokenized_filename = save_tokenized_data(size_dir, index, tokenized_hindi, tokenized_telugu,
+                                                             suffix, columns)
+                    if token_ids:
+                        ids_dir = os.path.join(size_dir, IDS_DIR)
+                        for language, tokens in (('hindi', hindi_tokens[size]), ('telugu', telugu_tokens[size])):
+                            vocabulary = vocabularies[size][language]
+                            save_token_ids(ids_dir, index, language,
+                                           [vocabulary.encode(sentence) for sentence in tokens])
         processed_files.append(tokenized_filename)
         print(f"Saved tokenized file: {tokenized_filename}")
 
+    if token_ids:
+        # The vocabularies are complete once every file has been encoded
+        for size, size_dir in size_dirs.items():
+            for language, name in VOCAB_FILES.items():
+                vocabularies[size][language].save(os.path.join(size_dir, name))
+
+    cache.record('corpus', input_paths, output_paths)
+    cache.save()
+
     print(f"Total files processed: {len(processed_files)}")
     return processed_files
 
-if __name__ == "__main__":
-    data_dir = 'data_aligned'
-    output_dir = 'data_tokenized'
-    vocab_size = 1000
-
-    processed_files = process_tsv_files(data_dir, output_dir, vocab_size)
+def run(data_dir: str = 'data_aligned', output_dir: str = 'data_tokenized', vocab_size=1000,
+        force: bool = False, models_dir: str = None, jobs: int = None, output_format: str = 'tsv',
+        token_ids: bool = True, stream: bool = False):
+    """Tokenize the aligned files of data_dir into output_dir as a pipeline stage."""
+    with stage_metrics('tokenize'):
+        processed_files = process_tsv_files(data_dir, output_dir, vocab_size, force=force, models_dir=models_dir,
+                                            jobs=jobs, output_format=output_format, token_ids=token_ids,
+                                            stream=stream)
     
     # Verify the number of files
-    input_files = [f for f in os.listdir(data_dir) if f.endswith('.tsv')]
+    input_files = [f for f in os.listdir(data_dir) if f.endswith('.tsv') or is_table(f)]
     print(f"Number of input files: {len(input_files)}")
     print(f"Number of output files: {len(processed_files)}")
 
@@ -187,4 +770,40 @@ if __name__ == "__main__":
         output_indices = set(extract_index(f) for f in processed_files if extract_index(f) is not None)
         missing_indices = input_indices - output_indices
         if missing_indices:
-            print("Missing indices:", sorted(missing_indices))
\ No newline at end of file
+            print("Missing indices:", sorted(missing_indices))
+    return processed_files
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize the aligned corpus with BPE.")
+    parser.add_argument('--source', default='data_aligned', help="folder with the aligned TSV files or tables")
+    parser.add_argument('--dest', default='data_tokenized', help="folder for the tokenized files and merges")
+    parser.add_argument('--force', action='store_true', help="retrain and retokenize, ignoring the build cache")
+    parser.add_argument('--models', metavar='DIR', default=None,
+                        help="tokenize with the merges saved in DIR by an earlier run instead of training")
+    parser.add_argument('--vocab-sizes', metavar='N[,N...]', type=parse_vocab_sizes, default=None,
+                        help="train once up to the largest size and write one output_dir/<size> folder per size")
+    parser.add_argument('--format', default='tsv', choices=['tsv', 'columnar'],
+                        help="write TSV files or column tables (see corpus_columns)")
+    parser.add_argument('--no-token-ids', dest='token_ids', action='store_false',
+                        help="don't write the vocabularies and token-id shards")
+    parser.add_argument('--stream', action='store_true',
+                        help="read and write the files a chunk at a time, for corpora too large for memory")
+    add_jobs_argument(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    if args.stream and args.format == 'columnar':
+        parser.error("--stream writes TSV files only, it can't be used with --format columnar")
+    if args.vocab_sizes and args.models:
+        parser.error("--vocab-sizes needs training, it can't be used with --models")
+    vocab_size = args.vocab_sizes or 1000
+
+    try:
+        run(args.source, args.dest, vocab_size, force=args.force, models_dir=args.models, jobs=args.jobs,
+            output_format=args.format, token_ids=args.token_ids, stream=args.stream)
+    except VocabularySizeError as error:
+        parser.error(str(error))
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,62 @@
+import argparse
 import os
-import unicodedata
+
+from char_tables import char_spec, translate
+from stage_metrics import add_metrics_arguments, configure, file_metrics, stage_metrics
+
+# Control, format, surrogate, private use and unassigned characters
+UNPRINTABLE_SPEC = char_spec(deleted_categories=['C'])
 
 def remove_non_printable(text):
-    return ''.join(c for c in text if not unicodedata.category(c).startswith('C'))
+    return translate(text, UNPRINTABLE_SPEC)
 
 source_directory = "data_Html_cleaned"  # Replace with the path to the 'data-encoded' folder
 destination_directory = "data_unprintable_cleaned"  # Replace with the path to the 'data-unprintable-cleaned' folder
 
-os.makedirs(destination_directory, exist_ok=True)
-
-for root, dirs, files in os.walk(source_directory):
-    for file in files:
-        if file.endswith(".srt"):
-            source_file_path = os.path.join(root, file)
-            print(f"Processing file: {source_file_path}")
-            
-            relative_path = os.path.relpath(root, source_directory)
-            dest_folder = os.path.join(destination_directory, relative_path)
-            os.makedirs(dest_folder, exist_ok=True)
-
-            output_file_path = os.path.join(dest_folder, file)
-            
-            with open(source_file_path, 'r', encoding='utf-8') as srt_file:
-                lines = srt_file.readlines()
-
-            with open(output_file_path, 'w', encoding='utf-8') as output_file:
-                for line in lines:
-                    if '-->' not in line and line.strip():
-                        cleaned_line = remove_non_printable(line)
-                        output_file.write(cleaned_line + '\n')
-                    else:
-                        output_file.write(line)
-
-            print(f"unprintable char Cleaned file saved at: {output_file_path}")
-
-print("All files have been processed and saved to 'data-unprintable-cleaned'.")
\ No newline at end of file
+def run(source_directory=source_directory, destination_directory=destination_directory):
+    """Remove the unprintable characters of every .srt file under source_directory."""
+    os.makedirs(destination_directory, exist_ok=True)
+
+    with stage_metrics('unprintable'):
+        for root, dirs, files in os.walk(source_directory):
+            for file in files:
+                if file.endswith(".srt"):
+                    source_file_path = os.path.join(root, file)
+                    print(f"Processing file: {source_file_path}")
+                
+                    relative_path = os.path.relpath(root, source_directory)
+                    dest_folder = os.path.join(destination_directory, relative_path)
+                    os.makedirs(dest_folder, exist_ok=True)
+
+                    output_file_path = os.path.join(dest_folder, file)
+                
+                    with file_metrics('unprintable', source_file_path, [source_file_path], [output_file_path]) as metrics:
+                        with open(source_file_path, 'r', encoding='utf-8') as srt_file:
+                            lines = srt_file.readlines()
+
+                        with open(output_file_path, 'w', encoding='utf-8') as output_file:
+                            for line in lines:
+                                if '-->' not in line and line.strip():
+                                    cleaned_line = remove_non_printable(line)
+                                    metrics.add(lines_changed=cleaned_line + '\n' != line)
+                                    output_file.write(cleaned_line + '\n')
+                                else:
+                                    metrics.add(cues='-->' in line)
+                                    output_file.write(line)
+
+                    print(f"unprintable char Cleaned file saved at: {output_file_path}")
+
+    print(f"All files have been processed and saved to '{destination_directory}'.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove unprintable characters from the subtitles.")
+    parser.add_argument('--source', default=source_directory, help="folder with the HTML cleaned .srt files")
+    parser.add_argument('--dest', default=destination_directory, help="folder for the cleaned .srt files")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+
+    run(args.source, args.dest)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Command line runner for the whole subtitle pipeline, or any part of it.
+
+The stages form a DAG: every stage reads the output folder of the stage it
+comes after and writes its own. Any sub-range of it can be run, e.g.
+
+    python hintel.py --from lang --to deaccent
+    python hintel.py --stages align,tokenize --jobs 4
+
+Stage modules are only imported when their stage runs, so numpy, sklearn,
+dtaidistance and chardet are never loaded for stages that don't need them
+(or for --help and --list). Every module runs its stage through
+run(source, dest, **options).
+"""
+import argparse
+import importlib
+import os
+from collections import namedtuple
+from graphlib import TopologicalSorter
+
+from parallel_runner import add_jobs_argument
+from stage_metrics import add_metrics_arguments, configure
+
+# name          - stage name, also used by stage_metrics and --profile-stage
+# module        - module whose run() does the work
+# after         - stage whose output folder is the input (None: the raw data)
+# output        - output folder, relative to --workdir
+# options       - keyword arguments of run() taken from the command line
+Stage = namedtuple('Stage', ['name', 'module', 'after', 'output', 'options'])
+
+STAGES = {}
+
+def register_stage(name, module, after, output, options=()):
+    """Register a pipeline stage under the given name."""
+    STAGES[name] = Stage(name, module, after, output, tuple(options))
+
+register_stage('encode', 'data_encode', None, 'data_encode', ['link'])
+register_stage('bg', 'data_bg_cleaner', 'encode', 'data_bg_cleaned')
+register_stage('punctuation', 'data_punctuation_standardizer', 'bg', 'data_punctuation_standardized')
+register_stage('numbers', 'data_number_standardizer', 'punctuation', 'data_number_standardized')
+register_stage('lang', 'data_lang_cleaner', 'numbers', 'data_lang_cleaned', ['invalid_folder'])
+register_stage('html', 'data_Html_cleaner', 'lang', 'data_Html_cleaned')
+register_stage('unprintable', 'data_unprintable_cleaner', 'html', 'data_unprintable_cleaned')
+register_stage('range', 'data_invalid_lang_range_cleaner', 'unprintable', 'data_invalid_lang_range_cleaned')
+register_stage('deaccent', 'data_deaccented', 'range', 'data_deaccented')
+register_stage('align', 'data_aligned', 'deaccent', 'data_aligned', ['force', 'jobs', 'output_format'])
+register_stage('tokenize', 'data_tokenized', 'align', 'data_tokenized',
+               ['vocab_size', 'models_dir', 'force', 'jobs', 'output_format', 'token_ids', 'stream'])
+register_stage('score', 'data_similarity_scoring', 'tokenize', 'data_similarity_scoring',
+               ['force', 'per_pair', 'output_format'])
+
+# Stages clean_pipeline can run in a single pass (--fused); they match its steps
+FUSABLE = ['bg', 'punctuation', 'numbers', 'lang', 'html', 'unprintable', 'range', 'deaccent']
+
+# One run() call of the plan: the stages it covers, its input and output folder
+Job = namedtuple('Job', ['stages', 'source', 'dest'])
+
+
+def stage_order():
+    """Stage names in an order where every stage comes after its input."""
+    graph = {name: {stage.after} if stage.after else set() for name, stage in STAGES.items()}
+    return list(TopologicalSorter(graph).static_order())
+
+def upstream(name):
+    """The stage itself and every stage it (indirectly) reads from."""
+    names = []
+    while name:
+        names.append(name)
+        name = STAGES[name].after
+    return names
+
+def select_stages(first=None, last=None, names=None):
+    """Stage names to run, in order: the given ones, or those from first to last."""
+    if names:
+        return [name for name in stage_order() if name in names]
+    return [name for name in stage_order()
+            if (first is None or first in upstream(name)) and (last is None or name in upstream(last))]
+
+def plan(names, data_dir, workdir, fused=False, vocab_sizes=None):
+    """Jobs running the given stages, merging consecutive cleaning stages if fused.
+
+    With a list of vocab_sizes, tokenize writes one folder per size, and the
+    stages reading its output run once for each of them.
+    """
+    jobs = []
+    for name in names:
+        stage = STAGES[name]
+        source = os.path.join(workdir, STAGES[stage.after].output) if stage.after else data_dir
+        dest = os.path.join(workdir, stage.output)
+        previous = jobs[-1] if jobs else None
+        if stage.after == 'tokenize' and isinstance(vocab_sizes, list):
+            jobs += [Job((name,), os.path.join(source, str(size)), os.path.join(dest, str(size)))
+                     for size in vocab_sizes]
+        elif (fused and name in FUSABLE and previous and previous.stages[-1] in FUSABLE
+                and previous.stages[-1] == stage.after):
+            jobs[-1] = Job(previous.stages + (name,), previous.source, dest)
+        else:
+            jobs.append(Job((name,), source, dest))
+    return jobs
+
+def run_job(job, options, fused=False):
+    """Import the module of a job's stage(s) and run it."""
+    if fused and job.stages[0] in FUSABLE:
+        import clean_pipeline
+        clean_pipeline.run(job.source, job.dest, list(job.stages), invalid_dir=options['invalid_folder'],
+                           jobs=options['jobs'], force=options['force'])
+        return
+    stage = STAGES[job.stages[0]]
+    module = importlib.import_module(stage.module)
+    module.run(job.source, job.dest, **{name: options[name] for name in stage.options})
+
+def vocab_sizes(value):
+    """--vocab-sizes type; data_tokenized is only imported when the option is given."""
+    from data_tokenized import parse_vocab_sizes
+    return parse_vocab_sizes(value)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Hindi-Telugu subtitle pipeline, or a part of it.")
+    parser.add_argument('--list', action='store_true', help="list the stages and their folders, and exit")
+    parser.add_argument('--from', dest='first', choices=list(STAGES), help="first stage to run")
+    parser.add_argument('--to', dest='last', choices=list(STAGES), help="last stage to run")
+    parser.add_argument('--stages', metavar='NAME[,NAME...]', help="run only these stages (in pipeline order)")
+    parser.add_argument('--dry-run', action='store_true', help="only print what would be run")
+    parser.add_argument('--data', default='data', help="folder with the raw data-N folders")
+    parser.add_argument('--workdir', default='.', help="folder the stage output folders are in")
+    parser.add_argument('--fused', action='store_true',
+                        help="run consecutive cleaning stages in a single pass with clean_pipeline")
+    parser.add_argument('--force', action='store_true', help="redo cached stages, ignoring the build cache")
+    parser.add_argument('--link', action='store_true', help="encode: hard-link files that are already UTF-8")
+    parser.add_argument('--invalid', default='lang_clean_invalid',
+                        help="lang: folder for the pairs that aren't Hindi and Telugu, relative to --workdir")
+    parser.add_argument('--vocab-sizes', metavar='N[,N...]', type=vocab_sizes, default=None,
+                        help="tokenize: train once up to the largest size and write one folder per size")
+    parser.add_argument('--models', metavar='DIR', default=None,
+                        help="tokenize: use the merges saved in DIR instead of training")
+    parser.add_argument('--per-pair', action='store_true', help="score: fit the TF-IDF vectorizers on every pair alone")
+    parser.add_argument('--format', default='tsv', choices=['tsv', 'columnar'],
+                        help="align, tokenize, score: write TSV files or column tables (see corpus_columns)")
+    parser.add_argument('--no-token-ids', dest='token_ids', action='store_false',
+                        help="tokenize: don't write the vocabularies and token-id shards")
+    parser.add_argument('--stream', action='store_true',
+                        help="tokenize: read and write the files a chunk at a time, for corpora too large for memory")
+    add_jobs_argument(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.list:
+        for name in stage_order():
+            stage = STAGES[name]
+            print(f"{name:12} {STAGES[stage.after].output if stage.after else args.data} -> {stage.output}")
+        return
+
+    names = None
+    if args.stages:
+        if args.first or args.last:
+            parser.error("--stages can't be combined with --from/--to")
+        names = [name.strip() for name in args.stages.split(',') if name.strip()]
+        unknown = [name for name in names if name not in STAGES]
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(unknown)} (available: {', '.join(STAGES)})")
+    selected = select_stages(args.first, args.last, names)
+    if not selected:
+        parser.error(f"stage '{args.last}' comes before stage '{args.first}'")
+    if args.stream and args.format == 'columnar' and 'tokenize' in selected:
+        parser.error("--stream writes TSV files only, it can't be used with --format columnar")
+    if args.vocab_sizes and args.models:
+        parser.error("--vocab-sizes needs training, it can't be used with --models")
+
+    vocab_size = args.vocab_sizes or 1000
+    jobs = plan(selected, args.data, args.workdir, args.fused, vocab_size)
+    produced = set()
+    for job in jobs:
+        # Folders inside an output folder (one per vocabulary size) are made by its stage too
+        made = any(job.source == dest or job.source.startswith(dest + os.sep) for dest in produced)
+        if not made and not os.path.isdir(job.source) and not args.dry_run:
+            parser.error(f"input folder '{job.source}' of stage '{job.stages[0]}' doesn't exist, "
+                         f"run the stages before it first")
+        produced.add(job.dest)
+
+    if args.dry_run:
+        for job in jobs:
+            print(f"{'+'.join(job.stages)}: {job.source} -> {job.dest}")
+        return
+
+    configure(args)
+    options = {
+        'link': args.link,
+        'invalid_folder': os.path.join(args.workdir, args.invalid),
+        'force': args.force,
+        'jobs': args.jobs,
+        'vocab_size': vocab_size,
+        'models_dir': args.models,
+        'per_pair': args.per_pair,
+        'output_format': args.format,
+        'token_ids': args.token_ids,
+        'stream': args.stream,
+    }
+    for job in jobs:
+        print(f"\n=== {'+'.join(job.stages)}: {job.source} -> {job.dest} ===")
+        try:
+            run_job(job, options, args.fused)
+        except ValueError as error:
+            from data_tokenized import VocabularySizeError
+            if not isinstance(error, VocabularySizeError):
+                raise
+            parser.error(str(error))
+
+if __name__ == "__main__":
+    main()
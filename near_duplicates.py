@@ -0,0 +1,327 @@
+"""MinHash/LSH index for finding near-duplicate lines in the aligned corpus.
+
+Every line is reduced to a MinHash signature of its character n-grams (the
+same n-grams as the similarity scoring, see char_ngrams), and the
+signatures are split into bands. Lines only get compared when they share
+a band, so clustering the whole corpus takes close to linear time instead
+of comparing all pairs.
+"""
+import argparse
+import os
+import zlib
+from collections import namedtuple
+from typing import List, Tuple
+
+import numpy as np
+
+from corpus_columns import is_table, read_table, write_table
+from data_similarity_scoring import char_ngrams
+
+NUM_PERM = 128
+BANDS = 16
+THRESHOLD = 0.8
+
+# Number of n-gram hashes turned into signatures at once, bounding memory use
+HASH_CHUNK = 1 << 14
+
+# Where a line of the corpus comes from
+Entry = namedtuple('Entry', ['file', 'line', 'hindi', 'telugu'])
+
+COLUMNS = {'pair': None, 'hindi': 0, 'telugu': 1}
+
+
+class MinHashLSH:
+    """Locality-sensitive hashing index over the MinHash signatures of texts.
+
+    With b bands of r rows, two texts of Jaccard similarity s share a band
+    with probability 1 - (1 - s^r)^b; the default 16 bands of 8 rows find
+    about 95% of the pairs at 0.8 and hardly any below 0.5.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS, threshold: float = THRESHOLD,
+                 ngram_range: Tuple[int, int] = (1, 3), seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.ngram_range = ngram_range
+
+        # Multiply-shift hash functions (a * x + b) >> 32 over 64-bit integers
+        random = np.random.RandomState(seed)
+        self.a = (random.randint(1, 1 << 62, size=num_perm, dtype=np.uint64) | np.uint64(1))[:, None]
+        self.b = random.randint(0, 1 << 62, size=num_perm, dtype=np.uint64)[:, None]
+        # Odd multipliers combining the rows of a band into one key
+        self.band_weights = random.randint(1, 1 << 62, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self.band_keys = np.empty((bands, 0), dtype=np.uint64)
+        self.band_order = np.empty((bands, 0), dtype=np.int64)
+        self.sorted_keys = np.empty((bands, 0), dtype=np.uint64)
+
+    def _ngram_hashes(self, text: str) -> List[int]:
+        return [zlib.crc32(ngram.encode('utf-8')) for ngram in char_ngrams(text, self.ngram_range)]
+
+    def _minhash(self, hashes: List[int], offsets: List[int]) -> np.ndarray:
+        """Signatures of consecutive texts whose n-gram hashes are hashes[offsets[i]:offsets[i + 1]]."""
+        signatures = np.full((len(offsets) - 1, self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        offsets = np.array(offsets)
+        nonempty = offsets[1:] > offsets[:-1]
+        if nonempty.any():
+            # One row per hash function keeps the reduction over contiguous memory
+            hashes = np.array(hashes, dtype=np.uint64)
+            permuted = ((self.a * hashes + self.b) >> np.uint64(32)).astype(np.uint32)
+            signatures[nonempty] = np.minimum.reduceat(permuted, offsets[:-1][nonempty], axis=1).T
+        return signatures
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of one text."""
+        hashes = self._ngram_hashes(text)
+        return self._minhash(hashes, [0, len(hashes)])[0]
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """One 64-bit key per band and text, shape (bands, texts)."""
+        rows = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        return (rows * self.band_weights).sum(axis=2).T
+
+    def build(self, texts: List[str]) -> None:
+        """Index texts, referred to by their position in the list from then on."""
+        chunks = []
+        hashes, offsets = [], [0]
+        for text in texts:
+            hashes.extend(self._ngram_hashes(text))
+            offsets.append(len(hashes))
+            if len(hashes) >= HASH_CHUNK:
+                chunks.append(self._minhash(hashes, offsets))
+                hashes, offsets = [], [0]
+        chunks.append(self._minhash(hashes, offsets))
+
+        self.signatures = np.concatenate(chunks)
+        self.band_keys = self._band_keys(self.signatures)
+        self.band_order = np.argsort(self.band_keys, axis=1, kind='stable')
+        self.sorted_keys = np.take_along_axis(self.band_keys, self.band_order, axis=1)
+
+    def similarity(self, i: int, j: int) -> float:
+        """Estimated Jaccard similarity of the n-grams of two indexed texts."""
+        return float(np.mean(self.signatures[i] == self.signatures[j]))
+
+    def query(self, text: str, threshold: float = None) -> List[Tuple[int, float]]:
+        """Indexed texts similar to text, as (position, estimated similarity), most similar first."""
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.signature(text)
+        keys = self._band_keys(signature[None, :])[:, 0]
+
+        candidates = []
+        for band in range(self.bands):
+            start = np.searchsorted(self.sorted_keys[band], keys[band], side='left')
+            end = np.searchsorted(self.sorted_keys[band], keys[band], side='right')
+            candidates.append(self.band_order[band][start:end])
+        candidates = np.unique(np.concatenate(candidates))
+
+        similarities = (self.signatures[candidates] == signature).mean(axis=1)
+        keep = similarities >= threshold
+        order = np.argsort(-similarities[keep], kind='stable')
+        return [(int(i), float(s)) for i, s in zip(candidates[keep][order], similarities[keep][order])]
+
+    def near_duplicate_pairs(self, threshold: float = None) -> List[Tuple[int, int]]:
+        """Pairs of indexed texts found similar through a shared band.
+
+        Within a band bucket every text is compared with the bucket's first
+        text only, so the work stays linear even for very common lines; texts
+        similar to each other but not to that one are linked via other bands.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        pairs = set()
+        for band in range(self.bands):
+            order = self.band_order[band]
+            keys = self.sorted_keys[band]
+            if len(keys) < 2:
+                continue
+            # Position of the first text of every bucket, for every text
+            new_bucket = np.concatenate(([True], keys[1:] != keys[:-1]))
+            leaders = order[np.flatnonzero(new_bucket)[np.cumsum(new_bucket) - 1]]
+            members = ~new_bucket
+            similarities = (self.signatures[order[members]] == self.signatures[leaders[members]]).mean(axis=1)
+            similar = similarities >= threshold
+            pairs.update(zip(leaders[members][similar].tolist(), order[members][similar].tolist()))
+        return sorted(pairs)
+
+    def clusters(self, threshold: float = None) -> List[List[int]]:
+        """Groups of two or more near-duplicate indexed texts, each sorted by position."""
+        parent = list(range(len(self.signatures)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in self.near_duplicate_pairs(threshold):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        groups = {}
+        for i in range(len(parent)):
+            groups.setdefault(find(i), []).append(i)
+        return [group for group in groups.values() if len(group) > 1]
+
+
+def load_corpus(data_dir: str) -> List[Entry]:
+    """Every line of the TSV files or tables of data_dir (aligned or tokenized), in file name order.
+
+    TSV lines without exactly two fields are left out, with a count printed
+    per file, so they are not part of a deduplicated copy either.
+    """
+    entries = []
+    for file_name in sorted(os.listdir(data_dir)):
+        if is_table(file_name):
+            table = read_table(os.path.join(data_dir, file_name), ['hindi', 'telugu'])
+            entries.extend(Entry(file_name, row, hindi, telugu)
+                           for row, (hindi, telugu) in enumerate(zip(table['hindi'], table['telugu']), 1))
+            continue
+        if not file_name.endswith('.tsv'):
+            continue
+        malformed = 0
+        with open(os.path.join(data_dir, file_name), 'r', encoding='utf-8') as tsv_file:
+            for line_number, line in enumerate(tsv_file, 1):
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) == 2:
+                    entries.append(Entry(file_name, line_number, *fields))
+                else:
+                    malformed += 1
+        if malformed:
+            print(f"Skipping {malformed} malformed lines in {file_name}")
+    return entries
+
+def entry_text(entry: Entry, column: str = 'pair') -> str:
+    """The text of an entry that gets compared: one side or both."""
+    index = COLUMNS[column]
+    if index is None:
+        return f"{entry.hindi}\t{entry.telugu}"
+    return entry[2 + index]
+
+
+class CorpusIndex:
+    """MinHashLSH over the distinct texts of a corpus, mapping them back to its lines.
+
+    With column='pair' the index holds whole "hindi\ttelugu" lines; a query
+    without a tab is then a single sentence, and gets compared with either
+    side through an index of each side, built on the first such query.
+    """
+
+    def __init__(self, entries: List[Entry], column: str = 'pair', **lsh_options):
+        self.entries = entries
+        self.column = column
+        self.lsh_options = lsh_options
+        self.side_indexes = None
+        # Exact duplicates share one text in the index
+        positions = {}
+        self.text_entries = []
+        for i, entry in enumerate(entries):
+            text = entry_text(entry, column)
+            if text not in positions:
+                positions[text] = len(self.text_entries)
+                self.text_entries.append([])
+            self.text_entries[positions[text]].append(i)
+        self.texts = list(positions)
+        self.lsh = MinHashLSH(**lsh_options)
+        self.lsh.build(self.texts)
+
+    def query(self, text: str, threshold: float = None) -> List[Tuple[Entry, float]]:
+        """Corpus lines similar to text, with their estimated similarity, most similar first."""
+        if self.column == 'pair' and '\t' not in text:
+            return self._query_sides(text, threshold)
+        return [(self.entries[i], similarity)
+                for position, similarity in self.lsh.query(text, threshold)
+                for i in self.text_entries[position]]
+
+    def _query_sides(self, text: str, threshold: float = None) -> List[Tuple[Entry, float]]:
+        """Corpus lines whose Hindi or Telugu side is similar to the sentence text."""
+        if self.side_indexes is None:
+            self.side_indexes = [CorpusIndex(self.entries, column, **self.lsh_options)
+                                 for column in ('hindi', 'telugu')]
+        best = {}
+        for side_index in self.side_indexes:
+            for position, similarity in side_index.lsh.query(text, threshold):
+                for i in side_index.text_entries[position]:
+                    best[i] = max(best.get(i, 0.0), similarity)
+        order = sorted(best, key=lambda i: (-best[i], i))
+        return [(self.entries[i], best[i]) for i in order]
+
+    def clusters(self, threshold: float = None) -> List[List[int]]:
+        """Groups of corpus line numbers (positions in entries) that are near duplicates."""
+        grouped = set()
+        clusters = []
+        for group in self.lsh.clusters(threshold):
+            clusters.append(sorted(i for position in group for i in self.text_entries[position]))
+            grouped.update(group)
+        for position, lines in enumerate(self.text_entries):
+            if len(lines) > 1 and position not in grouped:
+                clusters.append(lines)
+        return sorted(clusters)
+
+def redundant_lines(clusters: List[List[int]]) -> List[int]:
+    """Lines to drop to keep only the first line of every cluster."""
+    return sorted(i for cluster in clusters for i in cluster[1:])
+
+def write_deduplicated(entries: List[Entry], drop: List[int], output_dir: str, source_dir: str = None) -> None:
+    """Write the entries not in drop back into TSV files named like the input ones.
+
+    Tables are written as tables again, keeping every column of the kept
+    rows, which are read from the table of the same name in source_dir.
+    """
+    drop = set(drop)
+    files = {}
+    for i, entry in enumerate(entries):
+        files.setdefault(entry.file, [])
+        if i not in drop:
+            files[entry.file].append(entry)
+    os.makedirs(output_dir, exist_ok=True)
+    for file_name, file_entries in files.items():
+        if is_table(file_name):
+            table = read_table(os.path.join(source_dir, file_name))
+            rows = [entry.line - 1 for entry in file_entries]
+            write_table(os.path.join(output_dir, file_name), {name: [table[name][row] for row in rows]
+                                                              for name in table.names})
+            continue
+        with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as output_file:
+            for entry in file_entries:
+                output_file.write(f"{entry.hindi}\t{entry.telugu}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and remove near-duplicate lines of the aligned corpus.")
+    parser.add_argument('--source', default='data_aligned', help="folder with the aligned or tokenized TSV files or tables")
+    parser.add_argument('--dest', default=None, help="write the deduplicated TSV files into this folder")
+    parser.add_argument('--column', choices=sorted(COLUMNS), default='pair',
+                        help="compare the Hindi side, the Telugu side or both (default; a --query without a tab "
+                             "is then matched against either side)")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="minimum estimated Jaccard similarity")
+    parser.add_argument('--query', action='append', default=[], metavar='TEXT',
+                        help="print the near neighbours of TEXT (can be repeated)")
+    parser.add_argument('--show', type=int, default=10, help="number of largest clusters to print")
+    args = parser.parse_args()
+
+    entries = load_corpus(args.source)
+    index = CorpusIndex(entries, args.column, threshold=args.threshold)
+    print(f"Indexed {len(index.texts)} distinct texts of {len(entries)} lines")
+
+    for text in args.query:
+        print(f"\nNear neighbours of {text!r}:")
+        for entry, similarity in index.query(text):
+            print(f"{similarity:.3f}\t{entry.file}:{entry.line}\t{entry.hindi}\t{entry.telugu}")
+
+    clusters = index.clusters()
+    drop = redundant_lines(clusters)
+    print(f"\n{len(clusters)} clusters of near duplicates, {len(drop)} redundant lines")
+    for cluster in sorted(clusters, key=len, reverse=True)[:args.show]:
+        first = entries[cluster[0]]
+        print(f"{len(cluster)}\t{first.hindi}\t{first.telugu}")
+
+    if args.dest:
+        write_deduplicated(entries, drop, args.dest, args.source)
+        print(f"Deduplicated files have been saved to '{args.dest}'.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Shared multi-core driver for the per-folder pipeline stages."""
+import os
+import traceback
+from collections import namedtuple
+
+# One finished task: the arguments it ran with, what it returned and the
+# formatted traceback if it raised (result is None in that case).
+TaskResult = namedtuple('TaskResult', ['task', 'result', 'error'])
+
+
+def default_jobs():
+    """Number of worker processes to use when --jobs isn't given."""
+    return os.cpu_count() or 1
+
+def add_jobs_argument(parser):
+    """Add the shared --jobs N switch to an argparse parser."""
+    parser.add_argument('--jobs', '-j', type=int, default=default_jobs(),
+                        help="number of worker processes (default: all cores, 1 runs in-process)")
+
+def _init_worker():
+    # Workers log like the script that started them, if it set logging up
+    if os.environ.get('HINTEL_LOG_LEVEL'):
+        from stage_metrics import configure_logging
+        configure_logging()
+
+def _run_task(func_and_task):
+    func, task = func_and_task
+    try:
+        return TaskResult(task, func(*task), None)
+    except Exception:
+        return TaskResult(task, None, traceback.format_exc())
+
+def run_parallel(func, tasks, jobs=None, chunksize=None):
+    """Run func(*task) for every task, yielding TaskResults in task order.
+
+    Tasks are handed to the worker processes in chunks, and an exception
+    in one task is captured in its TaskResult instead of stopping the run.
+    func must be a module-level function so it can be sent to the workers.
+    """
+    tasks = list(tasks)
+    jobs = default_jobs() if jobs is None else jobs
+    work = [(func, task) for task in tasks]
+
+    if jobs <= 1 or len(tasks) <= 1:
+        yield from map(_run_task, work)
+        return
+
+    jobs = min(jobs, len(tasks))
+    if chunksize is None:
+        # A few chunks per worker keeps them busy when tasks differ in size
+        chunksize = max(1, len(tasks) // (jobs * 4))
+
+    # Imported here, as it pulls in multiprocessing, which every --help would pay for
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+        yield from executor.map(_run_task, work, chunksize=chunksize)
@@ -1,6 +1,14 @@
+import mmap
+import os
 import re
+from array import array
 from dataclasses import dataclass
 
+# Bytes of the mmap decoded at a time by iter_srt
+CHUNK_SIZE = 1 << 16
+
+BLOCK_SEPARATOR = re.compile(r'\n\n+')
+
 @dataclass
 class Subtitle:
     def __init__(self, index, start_time, end_time, text):
@@ -26,26 +34,195 @@ def parse_time(time_str):
     hours, minutes, seconds = time_str.split(':')
     return int(hours) * 3600 + int(minutes) * 60 + float(seconds.replace(',', '.'))
 
-def parse_srt(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    subtitle_blocks = re.split(r'\n\n+', content.strip())
-    subtitles = []
-
-    for block in subtitle_blocks:
-        lines = block.split('\n')
-        if len(lines) >= 3:
-            index = int(lines[0])
-            time_range = lines[1].split(' --> ')
-            text = ' '.join(lines[2:])
-            
-            subtitle = Subtitle(
-                index=index,
-                start_time=parse_time(time_range[0]),
-                end_time=parse_time(time_range[1]),
-                text=text
-            )
-            subtitles.append(subtitle)
-
-    return subtitles
\ No newline at end of file
+def _parse_block(block):
+    """(index, start_time, end_time, text) of a subtitle block, or None if it's too short."""
+    lines = block.split('\n')
+    if len(lines) < 3:
+        return None
+    index = int(lines[0])
+    time_range = lines[1].split(' --> ')
+    text = ' '.join(lines[2:])
+
+    return index, parse_time(time_range[0]), parse_time(time_range[1]), text
+
+def _iter_text(file_path):
+    """Yield the decoded text of a file in chunks read from an mmap of it.
+
+    Chunks end on a newline, so a chunk never cuts a character or a '\\r\\n'
+    in half, and newlines are translated the same way as in text mode.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = 0
+            while position < size:
+                end = mm.rfind(b'\n', position, position + CHUNK_SIZE) if position + CHUNK_SIZE < size else size - 1
+                if end == -1:
+                    end = mm.find(b'\n', position + CHUNK_SIZE)
+                    if end == -1:
+                        end = size - 1
+                text = mm[position:end + 1].decode('utf-8')
+                position = end + 1
+
+                if '\r' in text:
+                    text = text.replace('\r\n', '\n').replace('\r', '\n')
+                yield text
+
+def _iter_blocks(file_path):
+    """Yield the subtitle blocks of a file: the text between runs of blank lines.
+
+    Leading and trailing whitespace of the whole file is dropped, the same
+    as splitting the stripped file content on blank lines would.
+    """
+    def raw_blocks():
+        rest = ''
+        for text in _iter_text(file_path):
+            # Chunks end on a newline; the newlines at the end are kept for
+            # the next chunk, as a run of blank lines may go on there
+            text = rest + text
+            body = text.rstrip('\n')
+            *blocks, rest = BLOCK_SEPARATOR.split(body)
+            rest += text[len(body):]
+            yield from (block for block in blocks if block)
+        if rest:
+            yield rest
+
+    pending = None
+    whitespace_blocks = []
+    for block in raw_blocks():
+        if pending is None:
+            block = block.lstrip()
+            if block:
+                pending = block
+            continue
+        if block.isspace():
+            # Only kept if more subtitles follow, as it's trailing whitespace otherwise
+            whitespace_blocks.append(block)
+            continue
+        yield pending
+        yield from whitespace_blocks
+        whitespace_blocks = []
+        pending = block
+    if pending is not None:
+        yield pending.rstrip()
+
+def _iter_fields(file_path, tolerant=False, on_error=None):
+    for block in _iter_blocks(file_path):
+        try:
+            fields = _parse_block(block)
+        except (ValueError, IndexError) as e:
+            if not tolerant:
+                raise
+            if on_error is not None:
+                on_error(block, e)
+            else:
+                print(f"Skipping malformed subtitle block in {file_path}: {e}")
+            continue
+        if fields is not None:
+            yield fields
+
+def iter_srt(file_path, tolerant=False, on_error=None):
+    """Lazily parse an SRT file, yielding its subtitles one at a time.
+
+    The file is memory-mapped and scanned block by block, so subtitles are
+    available before the whole file is read. By default a malformed block
+    raises; with tolerant=True it is reported through on_error(block, error)
+    (or printed) and skipped.
+    """
+    for index, start_time, end_time, text in _iter_fields(file_path, tolerant, on_error):
+        yield Subtitle(index=index, start_time=start_time, end_time=end_time, text=text)
+
+def parse_srt(file_path, tolerant=False):
+    return list(iter_srt(file_path, tolerant=tolerant))
+
+
+class SubtitleRow:
+    """View of one row of a SubtitleTable that behaves like a Subtitle."""
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    @property
+    def index(self):
+        return self.table.index[self.row]
+
+    @property
+    def start_time(self):
+        return self.table.start_time[self.row]
+
+    @property
+    def end_time(self):
+        return self.table.end_time[self.row]
+
+    @property
+    def text(self):
+        return self.table.text(self.row)
+
+    def __eq__(self, other):
+        # Same equality as Subtitle: start, end times and text
+        return (self.start_time == other.start_time and
+                self.end_time == other.end_time and
+                self.text == other.text)
+
+    def __hash__(self):
+        return hash((self.start_time, self.end_time, self.text))
+
+    def __repr__(self):
+        return f"Subtitle(start_time={self.start_time}, end_time={self.end_time}, text='{self.text}')"
+
+class SubtitleTable:
+    """Columnar storage for the subtitles of one file.
+
+    index, start_time and end_time are typed arrays (usable as NumPy arrays
+    through np.frombuffer without copying) and all texts are kept in one
+    string, with text i being text_buffer[text_offsets[i]:text_offsets[i + 1]].
+    Indexing or iterating the table gives SubtitleRow views.
+    """
+    __slots__ = ('index', 'start_time', 'end_time', 'text_buffer', 'text_offsets')
+
+    def __init__(self, index=(), start_time=(), end_time=(), texts=()):
+        self.index = array('q', index)
+        self.start_time = array('d', start_time)
+        self.end_time = array('d', end_time)
+        texts = list(texts)
+        self.text_offsets = array('q', [0])
+        for text in texts:
+            self.text_offsets.append(self.text_offsets[-1] + len(text))
+        self.text_buffer = ''.join(texts)
+
+    @classmethod
+    def from_subtitles(cls, subtitles):
+        subtitles = list(subtitles)
+        return cls([sub.index for sub in subtitles], [sub.start_time for sub in subtitles],
+                   [sub.end_time for sub in subtitles], [sub.text for sub in subtitles])
+
+    def text(self, row):
+        return self.text_buffer[self.text_offsets[row]:self.text_offsets[row + 1]]
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('subtitle row out of range')
+        return SubtitleRow(self, row)
+
+    def __iter__(self):
+        return (SubtitleRow(self, row) for row in range(len(self)))
+
+def parse_srt_table(file_path, tolerant=False, on_error=None):
+    """Parse an SRT file straight into a SubtitleTable, without Subtitle objects."""
+    index, start_time, end_time = array('q'), array('d'), array('d')
+    texts = []
+    for fields in _iter_fields(file_path, tolerant, on_error):
+        index.append(fields[0])
+        start_time.append(fields[1])
+        end_time.append(fields[2])
+        texts.append(fields[3])
+    return SubtitleTable(index, start_time, end_time, texts)
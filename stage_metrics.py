@@ -0,0 +1,272 @@
+"""Per-file and per-stage metrics of the pipeline stages, written as JSON lines.
+
+A stage runs the work for each file inside file_metrics(), which records its
+wall and CPU time, bytes in and out, cue count, changed lines and the peak
+RSS of the process, and runs the whole stage inside stage_metrics(), which
+adds a summary line. Optionally the files of a chosen stage are profiled
+with cProfile or tracemalloc.
+
+The settings are passed on through environment variables, so worker
+processes started by parallel_runner record into the same file.
+"""
+import cProfile
+import json
+import logging
+import os
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+METRICS_ENV = 'HINTEL_METRICS'          # JSON lines file to append the records to
+RUN_ENV = 'HINTEL_METRICS_RUN'          # id shared by the records of one run
+PROFILE_ENV = 'HINTEL_PROFILE'          # 'cprofile' or 'tracemalloc'
+PROFILE_STAGE_ENV = 'HINTEL_PROFILE_STAGE'
+PROFILE_DIR_ENV = 'HINTEL_PROFILE_DIR'
+LOG_LEVEL_ENV = 'HINTEL_LOG_LEVEL'
+LOG_SAMPLE_ENV = 'HINTEL_LOG_SAMPLE'
+
+PROFILERS = ['cprofile', 'tracemalloc']
+DEFAULT_PROFILE_DIR = 'profiles'
+# Messages a SampledLog shows per file before it only counts them
+DEFAULT_LOG_SAMPLE = 5
+# Allocation sites listed per file when profiling with tracemalloc
+TRACEMALLOC_TOP = 25
+
+
+def add_metrics_arguments(parser):
+    """Add the shared metrics, profiling and logging switches to an argparse parser."""
+    parser.add_argument('--metrics', metavar='FILE', help="append per-file and per-stage metrics to FILE as JSON lines")
+    parser.add_argument('--profile', choices=PROFILERS, help="profile every file of the stage (see --profile-stage)")
+    parser.add_argument('--profile-stage', metavar='STAGE', help="only profile this stage (default: every stage run)")
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR, help="folder for the profiles, one per file")
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="level of the log messages to show (DEBUG shows sampled per-line changes)")
+    parser.add_argument('--log-sample', type=int, default=DEFAULT_LOG_SAMPLE,
+                        help="per-line messages shown per file before they are only counted")
+
+def configure(args):
+    """Apply the switches added by add_metrics_arguments, for this process and its workers."""
+    os.environ[RUN_ENV] = uuid.uuid4().hex[:12]
+    settings = {
+        METRICS_ENV: args.metrics and os.path.abspath(args.metrics),
+        PROFILE_ENV: args.profile,
+        PROFILE_STAGE_ENV: args.profile_stage,
+        PROFILE_DIR_ENV: os.path.abspath(args.profile_dir),
+        LOG_LEVEL_ENV: args.log_level,
+        LOG_SAMPLE_ENV: str(args.log_sample),
+    }
+    for name, value in settings.items():
+        if value:
+            os.environ[name] = value
+        else:
+            os.environ.pop(name, None)
+    configure_logging()
+
+def configure_logging():
+    """Set up the root logger from the environment.
+
+    Only for scripts: configure() calls it, and so do the worker processes
+    of parallel_runner when a script configured the run. The metrics context
+    managers leave logging alone, so modules importing them keep their own.
+    """
+    logging.basicConfig(format='%(message)s', level=os.environ.get(LOG_LEVEL_ENV, 'INFO'), force=True)
+
+def peak_rss_mb(who=None):
+    """Peak resident memory of this process (or its finished children) so far, in MB."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # ru_maxrss is in kilobytes on Linux
+    return usage.ru_maxrss / 1024
+
+def write_record(record):
+    """Append one record to the metrics file as a single write, safe across processes."""
+    path = os.environ.get(METRICS_ENV)
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def count_cues(text):
+    """Number of subtitles in SRT text, by their timestamp lines."""
+    return text.count('-->')
+
+
+class FileMetrics:
+    """Counters a stage fills in for one file while it works on it."""
+
+    def __init__(self, stage, name):
+        self.stage = stage
+        self.name = name
+        self.enabled = bool(os.environ.get(METRICS_ENV))
+        self.cues = 0
+        self.lines_changed = 0
+        self.steps = {}
+
+    def add(self, cues=0, lines_changed=0):
+        self.cues += cues
+        self.lines_changed += lines_changed
+
+    @contextmanager
+    def step(self, name):
+        """Time a part of the work on the file, e.g. one cleaning step."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = self.steps.get(name, 0.0) + time.perf_counter() - start
+
+
+def _profiler_for(stage):
+    profiler = os.environ.get(PROFILE_ENV)
+    if profiler and os.environ.get(PROFILE_STAGE_ENV, stage) == stage:
+        return profiler
+    return None
+
+def _profile_path(stage, name, extension):
+    folder = os.path.join(os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR), stage)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name.replace(os.sep, '_').replace('/', '_') + extension)
+
+@contextmanager
+def file_metrics(stage, name, inputs=(), outputs=()):
+    """Measure the work on one file (or folder) of a stage, yielding its FileMetrics.
+
+    inputs and outputs are the paths read and written, for the byte counts.
+    """
+    record = FileMetrics(stage, name)
+    profiler = _profiler_for(stage)
+    if not record.enabled and not profiler:
+        yield record
+        return
+
+    profile = None
+    if profiler == 'cprofile':
+        profile = cProfile.Profile()
+        profile.enable()
+    elif profiler == 'tracemalloc':
+        tracemalloc.start()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    error = None
+    try:
+        yield record
+    except BaseException as e:
+        error = repr(e)
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        traced_peak = None
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(_profile_path(stage, name, '.prof'))
+        elif profiler == 'tracemalloc':
+            traced_peak = tracemalloc.get_traced_memory()[1] / 1e6
+            top = tracemalloc.take_snapshot().statistics('lineno')[:TRACEMALLOC_TOP]
+            tracemalloc.stop()
+            with open(_profile_path(stage, name, '.tracemalloc.txt'), 'w', encoding='utf-8') as f:
+                f.write(f"peak traced memory: {traced_peak:.2f} MB\n")
+                f.writelines(f"{stat}\n" for stat in top)
+
+        if record.enabled:
+            entry = {
+                'type': 'file', 'run': os.environ.get(RUN_ENV), 'stage': stage, 'file': name,
+                'wall_s': wall, 'cpu_s': cpu,
+                'bytes_in': sum(_size(path) for path in inputs),
+                'bytes_out': sum(_size(path) for path in outputs),
+                'cues': record.cues, 'lines_changed': record.lines_changed,
+                'peak_rss_mb': peak_rss_mb(), 'pid': os.getpid(),
+            }
+            if record.steps:
+                entry['steps'] = record.steps
+            if traced_peak is not None:
+                entry['traced_peak_mb'] = traced_peak
+            if error:
+                entry['error'] = error
+            write_record(entry)
+
+@contextmanager
+def stage_metrics(stage):
+    """Measure a whole stage run, adding a summary of its file records at the end.
+
+    Wall and CPU time include the worker processes once they have exited.
+    The summary only reads the records appended since the stage started, so
+    its cost doesn't grow with the runs already in the metrics file.
+    """
+    start_wall = time.perf_counter()
+    start_times = os.times()
+    start_size = _size(os.environ[METRICS_ENV]) if os.environ.get(METRICS_ENV) else 0
+    try:
+        yield
+    finally:
+        if os.environ.get(METRICS_ENV):
+            times = os.times()
+            cpu = sum(after - before for after, before in zip(times[:4], start_times[:4]))
+            summary = {
+                'type': 'stage', 'run': os.environ.get(RUN_ENV), 'stage': stage,
+                'wall_s': time.perf_counter() - start_wall, 'cpu_s': cpu,
+                'files': 0, 'bytes_in': 0, 'bytes_out': 0, 'cues': 0, 'lines_changed': 0, 'errors': 0,
+                'peak_rss_mb': max(filter(None, [peak_rss_mb(), resource and peak_rss_mb(resource.RUSAGE_CHILDREN)]),
+                                   default=None),
+            }
+            for entry in read_records(os.environ[METRICS_ENV], start_size, run=summary['run'],
+                                      stage=stage, type='file'):
+                summary['files'] += 1
+                summary['errors'] += 'error' in entry
+                for key in ('bytes_in', 'bytes_out', 'cues', 'lines_changed'):
+                    summary[key] += entry[key]
+            write_record(summary)
+
+def read_records(path, start=0, **match):
+    """The records of a metrics file whose fields equal the given values.
+
+    start is a byte offset to read from, the size of the file at some
+    earlier point, to only get the records appended since.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        f.seek(start)
+        for line in f:
+            entry = json.loads(line)
+            if all(entry.get(key) == value for key, value in match.items()):
+                yield entry
+
+
+class SampledLog:
+    """Log the first few messages of a kind per file, and only count the rest.
+
+    Call it like logger.log without the level; finish() reports how many
+    messages were left out.
+    """
+
+    def __init__(self, logger, level=logging.DEBUG, limit=None):
+        self.logger = logger
+        self.level = level
+        self.limit = int(os.environ.get(LOG_SAMPLE_ENV, DEFAULT_LOG_SAMPLE)) if limit is None else limit
+        self.count = 0
+
+    def __call__(self, message, *args):
+        self.count += 1
+        if self.count <= self.limit and self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, message, *args)
+
+    def finish(self, what='messages'):
+        if self.count > self.limit:
+            self.logger.log(self.level, "... and %d more %s", self.count - self.limit, what)
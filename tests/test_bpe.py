@@ -0,0 +1,131 @@
+import os
+from collections import Counter, defaultdict
+
+import pytest
+
+from data_tokenized import BPE, count_words, load_tsv, pre_tokenize
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_aligned')
+FILES = ['data-1_aligned_1.tsv', 'data-2_aligned_2.tsv']
+# Lines taken from each file; the baseline trainer rescans every word per merge
+LINES = 600
+VOCAB_SIZE = 250
+
+
+def corpus_files():
+    return [load_tsv(os.path.join(DATA_DIR, name))[:LINES] for name in FILES]
+
+
+@pytest.fixture(scope='module', params=[0, 1], ids=['hindi', 'telugu'])
+def texts(request):
+    return [[line[request.param] for line in lines] for lines in corpus_files()]
+
+
+def baseline_train(corpus, vocab_size):
+    """Merges of BPE.train as it was before the incremental trainer, to compare against."""
+    word_freqs = defaultdict(int)
+    for text in corpus:
+        for word in pre_tokenize(text):
+            word_freqs[word] += 1
+    vocab = ["</w>"] + sorted(set(char for word in word_freqs for char in word))
+    splits = {word: list(word) for word in word_freqs}
+    merges = {}
+    while len(vocab) < vocab_size:
+        pair_freqs = defaultdict(int)
+        for word, freq in word_freqs.items():
+            split = splits[word]
+            for pair in zip(split, split[1:]):
+                pair_freqs[pair] += freq
+        if not pair_freqs:
+            break
+        a, b = max(pair_freqs, key=pair_freqs.get)
+        for word, split in splits.items():
+            i, new_split = 0, []
+            while i < len(split):
+                if i < len(split) - 1 and split[i] == a and split[i + 1] == b:
+                    new_split.append(a + b)
+                    i += 2
+                else:
+                    new_split.append(split[i])
+                    i += 1
+            splits[word] = new_split
+        merges[a, b] = a + b
+        vocab.append(a + b)
+    return merges
+
+
+@pytest.fixture(scope='module')
+def baseline_merges(texts):
+    return baseline_train([text for file_texts in texts for text in file_texts], VOCAB_SIZE)
+
+
+def test_train_matches_baseline(texts, baseline_merges):
+    bpe = BPE([text for file_texts in texts for text in file_texts], VOCAB_SIZE)
+    bpe.train()
+    assert list(bpe.merges.items()) == list(baseline_merges.items())
+
+
+def test_train_on_merged_file_counts_matches_baseline(texts, baseline_merges):
+    # How process_tsv_files trains: word counts per file, merged in file order
+    word_freqs = Counter()
+    for file_texts in texts:
+        word_freqs.update(count_words(file_texts))
+    bpe = BPE([], VOCAB_SIZE)
+    bpe.train(word_freqs)
+    assert list(bpe.merges.items()) == list(baseline_merges.items())
+
+
+def test_truncated_matches_training_to_the_smaller_size(texts):
+    corpus = [text for file_texts in texts for text in file_texts]
+    bpe = BPE(corpus, VOCAB_SIZE)
+    bpe.train()
+    assert list(bpe.truncated(180).merges.items()) == list(baseline_train(corpus, 180).items())
+
+
+def baseline_tokenize(merges, text):
+    """BPE.tokenize as it was before the rank-based encoder, to compare against."""
+    splits = [list(word) for word in pre_tokenize(text)]
+    for pair, merge in merges.items():
+        for idx, split in enumerate(splits):
+            i = 0
+            while i < len(split) - 1:
+                if split[i] == pair[0] and split[i + 1] == pair[1]:
+                    split = split[:i] + [merge] + split[i + 2:]
+                else:
+                    i += 1
+            splits[idx] = split
+    return sum(splits, [])
+
+
+@pytest.fixture(scope='module')
+def trained(texts):
+    bpe = BPE([text for file_texts in texts for text in file_texts], VOCAB_SIZE)
+    bpe.train()
+    return bpe
+
+
+@pytest.mark.parametrize('cache_size', [4, None])
+def test_tokenize_matches_baseline(texts, trained, cache_size):
+    bpe = BPE([], VOCAB_SIZE, cache_size=cache_size)
+    bpe.merges = trained.merges
+    lines = texts[0]
+    expected = [baseline_tokenize(trained.merges, line) for line in lines]
+    assert [bpe.tokenize(line) for line in lines] == expected
+    assert bpe.tokenize_batch(lines) == expected
+
+
+def test_tokenize_sizes_matches_baseline(texts, trained):
+    lines = texts[1]
+    sizes = [120, 180, VOCAB_SIZE]
+    by_size = trained.tokenize_sizes(lines, sizes)
+    for size in sizes:
+        merges = trained.truncated(size).merges
+        assert by_size[size] == [baseline_tokenize(merges, line) for line in lines]
+
+
+def test_saved_merges_tokenize_the_same(tmp_path, texts, trained):
+    path = str(tmp_path / 'model.bpe')
+    trained.save(path)
+    loaded = BPE.load(path)
+    assert list(loaded.merges.items()) == list(trained.merges.items())
+    assert loaded.tokenize_batch(texts[0]) == trained.tokenize_batch(texts[0])
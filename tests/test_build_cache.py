@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+import build_cache
+from build_cache import MANIFEST_NAME, BuildCache, stage_hash
+
+
+@pytest.fixture
+def files(tmp_path):
+    source, output = tmp_path / 'input.srt', tmp_path / 'out' / 'output.srt'
+    source.write_text('one', encoding='utf-8')
+    output.parent.mkdir()
+    output.write_text('built', encoding='utf-8')
+    return str(source), str(output)
+
+
+def recorded(files, stage='stage'):
+    source, output = files
+    cache = BuildCache(os.path.dirname(output), stage)
+    cache.record('key', [source], [output])
+    cache.save()
+    return BuildCache(os.path.dirname(output), stage)
+
+
+def set_mtime(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_fresh_after_record(files):
+    source, output = files
+    assert not BuildCache(os.path.dirname(output), 'stage').is_fresh('key', [source])
+    cache = recorded(files)
+    assert cache.is_fresh('key', [source])
+    assert cache.is_fresh('key', [source], [output])
+
+
+def test_content_change_invalidates(files):
+    source, output = files
+    cache = recorded(files)
+    mtime = os.stat(source).st_mtime_ns
+    with open(source, 'w', encoding='utf-8') as f:
+        f.write('two')  # same size
+    set_mtime(source, mtime + 1)
+    assert not cache.is_fresh('key', [source])
+
+
+def test_touched_file_with_same_content_stays_fresh(files, monkeypatch):
+    source, output = files
+    cache = recorded(files)
+    set_mtime(source, os.stat(source).st_mtime_ns + 10 ** 9)
+    assert cache.is_fresh('key', [source])
+    cache.save()
+
+    # The new mtime was remembered, so the file isn't hashed again
+    hashed = []
+    monkeypatch.setattr(build_cache, 'file_hash', lambda path: hashed.append(path))
+    assert BuildCache(os.path.dirname(output), 'stage').is_fresh('key', [source])
+    assert hashed == []
+
+
+def test_size_change_invalidates(files):
+    source, output = files
+    cache = recorded(files)
+    mtime = os.stat(source).st_mtime_ns
+    with open(source, 'w', encoding='utf-8') as f:
+        f.write('longer')
+    set_mtime(source, mtime)  # only the size tells
+    assert not cache.is_fresh('key', [source])
+
+
+def test_stage_hash_change_invalidates_everything(files):
+    source, output = files
+    recorded(files, stage='old')
+    assert not BuildCache(os.path.dirname(output), 'new').is_fresh('key', [source])
+
+
+def test_force_ignores_the_manifest(files):
+    source, output = files
+    recorded(files)
+    assert not BuildCache(os.path.dirname(output), 'stage', force=True).is_fresh('key', [source])
+
+
+def test_outputs_and_inputs_must_match(files, tmp_path):
+    source, output = files
+    cache = recorded(files)
+    other = tmp_path / 'other.srt'
+    other.write_text('x', encoding='utf-8')
+    assert not cache.is_fresh('key', [source, str(other)])
+    assert not cache.is_fresh('key', [source], [output, str(other)])
+    os.remove(output)
+    assert not cache.is_fresh('key', [source])
+
+
+def test_broken_manifest_rebuilds(files):
+    source, output = files
+    recorded(files)
+    with open(os.path.join(os.path.dirname(output), MANIFEST_NAME), 'w') as f:
+        f.write('{not json')
+    assert not BuildCache(os.path.dirname(output), 'stage').is_fresh('key', [source])
+
+
+def test_prune(files):
+    source, output = files
+    cache = recorded(files)
+    cache.record('other', [source], [output])
+    cache.prune(['other'])
+    cache.save()
+    cache = BuildCache(os.path.dirname(output), 'stage')
+    assert list(cache.entries) == ['other']
+    assert not cache.is_fresh('key', [source])
+    assert cache.is_fresh('other', [source])
+
+
+def test_stage_hash(tmp_path):
+    code = tmp_path / 'stage.py'
+    code.write_text('x = 1', encoding='utf-8')
+    first = stage_hash([str(code)], {'a': 1, 'b': [2]})
+    assert stage_hash([str(code), str(code)], {'b': [2], 'a': 1}) == first
+    assert stage_hash([str(code)], {'a': 2, 'b': [2]}) != first
+    code.write_text('x = 2', encoding='utf-8')
+    assert stage_hash([str(code)], {'a': 1, 'b': [2]}) != first
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+
+from corpus_columns import ARROW_SUFFIX, NUMPY_SUFFIX, export_tsv, read_table, write_table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEXTS = ['', 'नमस्ते', 'తెలుగు\twith a tab', '😀 non-BMP 𝄞', 'line\nbreak', '']
+
+
+@pytest.fixture(params=[NUMPY_SUFFIX, ARROW_SUFFIX])
+def suffix(request):
+    if request.param == ARROW_SUFFIX:
+        pytest.importorskip('pyarrow')
+    return request.param
+
+
+def test_round_trip(tmp_path, suffix):
+    path = str(tmp_path / f'table{suffix}')
+    rows = len(TEXTS)
+    write_table(path, {'film': np.arange(rows), 'hindi': TEXTS, 'telugu': TEXTS[::-1],
+                       'score': np.linspace(0, 1, rows), 'count': [1, 2, 3, 4, 5, 6]})
+    table = read_table(path)
+    assert len(table) == rows
+    assert table.names == ['film', 'hindi', 'telugu', 'score', 'count']
+    assert table['hindi'].tolist() == TEXTS
+    assert [table['telugu'][row] for row in range(rows)] == TEXTS[::-1]
+    assert table['hindi'][-3] == TEXTS[-3]
+    with pytest.raises(IndexError):
+        table['hindi'][rows]
+    assert table['film'].tolist() == list(range(rows))
+    assert table['film'].dtype == np.int64
+    assert np.array_equal(table['score'], np.linspace(0, 1, rows))
+    assert table['count'].tolist() == [1, 2, 3, 4, 5, 6]
+
+
+def test_selected_columns(tmp_path, suffix):
+    path = str(tmp_path / f'table{suffix}')
+    write_table(path, {'hindi': TEXTS, 'telugu': TEXTS, 'score': np.zeros(len(TEXTS))})
+    table = read_table(path, ['telugu'])
+    assert table.names == ['telugu']
+    assert list(table['telugu']) == TEXTS
+    with pytest.raises(KeyError):
+        read_table(path, ['film'])
+
+
+def test_empty_table(tmp_path, suffix):
+    path = str(tmp_path / f'table{suffix}')
+    write_table(path, {'hindi': [], 'score': np.zeros(0)})
+    table = read_table(path)
+    assert len(table) == 0
+    assert table['hindi'].tolist() == []
+    assert len(table['score']) == 0
+
+
+def test_write_errors(tmp_path):
+    with pytest.raises(ValueError):
+        write_table(str(tmp_path / f'table{NUMPY_SUFFIX}'), {'hindi': ['a'], 'telugu': []})
+    with pytest.raises(ValueError):
+        write_table(str(tmp_path / 'table.tsv'), {'hindi': ['a']})
+    assert os.listdir(tmp_path) == []
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('tsv', ['data_aligned/data-1_aligned_1.tsv',
+                                 'data_similarity_scoring/similarity_data-1_tokenized_1.tsv'])
+def test_export_matches_the_tsv_output(tmp_path, suffix, tsv):
+    content = read_lines(os.path.join(ROOT, tsv))
+    lines = content.splitlines()
+    columns = {}
+    if lines[0].startswith('Hindi\t'):
+        rows = [line.split('\t') for line in lines[1:]]
+        columns['score'] = [float(score) for _, _, score in rows]
+    else:
+        rows = [line.split('\t') for line in lines]
+    columns['hindi'] = [row[0] for row in rows]
+    columns['telugu'] = [row[1] for row in rows]
+    table_path = str(tmp_path / f'table{suffix}')
+    write_table(table_path, columns)
+    export_tsv(table_path, str(tmp_path / 'exported.tsv'))
+    assert read_lines(tmp_path / 'exported.tsv') == content
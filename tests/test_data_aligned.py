@@ -0,0 +1,153 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip('dtaidistance')
+from dtaidistance import dtw
+
+from data_aligned import (align_subtitles, length_based_refinement, score_alignments, subtitle_columns,
+                          time_based_alignment)
+from srt_parser import Subtitle, SubtitleTable, parse_srt, parse_srt_table
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_deaccented')
+# Small films, as the baseline compares every Hindi cue with every Telugu cue
+FOLDERS = ['data-106', 'data-48', 'data-91']
+
+
+def baseline_align_subtitles(hindi_subs, telugu_subs, threshold=0.5, max_length_diff=0.25):
+    """align_subtitles as it was on Subtitle lists before the columnar rewrite, to compare against."""
+    def score(h_sub, t_sub):
+        overlap = max(0, min(h_sub.end_time, t_sub.end_time) - max(h_sub.start_time, t_sub.start_time))
+        total = max(h_sub.end_time, t_sub.end_time) - min(h_sub.start_time, t_sub.start_time)
+        time_score = overlap / total if total > 0 else 0
+        max_length = max(len(h_sub.text), len(t_sub.text))
+        length_score = 1 - abs(len(h_sub.text) - len(t_sub.text)) / max_length if max_length > 0 else 0
+        return 0.6 * time_score + 0.4 * length_score
+
+    time_pairs = []
+    for h_sub in hindi_subs:
+        for t_sub in telugu_subs:
+            overlap = max(0, min(h_sub.end_time, t_sub.end_time) - max(h_sub.start_time, t_sub.start_time))
+            total = max(h_sub.end_time, t_sub.end_time) - min(h_sub.start_time, t_sub.start_time)
+            if total > 0 and overlap / total > threshold:
+                time_pairs.append((h_sub, t_sub))
+    length_pairs = []
+    for h_sub, t_sub in time_pairs:
+        max_length = max(len(h_sub.text), len(t_sub.text))
+        if max_length > 0 and abs(len(h_sub.text) - len(t_sub.text)) / max_length <= max_length_diff:
+            length_pairs.append((h_sub, t_sub))
+
+    aligned_hindi = set(pair[0] for pair in length_pairs)
+    aligned_telugu = set(pair[1] for pair in length_pairs)
+    unaligned_hindi = [sub for sub in hindi_subs if sub not in aligned_hindi]
+    unaligned_telugu = [sub for sub in telugu_subs if sub not in aligned_telugu]
+    dtw_pairs = []
+    if unaligned_hindi and unaligned_telugu:
+        path = dtw.warping_path([len(sub.text) for sub in unaligned_hindi], [len(sub.text) for sub in unaligned_telugu])
+        dtw_pairs = [(unaligned_hindi[i], unaligned_telugu[j]) for i, j in path]
+
+    scored = [(pair, score(*pair)) for pair in time_pairs + length_pairs + dtw_pairs]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    final_pairs, used_hindi, used_telugu = [], set(), set()
+    for (h_sub, t_sub), _ in scored:
+        if h_sub not in used_hindi and t_sub not in used_telugu:
+            final_pairs.append((h_sub, t_sub))
+            used_hindi.add(h_sub)
+            used_telugu.add(t_sub)
+    return final_pairs
+
+
+def pair_fields(pairs):
+    return [((h.start_time, h.end_time, h.text), (t.start_time, t.end_time, t.text)) for h, t in pairs]
+
+
+@pytest.mark.parametrize('folder', FOLDERS)
+def test_table_columns_match_baseline_subtitles(folder):
+    path = os.path.join(DATA_DIR, folder, f"hin-{folder.split('-')[1]}.srt")
+    subtitles = parse_srt(path)
+    table = parse_srt_table(path)
+    assert len(table) == len(subtitles)
+    assert list(table.index) == [sub.index for sub in subtitles]
+    assert [(row.start_time, row.end_time, row.text) for row in table] == \
+        [(sub.start_time, sub.end_time, sub.text) for sub in subtitles]
+    assert all(row == sub and hash(row) == hash(sub) for row, sub in zip(table, subtitles))
+
+
+@pytest.mark.parametrize('folder', FOLDERS)
+def test_alignment_matches_baseline(folder):
+    number = folder.split('-')[1]
+    hindi_path = os.path.join(DATA_DIR, folder, f'hin-{number}.srt')
+    telugu_path = os.path.join(DATA_DIR, folder, f'tel-{number}.srt')
+    expected = baseline_align_subtitles(parse_srt(hindi_path), parse_srt(telugu_path))
+    assert pair_fields(align_subtitles(parse_srt_table(hindi_path), parse_srt_table(telugu_path))) == \
+        pair_fields(expected)
+
+
+def baseline_overlap_score(h_sub, t_sub):
+    overlap = max(0, min(h_sub.end_time, t_sub.end_time) - max(h_sub.start_time, t_sub.start_time))
+    total = max(h_sub.end_time, t_sub.end_time) - min(h_sub.start_time, t_sub.start_time)
+    return overlap / total if total > 0 else None
+
+
+def random_subtitles(rng, count):
+    """Subtitles with random, often overlapping times, some without duration and some repeated."""
+    subtitles = []
+    for index in range(1, count + 1):
+        if subtitles and rng.random() < 0.1:
+            previous = rng.choice(subtitles)
+            subtitles.append(Subtitle(index, previous.start_time, previous.end_time, previous.text))
+            continue
+        start = round(rng.uniform(0, 60), 1)
+        duration = rng.choice([0.0, round(rng.uniform(0.1, 4), 1), round(rng.uniform(4, 20), 1)])
+        text = 'x' * rng.randint(0, 12)
+        subtitles.append(Subtitle(index, start, start + duration, text))
+    return subtitles
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('threshold', [0.5, 0.0, -1.0])
+def test_time_based_alignment_matches_comparing_every_pair(seed, threshold):
+    rng = random.Random(seed)
+    hindi, telugu = random_subtitles(rng, 60), random_subtitles(rng, 50)
+    expected = [(h_sub, t_sub) for h_sub in hindi for t_sub in telugu
+                if baseline_overlap_score(h_sub, t_sub) is not None and baseline_overlap_score(h_sub, t_sub) > threshold]
+    assert pair_fields(time_based_alignment(hindi, telugu, threshold)) == pair_fields(expected)
+    assert pair_fields(time_based_alignment(SubtitleTable.from_subtitles(hindi), SubtitleTable.from_subtitles(telugu),
+                                            threshold)) == pair_fields(expected)
+
+
+def baseline_score_alignment(h_sub, t_sub):
+    """data_aligned.score_alignment as it was before the vectorized scoring, to compare against."""
+    time_score = baseline_overlap_score(h_sub, t_sub) or 0
+    max_length = max(len(h_sub.text), len(t_sub.text))
+    length_score = 1 - abs(len(h_sub.text) - len(t_sub.text)) / max_length if max_length > 0 else 0
+    return 0.6 * time_score + 0.4 * length_score
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_scores_and_refinement_match_the_scalar_versions(seed):
+    rng = random.Random(seed)
+    hindi_subs, telugu_subs = random_subtitles(rng, 40), random_subtitles(rng, 30)
+    hindi, telugu = subtitle_columns(hindi_subs), subtitle_columns(telugu_subs)
+    hi, ti = np.divmod(np.arange(len(hindi_subs) * len(telugu_subs)), len(telugu_subs))
+    expected = [baseline_score_alignment(hindi_subs[i], telugu_subs[j]) for i, j in zip(hi, ti)]
+    assert score_alignments(hindi, telugu, hi, ti) == pytest.approx(expected, abs=1e-12)
+
+    refined = length_based_refinement(hindi, telugu, hi, ti)
+    expected = [(i, j) for i, j in zip(hi.tolist(), ti.tolist())
+                if max(len(hindi_subs[i].text), len(telugu_subs[j].text)) > 0 and
+                abs(len(hindi_subs[i].text) - len(telugu_subs[j].text)) /
+                max(len(hindi_subs[i].text), len(telugu_subs[j].text)) <= 0.25]
+    assert list(zip(*(part.tolist() for part in refined))) == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_alignment_matches_baseline(seed):
+    rng = random.Random(seed)
+    hindi, telugu = random_subtitles(rng, 60), random_subtitles(rng, 50)
+    expected = pair_fields(baseline_align_subtitles(hindi, telugu))
+    assert pair_fields(align_subtitles(hindi, telugu)) == expected
+    assert pair_fields(align_subtitles(SubtitleTable.from_subtitles(hindi),
+                                       SubtitleTable.from_subtitles(telugu))) == expected
@@ -0,0 +1,95 @@
+import codecs
+import os
+
+import pytest
+
+import data_encode
+from data_encode import convert_to_utf8, detect_encoding, is_utf8, run
+
+TEXT = '1\r\n00:00:01,000 --> 00:00:02,000\r\nनमस्ते దుస్తులు café\r\n'
+EXPECTED = TEXT.replace('\r\n', '\n').encode('utf-8')
+
+
+def convert(tmp_path, content, link=False):
+    source, dest = tmp_path / 'source.srt', tmp_path / 'dest.srt'
+    source.write_bytes(content)
+    convert_to_utf8(str(source), str(dest), detect_encoding(str(source)), link)
+    return dest.read_bytes()
+
+
+@pytest.mark.parametrize('bom, codec, encoding', [
+    (codecs.BOM_UTF8, 'utf-8', 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le', 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be', 'utf-16'),
+    (codecs.BOM_UTF32_LE, 'utf-32-le', 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be', 'utf-32'),
+])
+def test_boms(tmp_path, bom, codec, encoding):
+    content = bom + TEXT.encode(codec)
+    path = tmp_path / 'bom.srt'
+    path.write_bytes(content)
+    assert detect_encoding(str(path)) == encoding
+    assert convert(tmp_path, content) == EXPECTED
+
+
+def test_utf8_across_chunk_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_encode, 'CHUNK_SIZE', 5)
+    path = tmp_path / 'utf8.srt'
+    # Every chunk boundary falls inside a multi-byte character somewhere
+    path.write_bytes(('नमस्ते' * 7).encode('utf-8'))
+    assert is_utf8(str(path))
+    assert detect_encoding(str(path)) == 'utf-8'
+    path.write_bytes(('नमस्ते' * 7).encode('utf-8')[:-1])
+    assert not is_utf8(str(path))
+
+
+def test_invalid_utf8_falls_back_to_chardet(tmp_path):
+    chardet = pytest.importorskip('chardet')
+    text = "Ça va très bien, merci. Où êtes-vous allé hier soir? À demain!\r\n" * 20
+    content = text.encode('cp1252')
+    path = tmp_path / 'latin.srt'
+    path.write_bytes(content)
+    assert not is_utf8(str(path))
+    # The file is smaller than SAMPLE_SIZE, so chardet sees all of it like it used to
+    encoding = detect_encoding(str(path))
+    assert encoding == chardet.detect(content)['encoding']
+    expected = content.decode(encoding, errors='replace').replace('\r\n', '\n').encode('utf-8')
+    assert convert(tmp_path, content) == expected
+
+
+def test_line_endings_become_newlines(tmp_path):
+    assert convert(tmp_path, b'a\r\nb\rc\n') == b'a\nb\nc\n'
+    assert convert(tmp_path, codecs.BOM_UTF8 + b'a\r\nb') == b'a\nb'
+
+
+def test_link(tmp_path):
+    source, dest = tmp_path / 'source.srt', tmp_path / 'dest.srt'
+    source.write_bytes(EXPECTED)
+    convert_to_utf8(str(source), str(dest), 'utf-8', link=True)
+    assert os.path.samefile(source, dest)
+    convert_to_utf8(str(source), str(dest), 'utf-8')
+    assert not os.path.samefile(source, dest)
+    assert dest.read_bytes() == EXPECTED
+
+
+def test_writing_over_a_link_leaves_the_source_alone(tmp_path):
+    source, dest = tmp_path / 'source.srt', tmp_path / 'dest.srt'
+    source.write_bytes(EXPECTED)
+    convert_to_utf8(str(source), str(dest), 'utf-8', link=True)
+    # The source changes and needs converting now; the old link must not be written through
+    source.write_bytes(TEXT.encode('utf-16'))
+    convert_to_utf8(str(source), str(dest), detect_encoding(str(source)), link=True)
+    assert source.read_bytes() == TEXT.encode('utf-16')
+    assert dest.read_bytes() == EXPECTED
+
+
+def test_run_links_only_unchanged_files(tmp_path):
+    source = tmp_path / 'data' / 'data-1'
+    source.mkdir(parents=True)
+    (source / 'hin-1.srt').write_bytes(EXPECTED)
+    (source / 'tel-1.srt').write_bytes(TEXT.encode('utf-8'))
+    run(str(tmp_path / 'data'), str(tmp_path / 'out'), link=True)
+    dest = tmp_path / 'out' / 'data-1'
+    assert os.path.samefile(source / 'hin-1.srt', dest / 'hin-1.srt')
+    assert not os.path.samefile(source / 'tel-1.srt', dest / 'tel-1.srt')
+    assert (dest / 'tel-1.srt').read_bytes() == EXPECTED
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+import hintel
+from hintel import FUSABLE, STAGES, Job, plan, register_stage, select_stages, stage_order
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_every_stage_comes_after_its_input():
+    order = stage_order()
+    assert sorted(order) == sorted(STAGES)
+    for name, stage in STAGES.items():
+        if stage.after:
+            assert order.index(stage.after) < order.index(name)
+
+
+def test_select_stages():
+    assert select_stages('lang', 'html') == ['lang', 'html']
+    assert select_stages(names=['score', 'encode']) == ['encode', 'score']
+    assert select_stages('score') == ['score']
+    assert select_stages(last='bg') == ['encode', 'bg']
+    assert select_stages('html', 'lang') == []
+
+
+def test_registered_stage_is_ordered_and_planned(monkeypatch):
+    monkeypatch.setattr(hintel, 'STAGES', dict(STAGES))
+    register_stage('filter', 'data_filter', 'score', 'data_filtered', ['force'])
+    assert stage_order()[-1] == 'filter'
+    assert select_stages('score') == ['score', 'filter']
+    assert plan(['filter'], 'data', 'work') == [
+        Job(('filter',), os.path.join('work', 'data_similarity_scoring'), os.path.join('work', 'data_filtered'))]
+
+
+def test_plan_chains_the_folders():
+    jobs = plan(select_stages(last='punctuation'), 'raw', 'work')
+    assert jobs == [
+        Job(('encode',), 'raw', os.path.join('work', 'data_encode')),
+        Job(('bg',), os.path.join('work', 'data_encode'), os.path.join('work', 'data_bg_cleaned')),
+        Job(('punctuation',), os.path.join('work', 'data_bg_cleaned'),
+            os.path.join('work', 'data_punctuation_standardized')),
+    ]
+
+
+def test_fused_merges_consecutive_cleaning_stages():
+    jobs = plan(select_stages(last='align'), 'raw', 'work', fused=True)
+    assert [job.stages for job in jobs] == [('encode',), tuple(FUSABLE), ('align',)]
+    assert jobs[1] == Job(tuple(FUSABLE), os.path.join('work', 'data_encode'), os.path.join('work', 'data_deaccented'))
+    assert len(plan(select_stages(last='align'), 'raw', 'work')) == len(select_stages(last='align'))
+
+
+def test_fused_keeps_stages_apart_across_a_gap():
+    jobs = plan(['bg', 'numbers', 'lang'], 'raw', 'work', fused=True)
+    assert [job.stages for job in jobs] == [('bg',), ('numbers', 'lang')]
+    assert jobs[1].source == os.path.join('work', 'data_punctuation_standardized')
+
+
+def test_score_runs_once_per_vocabulary_size():
+    jobs = plan(['tokenize', 'score'], 'raw', 'work', vocab_sizes=[300, 500])
+    tokenized, scored = os.path.join('work', 'data_tokenized'), os.path.join('work', 'data_similarity_scoring')
+    assert jobs == [
+        Job(('tokenize',), os.path.join('work', 'data_aligned'), tokenized),
+        Job(('score',), os.path.join(tokenized, '300'), os.path.join(scored, '300')),
+        Job(('score',), os.path.join(tokenized, '500'), os.path.join(scored, '500')),
+    ]
+    assert plan(['tokenize', 'score'], 'raw', 'work', vocab_sizes=1000)[1] == Job(('score',), tokenized, scored)
+
+
+def test_dry_run_imports_no_stage_module(tmp_path):
+    script = ("import sys, runpy; sys.argv = sys.argv[1:]; "
+              "runpy.run_path('hintel.py', run_name='__main__'); "
+              "print(sorted(m for m in ('numpy', 'sklearn', 'clean_pipeline', 'data_tokenized') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', script, 'hintel.py', '--dry-run', '--fused', '--to', 'score',
+                             '--workdir', str(tmp_path)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout.splitlines()
+    assert output[1].startswith('+'.join(FUSABLE) + ': ')
+    assert output[-2].startswith('score: ')
+    assert output[-1] == '[]'
@@ -0,0 +1,79 @@
+import pytest
+
+import data_lang_cleaner
+from data_lang_cleaner import (MIN_SCRIPT_LETTERS, _script_language, detect_file_language, file_language,
+                               is_valid_file_pair, is_valid_pair, script_language)
+
+HINDI = 'मुझे नहीं पता कि वह कहाँ गया'
+TELUGU = 'అతను ఎక్కడికి వెళ్ళాడో నాకు తెలియదు'
+MARATHI = 'मला माहित नाही तो कुठे गेला'
+ENGLISH = 'I do not know where he went'
+
+
+def srt(lines, newline='\n'):
+    cues = []
+    for index, line in enumerate(lines, 1):
+        cues.append(newline.join([str(index), f'00:00:{index % 60:02},000 --> 00:00:{index % 60:02},500', line]))
+    return (newline * 2).join(cues) + newline
+
+
+def test_script_language():
+    assert script_language(srt([HINDI] * 20)) == 'hi'
+    assert script_language(srt([TELUGU] * 20, '\r\n')) == 'te'
+    assert script_language(srt([ENGLISH] * 20)) is None
+    assert script_language('') is None
+    # Opening credits in English don't decide for the whole file
+    assert script_language(srt([ENGLISH] * 3 + [HINDI] * 30)) == 'hi'
+
+
+def test_any_devanagari_counts_as_hindi():
+    # The documented limitation of the gate: it can't tell Marathi from Hindi
+    assert script_language(srt([MARATHI] * 20)) == 'hi'
+
+
+def test_gate_stops_once_confident():
+    consumed = []
+
+    def lines():
+        for line in [HINDI] * 1000:
+            consumed.append(line)
+            yield line
+
+    assert _script_language(lines()) == 'hi'
+    assert len(consumed) * len(HINDI) < 2 * MIN_SCRIPT_LETTERS
+
+
+def test_file_language_reads_only_what_it_samples(tmp_path):
+    path = tmp_path / 'hin.srt'
+    text = srt([HINDI] * 2000).encode('utf-8')
+    # Bytes that aren't UTF-8 in the last bit of the file would fail if it were read whole
+    path.write_bytes(text + b'\n\xff\xfe\n')
+    assert file_language(str(path)) == 'hi'
+    with pytest.raises(UnicodeDecodeError):
+        script_language(path.read_bytes().decode('utf-8'))
+
+
+def test_file_language_matches_script_language(tmp_path):
+    for text in [srt([HINDI] * 5 + [ENGLISH] * 5), srt([TELUGU] * 50, '\r\n'), srt([ENGLISH]), '']:
+        path = tmp_path / 'file.srt'
+        path.write_bytes(text.encode('utf-8'))
+        assert file_language(str(path)) == script_language(text)
+
+
+def test_langdetect_is_only_asked_when_the_gate_cant_decide(tmp_path, monkeypatch):
+    asked = []
+    monkeypatch.setattr(data_lang_cleaner, 'langdetect_language', lambda text: asked.append(text) or 'en')
+    hindi, english = tmp_path / 'hin.srt', tmp_path / 'eng.srt'
+    hindi.write_text(srt([HINDI] * 20), encoding='utf-8')
+    english.write_text(srt([ENGLISH] * 20), encoding='utf-8')
+    assert detect_file_language(str(hindi)) == 'hi'
+    assert asked == []
+    assert detect_file_language(str(english)) == 'en'
+    assert asked == [english.read_text(encoding='utf-8')]
+    assert not is_valid_file_pair(str(hindi), str(english))
+
+
+def test_langdetect_fallback():
+    pytest.importorskip('langdetect')
+    assert not is_valid_pair(srt([ENGLISH] * 20), srt([TELUGU] * 20))
+    assert is_valid_pair(srt([HINDI] * 20), srt([TELUGU] * 20))
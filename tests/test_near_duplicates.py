@@ -0,0 +1,33 @@
+from near_duplicates import CorpusIndex, Entry, load_corpus, redundant_lines, write_deduplicated
+
+ENTRIES = [
+    Entry('a.tsv', 1, 'हाँ', 'అవును'),
+    Entry('a.tsv', 2, 'नहीं, धन्यवाद', 'వద్దు, ధన్యవాదాలు'),
+    Entry('b.tsv', 1, 'हाँ', 'అవును.'),
+    Entry('b.tsv', 2, 'मुझे नहीं पता', 'నాకు తెలియదు'),
+]
+
+
+def test_sentence_query_on_pair_index_matches_either_side():
+    index = CorpusIndex(ENTRIES)
+    assert [entry.line for entry, _ in index.query('हाँ')] == [1, 1]
+    assert {entry.file for entry, _ in index.query('हाँ')} == {'a.tsv', 'b.tsv'}
+    assert [(entry, similarity) for entry, similarity in index.query('నాకు తెలియదు')] == [(ENTRIES[3], 1.0)]
+
+
+def test_pair_query_compares_whole_lines():
+    index = CorpusIndex(ENTRIES)
+    assert index.query('हाँ\tఅవును')[0] == (ENTRIES[0], 1.0)
+    # Only half of the n-grams of the line are in the Hindi side
+    assert index.query('नहीं, धन्यवाद\tnothing alike') == []
+
+
+def test_malformed_lines_are_reported(tmp_path, capsys):
+    (tmp_path / 'a.tsv').write_text('हाँ\tఅవును\nonly one field\nहाँ\tఅవును\n', encoding='utf-8')
+    entries = load_corpus(str(tmp_path))
+    assert [entry.line for entry in entries] == [1, 3]
+    assert 'Skipping 1 malformed lines in a.tsv' in capsys.readouterr().out
+
+    index = CorpusIndex(entries, 'hindi')
+    write_deduplicated(entries, redundant_lines(index.clusters()), str(tmp_path / 'out'))
+    assert (tmp_path / 'out' / 'a.tsv').read_text(encoding='utf-8') == 'हाँ\tఅవును\n'
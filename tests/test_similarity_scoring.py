@@ -0,0 +1,102 @@
+import os
+import random
+import unicodedata
+
+import numpy as np
+import pytest
+
+from data_similarity_scoring import (AdvancedSimilarityCalculator, char_ngrams, normalize_text, text_structure,
+                                     text_structures)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_aligned')
+FILE = 'data-1_aligned_1.tsv'
+LINES = 200
+
+
+@pytest.fixture(scope='module')
+def pairs():
+    with open(os.path.join(DATA_DIR, FILE), encoding='utf-8') as file:
+        return [line.rstrip('\n').split('\t') for _, line in zip(range(LINES), file)]
+
+
+@pytest.fixture(scope='module')
+def texts(pairs):
+    rng = random.Random(0)
+    # Corpus lines plus random text from the blocks the tables fill in lazily
+    alphabet = [chr(c) for c in range(0x20, 0x3000) if not 0xD800 <= c < 0xE000] + ['\U0001F600', '\U00010400']
+    extra = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))) for _ in range(500)]
+    return [text for pair in pairs for text in pair] + extra + ['', '  \t a  b ', 'é', 'ﬁ½', 'ñ̃']
+
+
+def baseline_normalize_text(text):
+    """_normalize_text as it was before the lookup tables, to compare against."""
+    text = ' '.join(text.split())
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def baseline_text_structure(text):
+    """_get_text_structure as it was before the lookup tables, to compare against."""
+    structure = [unicodedata.category(c) for c in text]
+    for i, c in enumerate(text):
+        if c.isspace() or unicodedata.category(c).startswith('P'):
+            structure[i] = c
+    return ''.join(structure)
+
+
+def test_normalize_text_matches_baseline(texts):
+    assert [normalize_text(text) for text in texts] == [baseline_normalize_text(text) for text in texts]
+
+
+def test_text_structure_matches_baseline(texts):
+    expected = [baseline_text_structure(text) for text in texts]
+    assert [text_structure(text) for text in texts] == expected
+    assert text_structures(texts) == expected
+    assert text_structures([]) == []
+
+
+def test_char_ngrams(texts):
+    for text in texts:
+        normalized = baseline_normalize_text(text)
+        assert char_ngrams(text, (2, 3)) == {normalized[i:i + n] for n in (2, 3)
+                                             for i in range(len(normalized) - n + 1)}
+
+
+@pytest.fixture(scope='module')
+def calculator():
+    return AdvancedSimilarityCalculator()
+
+
+def test_per_pair_scores_match_the_single_pair_score(calculator, pairs):
+    hindi, telugu = zip(*pairs[:50])
+    scores = calculator.calculate_similarity_scores(hindi, telugu, per_pair=True)
+    assert scores.tolist() == [calculator.calculate_similarity_score(h, t) for h, t in zip(hindi, telugu)]
+
+
+def test_batch_of_one_pair_matches_the_single_pair_score(calculator, pairs):
+    for hindi, telugu in pairs[:50]:
+        score = calculator.calculate_similarity_scores([hindi], [telugu])[0]
+        assert score == pytest.approx(calculator.calculate_similarity_score(hindi, telugu))
+
+
+def test_batch_scores_match_cosines_of_one_fit(calculator, pairs):
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    hindi, telugu = map(list, zip(*pairs))
+    char_vectors = calculator.char_vectorizer.fit_transform(hindi + telugu)
+    structures = [calculator._get_text_structure(text) for text in hindi + telugu]
+    structure_vectors = calculator.structure_vectorizer.fit_transform(structures)
+    count = len(hindi)
+    expected = [0.5 * cosine_similarity(char_vectors[i], char_vectors[count + i])[0][0] +
+                0.3 * cosine_similarity(structure_vectors[i], structure_vectors[count + i])[0][0] +
+                0.2 * calculator._calculate_length_similarity(hindi[i], telugu[i])
+                for i in range(count)]
+    assert calculator.calculate_similarity_scores(hindi, telugu) == pytest.approx(expected)
+
+
+def test_empty_texts_score_the_same_on_both_paths(calculator):
+    hindi, telugu = ['', 'नमस्ते', ''], ['', '', 'నమస్తే']
+    assert calculator._calculate_length_similarity('', '') == 1.0
+    batch = calculator.calculate_similarity_scores(hindi, telugu)
+    per_pair = calculator.calculate_similarity_scores(hindi, telugu, per_pair=True)
+    assert np.allclose(batch, per_pair)
+    assert batch[0] == pytest.approx(0.2)
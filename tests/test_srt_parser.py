@@ -0,0 +1,77 @@
+import random
+import re
+
+import pytest
+
+import srt_parser
+from srt_parser import Subtitle, iter_srt, parse_srt, parse_srt_table, parse_time
+
+
+def baseline_parse_srt(file_path):
+    """parse_srt as it was before the streaming parser, to compare against."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    subtitles = []
+    for block in re.split(r'\n\n+', content.strip()):
+        lines = block.split('\n')
+        if len(lines) >= 3:
+            time_range = lines[1].split(' --> ')
+            subtitles.append(Subtitle(index=int(lines[0]), start_time=parse_time(time_range[0]),
+                                      end_time=parse_time(time_range[1]), text=' '.join(lines[2:])))
+    return subtitles
+
+
+def fields(subtitles):
+    return [(sub.index, sub.start_time, sub.end_time, sub.text) for sub in subtitles]
+
+
+def random_srt(rng, cues):
+    """SRT text with random cues, line endings and runs of blank lines between cues."""
+    newline = rng.choice(['\n', '\r\n'])
+    parts = [newline * rng.randint(0, 2)]
+    for index in range(1, cues + 1):
+        start = index * 2.5
+        lines = [str(index), f"00:00:{start:06.3f} --> 00:00:{start + 2:06.3f}".replace('.', ',')]
+        lines += [' '.join(rng.choice(['नमस्ते', 'దుస్తులు', 'hello', 'ok?']) for _ in range(rng.randint(1, 4)))
+                  for _ in range(rng.randint(1, 3))]
+        parts.append(newline.join(lines) + newline * rng.randint(2, 5))
+    return ''.join(parts)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(srt_parser, 'CHUNK_SIZE', 8)
+
+
+def test_blank_lines_across_chunk_boundary(tmp_path, small_chunks):
+    # The first chunk ends in the middle of the three newlines after cue 1
+    path = tmp_path / 'cues.srt'
+    path.write_text("1\n00:00:01,000 --> 00:00:02,000\nab\n\n\n"
+                    "2\n00:00:03,000 --> 00:00:04,000\ncd\n", encoding='utf-8')
+    assert fields(parse_srt(path)) == [(1, 1.0, 2.0, 'ab'), (2, 3.0, 4.0, 'cd')]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1 << 16])
+def test_matches_baseline_on_chunk_boundaries(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(srt_parser, 'CHUNK_SIZE', chunk_size)
+    rng = random.Random(chunk_size)
+    for case in range(20):
+        path = tmp_path / f'case{case}.srt'
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(random_srt(rng, rng.randint(0, 30)))
+        expected = fields(baseline_parse_srt(path))
+        assert fields(parse_srt(path)) == expected
+        assert fields(parse_srt_table(path)) == expected
+
+
+def test_tolerant_skips_malformed_blocks(tmp_path):
+    path = tmp_path / 'bad.srt'
+    path.write_text("x\n00:00:01,000 --> 00:00:02,000\nab\n\n"
+                    "2\n00:00:03,000 --> 00:00:04,000\ncd\n", encoding='utf-8')
+    with pytest.raises(ValueError):
+        parse_srt(path)
+    errors = []
+    subtitles = list(iter_srt(path, tolerant=True, on_error=lambda block, error: errors.append(block)))
+    assert fields(subtitles) == [(2, 3.0, 4.0, 'cd')]
+    assert len(errors) == 1
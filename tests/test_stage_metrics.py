@@ -0,0 +1,59 @@
+import json
+import logging
+
+import stage_metrics
+from stage_metrics import METRICS_ENV, RUN_ENV, SampledLog, file_metrics, read_records
+
+
+def test_stage_summary_reads_only_this_stage_run(tmp_path, monkeypatch):
+    path = tmp_path / 'metrics.jsonl'
+    # Records of earlier runs are never read again, so even a broken line there is fine
+    path.write_text('not json\n', encoding='utf-8')
+    monkeypatch.setenv(METRICS_ENV, str(path))
+    monkeypatch.setenv(RUN_ENV, 'run1')
+    source = tmp_path / 'in.srt'
+    source.write_text('12345', encoding='utf-8')
+
+    with stage_metrics.stage_metrics('range'):
+        for name in ('a', 'b'):
+            with file_metrics('range', name, [str(source)]) as metrics:
+                metrics.add(cues=2, lines_changed=1)
+
+    lines = path.read_text(encoding='utf-8').splitlines()
+    summary = json.loads(lines[-1])
+    assert summary['type'] == 'stage'
+    assert (summary['files'], summary['cues'], summary['lines_changed'], summary['bytes_in']) == (2, 4, 2, 10)
+    assert [entry['file'] for entry in read_records(str(path), len(lines[0]) + 1, type='file')] == ['a', 'b']
+
+
+class Formatted:
+    """Argument counting how often a log message using it was formatted."""
+    count = 0
+
+    def __str__(self):
+        Formatted.count += 1
+        return 'line'
+
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_sampled_log_formats_only_the_messages_it_shows():
+    logger = logging.getLogger('test_sampled_log')
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler = Collect()
+    logger.addHandler(handler)
+    log = SampledLog(logger, limit=2)
+    for _ in range(5):
+        log("Changed line: %s", Formatted())
+    log.finish('changed lines')
+    assert handler.messages == ['Changed line: line', 'Changed line: line', '... and 3 more changed lines']
+    assert Formatted.count == 2
+    assert log.count == 5
@@ -0,0 +1,186 @@
+import argparse
+import os
+import string
+import unicodedata
+
+import numpy as np
+import pytest
+
+from data_tokenized import (BPE, IDS_DIR, MODEL_HEADER, TokenIdCorpus, TokenVocabulary, VOCAB_FILES, WHITESPACE,
+                            count_tsv_words, load_tsv, load_vocabulary, parse_vocab_sizes, pre_tokenize,
+                            process_tsv_files, save_token_ids, stream_tokenized_file, token_id_paths)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_aligned')
+FILES = ['data-1_aligned_1.tsv', 'data-2_aligned_2.tsv', 'data-3_aligned_3.tsv']
+LINES = 300
+VOCAB_SIZES = [200, 260]
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory):
+    """A small aligned corpus: the first lines of a few aligned files."""
+    path = tmp_path_factory.mktemp('aligned')
+    for name in FILES:
+        with open(os.path.join(DATA_DIR, name), encoding='utf-8') as source:
+            lines = [next(source) for _ in range(LINES)]
+        (path / name).write_text(''.join(lines), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def texts(data_dir):
+    return [text for name in FILES for pair in load_tsv(os.path.join(data_dir, name)) for text in pair]
+
+
+def baseline_pre_tokenize(text):
+    """BERT's pre-tokenizer written out character by character, to compare against."""
+    words, word = [], ''
+    for c in text:
+        if c in WHITESPACE or c in string.punctuation or unicodedata.category(c).startswith('P'):
+            if word:
+                words.append(word)
+            word = ''
+            if c not in WHITESPACE:
+                words.append(c)
+        else:
+            word += c
+    if word:
+        words.append(word)
+    return words
+
+
+def test_pre_tokenize_matches_baseline(texts):
+    extra = ['a　b\x1cc', 'x--y', '«नमस्ते»', 'tab\tand line', '$5.00 + 3 = ^_^', '']
+    for text in texts + extra:
+        assert pre_tokenize(text) == baseline_pre_tokenize(text)
+
+
+def test_chunked_word_counts_match(data_dir):
+    path = os.path.join(data_dir, FILES[0])
+    hindi, telugu = count_tsv_words(path)
+    chunked = count_tsv_words(path, chunk_lines=7)
+    assert [list(counts.items()) for counts in chunked] == [list(hindi.items()), list(telugu.items())]
+
+
+def test_parse_vocab_sizes():
+    assert parse_vocab_sizes('500,1000,') == [500, 1000]
+    for value in ['', ',', '10,x', '0,100', '-5']:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_vocab_sizes(value)
+
+
+@pytest.fixture(scope='module')
+def trained(texts):
+    bpe = BPE(texts, max(VOCAB_SIZES))
+    bpe.train()
+    return bpe
+
+
+def test_truncated_tokenizes_like_training_to_that_size(texts, trained):
+    smaller = BPE(texts, VOCAB_SIZES[0])
+    smaller.train()
+    assert trained.truncated(VOCAB_SIZES[0]).tokenize_batch(texts) == smaller.tokenize_batch(texts)
+    assert trained.tokenize_sizes(texts, VOCAB_SIZES)[VOCAB_SIZES[0]] == smaller.tokenize_batch(texts)
+
+
+def test_save_load_round_trip(tmp_path, trained):
+    path = str(tmp_path / 'model.bpe')
+    trained.save(path)
+    with open(path, encoding='utf-8') as file:
+        assert file.readline() == f"{MODEL_HEADER}{max(VOCAB_SIZES)}\n"
+    loaded = BPE.load(path)
+    assert loaded.vocab_size == trained.vocab_size
+    assert list(loaded.merges.items()) == list(trained.merges.items())
+
+
+def test_load_rejects_files_without_header(tmp_path, trained):
+    path = tmp_path / 'model.bpe'
+    path.write_text('a b\nab c\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='Not a BPE merges file'):
+        BPE.load(str(path))
+
+
+def test_vocabulary_ids(tmp_path, trained):
+    vocabulary = TokenVocabulary(trained.merges)
+    assert len(vocabulary) == len(set(vocabulary.ids))
+    merged = list(trained.merges.values())
+    ids = vocabulary.encode(merged + ['\U0001F600'])
+    # Merged tokens follow the characters; unseen tokens are appended
+    assert ids[:len(merged)] == sorted(ids[:len(merged)])
+    assert ids[-1] == len(vocabulary) - 1
+    path = str(tmp_path / 'tokens.vocab')
+    vocabulary.save(path)
+    assert load_vocabulary(path) == list(vocabulary.ids)
+
+
+@pytest.mark.parametrize('largest_id, dtype', [(65535, np.uint16), (65536, np.uint32)])
+def test_token_ids_round_trip(tmp_path, largest_id, dtype):
+    sentences = {'hindi': [[1, 2, 3], [], [largest_id]], 'telugu': [[7], [8, 9], []]}
+    ids_dir = str(tmp_path / IDS_DIR)
+    for language, language_sentences in sentences.items():
+        save_token_ids(ids_dir, 4, language, language_sentences)
+    save_token_ids(ids_dir, 12, 'hindi', [[5]])
+    save_token_ids(ids_dir, 12, 'telugu', [[6, 6]])
+    for name in VOCAB_FILES.values():
+        (tmp_path / name).write_text('a\nb\n', encoding='utf-8')
+
+    assert np.load(token_id_paths(ids_dir, 4, 'hindi')[0]).dtype == dtype
+    assert np.load(token_id_paths(ids_dir, 4, 'telugu')[0]).dtype == np.uint16
+    corpus = TokenIdCorpus(str(tmp_path))
+    assert len(corpus) == 4
+    pairs = [tuple(ids.tolist() for ids in corpus[i]) for i in range(len(corpus))]
+    assert pairs == [([1, 2, 3], [7]), ([], [8, 9]), ([largest_id], []), ([5], [6, 6])]
+    assert [ids.tolist() for ids in corpus[-1]] == [[5], [6, 6]]
+    with pytest.raises(IndexError):
+        corpus[4]
+
+
+def output_files(output_dir):
+    """Contents of every output file but the build cache, by relative path."""
+    files = {}
+    for root, dirs, names in os.walk(output_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if not name.startswith('.'):
+                with open(path, 'rb') as file:
+                    files[os.path.relpath(path, output_dir)] = file.read()
+    return files
+
+
+@pytest.fixture(scope='module')
+def in_memory_output(data_dir, tmp_path_factory):
+    output_dir = str(tmp_path_factory.mktemp('in_memory'))
+    process_tsv_files(data_dir, output_dir, VOCAB_SIZES, jobs=1)
+    return output_dir
+
+
+def test_parallel_counting_writes_the_same_files(data_dir, in_memory_output, tmp_path):
+    output_dir = str(tmp_path / 'parallel')
+    process_tsv_files(data_dir, output_dir, VOCAB_SIZES, jobs=2)
+    assert output_files(output_dir) == output_files(in_memory_output)
+
+
+def test_stream_writes_the_same_files(data_dir, in_memory_output, tmp_path):
+    output_dir = str(tmp_path / 'streamed')
+    process_tsv_files(data_dir, output_dir, VOCAB_SIZES, jobs=1, stream=True)
+    expected = output_files(in_memory_output)
+    assert any(path.endswith('.ids.npy') for path in expected)
+    assert output_files(output_dir) == expected
+
+
+def test_stream_in_small_chunks(data_dir, in_memory_output, tmp_path):
+    size = VOCAB_SIZES[0]
+    size_dir = os.path.join(in_memory_output, str(size))
+    tokenizers = [BPE.load(os.path.join(size_dir, f'{language}.bpe')) for language in VOCAB_FILES]
+    vocabularies = {size: {language: TokenVocabulary(tokenizer.merges)
+                           for language, tokenizer in zip(VOCAB_FILES, tokenizers)}}
+    name, pairs = stream_tokenized_file(os.path.join(data_dir, FILES[0]), 1, {size: str(tmp_path)}, tokenizers,
+                                        [size], pretrained=True, vocabularies=vocabularies, chunk_lines=7)
+    assert pairs == LINES
+    with open(os.path.join(size_dir, name), 'rb') as expected, open(tmp_path / name, 'rb') as streamed:
+        assert streamed.read() == expected.read()
+    for language in VOCAB_FILES:
+        for expected, streamed in zip(token_id_paths(os.path.join(size_dir, IDS_DIR), 1, language),
+                                      token_id_paths(str(tmp_path / IDS_DIR), 1, language)):
+            assert np.array_equal(np.load(streamed), np.load(expected))
+            assert np.load(streamed).dtype == np.load(expected).dtype